@@ -0,0 +1,130 @@
+# benchmarks/bench_catalog_load.py
+"""
+Load time and memory of the catalog for large synthetic corpora.
+
+Writes `--titles` synthetic summaries split over `--shards` files, then, each
+in a fresh interpreter so resident memory is comparable:
+  documents  the old path: every record as a Document plus a title -> summary dict
+  build      stream the shards into the memory-mapped catalog store
+  store      open the built store, list the titles and look up random summaries
+
+    python -m benchmarks.bench_catalog_load [--titles 100000] [--shards 8] [--lookups 10000]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+THEMES = ["friendship", "courage", "war", "love", "identity", "power", "family", "magic", "loss",
+          "freedom", "coming of age", "betrayal", "justice", "survival", "memory", "faith"]
+
+
+def memory_mb() -> dict:
+    """
+    Resident memory: "rss" in total and "anon", the private heap. Pages of the
+    memory-mapped store count in rss but not anon: they are page cache, shared
+    by every worker and reclaimable. Outside Linux both are the peak RSS.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f)
+        return {"rss": int(fields["VmRSS"].split()[0]) / 1024, "anon": int(fields["RssAnon"].split()[0]) / 1024}
+    except (OSError, KeyError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        return {"rss": peak, "anon": peak}
+
+
+def measured(before: dict, started: float, **extra) -> dict:
+    after = memory_mb()
+    return {"seconds": time.perf_counter() - started, "rss_mb": after["rss"] - before["rss"],
+            "anon_mb": after["anon"] - before["anon"], **extra}
+
+
+def write_corpus(directory: str, titles: int, shards: int) -> list:
+    rng = random.Random(42)
+    paths = [os.path.join(directory, f"shard-{i:03d}.txt") for i in range(shards)]
+    files = [open(p, "w", encoding="utf-8") for p in paths]
+    try:
+        for i in range(titles):
+            themes = ", ".join(rng.sample(THEMES, 3))
+            summary = " ".join(f"Sentence {j} of the story of book {i}, told at some length." for j in range(8))
+            files[i % shards].write(f"## Title: Synthetic Book {i}\n{summary}\nThemes: {themes}.\n\n")
+    finally:
+        for f in files:
+            f.close()
+    return paths
+
+
+def run_documents(paths, args) -> dict:
+    from smart_librarian.models.book_model import load_summaries
+    before, started = memory_mb(), time.perf_counter()
+    docs = load_summaries(paths)
+    summary_by_title = {d.metadata["title"]: d.page_content for d in docs}
+    return measured(before, started, records=len(summary_by_title))
+
+
+def run_build(paths, args) -> dict:
+    from smart_librarian.models.catalog_store import open_catalog_store
+    before, started = memory_mb(), time.perf_counter()
+    store = open_catalog_store(paths, directory=args.store_dir, rebuild=True)
+    return measured(before, started, records=len(store))
+
+
+def run_store(paths, args) -> dict:
+    from smart_librarian.models.catalog_store import open_catalog_store
+    before, started = memory_mb(), time.perf_counter()
+    store = open_catalog_store(paths, directory=args.store_dir)
+    titles = store.titles()
+    result = measured(before, started, records=len(store))
+    sample = random.Random(7).choices(titles, k=args.lookups)
+    started = time.perf_counter()
+    result["found"] = sum(1 for title in sample if store.get(title))
+    result["lookup_us"] = (time.perf_counter() - started) / max(1, len(sample)) * 1e6
+    return result
+
+
+MODES = {"documents": run_documents, "build": run_build, "store": run_store}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--titles", type=int, default=100_000)
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--mode", choices=sorted(MODES), help=argparse.SUPPRESS)
+    parser.add_argument("--corpus-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--store-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:   # child run: one measurement, printed as JSON
+        paths = sorted(os.path.join(args.corpus_dir, p) for p in os.listdir(args.corpus_dir))
+        print(json.dumps(MODES[args.mode](paths, args)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus_dir = os.path.join(tmp, "corpus")
+        os.makedirs(corpus_dir)
+        write_corpus(corpus_dir, args.titles, args.shards)
+        corpus_mb = sum(os.path.getsize(os.path.join(corpus_dir, p)) for p in os.listdir(corpus_dir)) / 2 ** 20
+        print(f"{args.titles} titles in {args.shards} shards ({corpus_mb:.1f} MB)")
+        for mode in ("documents", "build", "store"):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_catalog_load", "--mode", mode, "--corpus-dir", corpus_dir,
+                 "--store-dir", os.path.join(tmp, "store"), "--lookups", str(args.lookups)],
+                check=True, capture_output=True, text=True,
+            ).stdout.strip().splitlines()[-1]
+            result = json.loads(out)
+            line = (f"  {mode:<10} {result['seconds']:8.3f}s  {result['rss_mb']:7.1f} MB RSS "
+                    f"({result['anon_mb']:7.1f} MB anon)  {result['records']} records")
+            if "lookup_us" in result:
+                line += f"  get() {result['lookup_us']:.1f}µs"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
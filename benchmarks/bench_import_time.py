@@ -0,0 +1,113 @@
+# benchmarks/bench_import_time.py
+"""
+Import-time profile of the app: runs `python -X importtime -c "import <module>"`
+in a fresh interpreter (best of --repeat runs, so a cold disk cache only hurts
+the first one) and sums the self time of every imported module by top-level
+package. Importing `main` also creates the schema, in a throwaway SQLite database.
+
+    python -m benchmarks.bench_import_time [--module main] [--repeat 5] [--top 15]
+        [--label my-change] [--compare benchmarks/results/<file>.json]
+
+Modules that should only load on first use (the OpenAI SDK, langchain,
+Chroma) are listed as "deferred"; seeing one of them imported at startup
+is a regression. Results are saved next to the load test's.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from benchmarks.load_test import REPO_DIR, RESULTS_DIR, git_revision
+
+DEFERRED = ("openai", "langchain", "langchain_core", "langchain_openai", "langchain_chroma", "chromadb", "tiktoken")
+LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def profile(module: str) -> List[tuple]:
+    """[(module, self µs, cumulative µs, depth)] of one cold import."""
+    with tempfile.TemporaryDirectory(prefix="librarian-import-") as workdir:
+        env = {
+            **os.environ,
+            "PYTHONPATH": os.pathsep.join(filter(None, [REPO_DIR, os.environ.get("PYTHONPATH")])),
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'import.sqlite3')}",
+            "CATALOG_WARMUP": "0",
+            "LOG_LEVEL": "WARNING",
+        }
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              cwd=workdir, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-3000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = LINE_RE.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2))
+    return rows
+
+
+def summarize(rows: List[tuple], module: str) -> dict:
+    by_package: Dict[str, int] = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+    total = next((cumulative for name, _, cumulative, depth in rows if name == module and depth == 0),
+                 sum(by_package.values()))
+    imported = {name.split(".")[0] for name, _, _, _ in rows}
+    return {
+        "total_ms": round(total / 1000, 1),
+        "modules": len(rows),
+        "packages_ms": {name: round(us / 1000, 1) for name, us in sorted(by_package.items(), key=lambda kv: -kv[1])},
+        "deferred_imported": sorted(imported.intersection(DEFERRED)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main", help="module to import (main, smart_librarian...)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="packages to list")
+    parser.add_argument("--label", default="")
+    parser.add_argument("--compare", help="earlier results file to print deltas against")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    runs = [summarize(profile(args.module), args.module) for _ in range(max(1, args.repeat))]
+    best = min(runs, key=lambda r: r["total_ms"])
+    print(f"import {args.module}: best {best['total_ms']} ms of {len(runs)} "
+          f"(median {sorted(r['total_ms'] for r in runs)[len(runs) // 2]} ms), {best['modules']} modules")
+    for name, ms in list(best["packages_ms"].items())[:args.top]:
+        print(f"  {name:<28} {ms:>8} ms")
+    if best["deferred_imported"]:
+        print(f"  imported at startup, should be deferred: {', '.join(best['deferred_imported'])}")
+
+    result = {
+        "git": git_revision(),
+        "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "module": args.module,
+        "runs_ms": [r["total_ms"] for r in runs],
+        **best,
+    }
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        delta = (best["total_ms"] - previous["total_ms"]) / previous["total_ms"] * 100
+        print(f"\nvs {os.path.basename(args.compare)} ({previous['git']['commit']}): "
+              f"{previous['total_ms']} → {best['total_ms']} ms ({delta:+.0f}%)")
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        name = "-".join(filter(None, [stamp, result["git"]["commit"], "import", args.label])) + ".json"
+        path = os.path.join(RESULTS_DIR, name)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=1)
+        print(f"\nSaved {os.path.relpath(path, REPO_DIR)}")
+
+
+if __name__ == "__main__":
+    main()
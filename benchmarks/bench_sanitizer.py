@@ -0,0 +1,65 @@
+# benchmarks/bench_sanitizer.py
+"""
+Micro-benchmark of the history sanitizer on large inputs.
+
+Compares re-sanitizing a whole conversation on every turn (the old context
+path) with sanitizing each message once at write time.
+
+    python -m benchmarks.bench_sanitizer [--messages 40] [--payload-kb 1024] [--turns 20]
+"""
+import argparse
+import base64
+import os
+import time
+
+from smart_librarian.utils.message_helper import sanitize_ctx_messages, split_message
+
+
+def make_history(messages: int, payload_kb: int) -> list:
+    """Alternating user/assistant turns; every assistant turn carries a legacy inline image."""
+    blob = base64.b64encode(os.urandom(payload_kb * 1024 * 3 // 4)).decode("ascii")
+    history = []
+    for i in range(messages):
+        if i % 2 == 0:
+            history.append({"role": "user", "content": f"Recommend me book number {i} about friendship"})
+        else:
+            history.append({"role": "assistant", "content": (
+                f"Here is a book you may like.\n\n „Title {i}”\n" + "A summary sentence. " * 40
+                + f'<image type="image/png">{blob}</image>'
+                + '<audio type="audio/mpeg" src="/api/media/' + "0" * 64 + '.mp3"></audio>'
+            )})
+    return history
+
+
+def timed(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=40)
+    parser.add_argument("--payload-kb", type=int, default=1024, help="base64 payload per assistant message")
+    parser.add_argument("--turns", type=int, default=20, help="turns simulated per conversation")
+    args = parser.parse_args()
+
+    history = make_history(args.messages, args.payload_kb)
+    size_mb = sum(len(m["content"]) for m in history) / 1e6
+    print(f"history: {len(history)} messages, {size_mb:.1f} MB")
+
+    per_turn = timed(lambda: sanitize_ctx_messages(history), repeat=3)
+    per_message = timed(lambda: [split_message(m["content"]) for m in history], repeat=3) / len(history)
+    precomputed = [{"role": m["role"], "content": split_message(m["content"])[0]} for m in history]
+    read_only = timed(lambda: [{"role": m["role"], "content": m["content"]} for m in precomputed], repeat=100)
+
+    print(f"sanitize whole history per turn : {per_turn * 1e3:9.2f} ms/turn")
+    print(f"sanitize once at write time     : {per_message * 1e3:9.2f} ms/message")
+    print(f"build context from stored text  : {read_only * 1e3:9.4f} ms/turn")
+    print(f"over {args.turns} turns: {per_turn * args.turns * 1e3:.1f} ms re-sanitizing vs "
+          f"{(per_message * 2 * args.turns + read_only * args.turns) * 1e3:.1f} ms precomputed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+# benchmarks/fake_openai.py
+"""
+Local stand-in for the OpenAI API, for benchmarks and offline runs.
+
+Serves the endpoints the app uses with canned, deterministic answers after a
+configurable latency:
+  POST /v1/chat/completions     streamed or not; replies with a short opener and a
+                                get_summary_by_title call for the first candidate
+                                title found in the system prompt
+  POST /v1/embeddings           deterministic unit vectors seeded by the input
+  POST /v1/moderations          flagged when the input contains a --flag-words word
+  POST /v1/images/generations   a 1x1 PNG
+  POST /v1/audio/speech         --audio-kb of MP3-ish bytes
+  POST /v1/audio/transcriptions a fixed transcript
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+    python -m benchmarks.fake_openai [--port 8100] [--latency chat=0.3,images=2] [--token-delay 0.01]
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+import numpy as np
+
+# Seconds before the first byte of each kind of response (±20% jitter)
+DEFAULT_LATENCY = {
+    "chat": 0.3,
+    "embeddings": 0.02,
+    "moderations": 0.05,
+    "images": 2.0,
+    "speech": 0.5,
+    "transcriptions": 0.3,
+}
+ROUTES = {
+    "/v1/chat/completions": "chat",
+    "/v1/embeddings": "embeddings",
+    "/v1/moderations": "moderations",
+    "/v1/images/generations": "images",
+    "/v1/audio/speech": "speech",
+    "/v1/audio/transcriptions": "transcriptions",
+}
+
+PNG_1X1 = base64.b64encode(bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360f8cfc0f01f0005000201e2216bc7"
+    "0000000049454e44ae426082"
+)).decode("ascii")
+CANDIDATE_TITLE_RE = re.compile(r"^\s*title:\s*(.+?)\s*$", re.MULTILINE)
+OPENER = "Here is a book from the library that I think you will enjoy."
+TRANSCRIPT = "Can you recommend a book about friendship and adventure?"
+
+
+def parse_latency(spec: str) -> Dict[str, float]:
+    """"chat=0.5,images=1" -> DEFAULT_LATENCY with those kinds overridden."""
+    latency = dict(DEFAULT_LATENCY)
+    for part in filter(None, (p.strip() for p in (spec or "").split(","))):
+        kind, _, seconds = part.partition("=")
+        if kind not in latency:
+            raise ValueError(f"unknown latency kind {kind!r} (one of {', '.join(latency)})")
+        latency[kind] = float(seconds)
+    return latency
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency: Optional[Dict[str, float]] = None, token_delay: float = 0.01,
+                 embedding_dim: int = 256, audio_kb: int = 32, flag_words=("badword",)):
+        super().__init__(address, Handler)
+        self.latency = latency or dict(DEFAULT_LATENCY)
+        self.token_delay = token_delay
+        self.embedding_dim = embedding_dim
+        self.audio = b"ID3" + bytes(audio_kb * 1024)
+        self.flag_words = tuple(w.casefold() for w in flag_words)
+        self.counts: Dict[str, int] = {kind: 0 for kind in self.latency}
+        self._counts_lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def count(self, kind: str) -> None:
+        with self._counts_lock:
+            self.counts[kind] += 1
+
+    def wait(self, kind: str) -> None:
+        time.sleep(self.latency[kind] * random.uniform(0.8, 1.2))
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeOpenAIServer
+
+    def log_message(self, format, *args):
+        pass   # one line per request would dominate a load test's output
+
+    # -------- plumbing --------
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, payload: dict, status: int = 200) -> None:
+        self._send(status, json.dumps(payload).encode("utf-8"))
+
+    def do_POST(self):
+        kind = ROUTES.get(self.path.split("?", 1)[0])
+        raw = self._body()
+        if kind is None:
+            return self._json({"error": {"message": f"unknown path {self.path}", "type": "invalid_request_error"}}, 404)
+        self.server.count(kind)
+        self.server.wait(kind)
+        if kind == "transcriptions":   # multipart upload: nothing to parse
+            return self._json({"text": TRANSCRIPT})
+        body = json.loads(raw or b"{}")
+        getattr(self, f"_{kind}")(body)
+
+    # -------- endpoints --------
+
+    def _chat(self, body: dict) -> None:
+        prompt = "\n".join(m.get("content") or "" for m in body.get("messages", []) if isinstance(m.get("content"), str))
+        titles = CANDIDATE_TITLE_RE.findall(prompt) if body.get("tools") else []
+        arguments = json.dumps({"title": titles[0]}) if titles else None
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(OPENER) // 4,
+                 "total_tokens": (len(prompt) + len(OPENER)) // 4}
+        meta = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "created": int(time.time()), "model": body.get("model")}
+
+        if not body.get("stream"):
+            message = {"role": "assistant", "content": OPENER}
+            if arguments:
+                message["tool_calls"] = [{"id": "call_0", "type": "function",
+                                          "function": {"name": "get_summary_by_title", "arguments": arguments}}]
+            return self._json({**meta, "object": "chat.completion", "usage": usage, "choices": [
+                {"index": 0, "message": message, "finish_reason": "tool_calls" if arguments else "stop"}]})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def chunk(delta: Optional[dict], finish: Optional[str] = None, **extra) -> None:
+            choices = [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish}]
+            payload = {**meta, "object": "chat.completion.chunk", "choices": choices, **extra}
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        chunk({"role": "assistant", "content": ""})
+        for i, word in enumerate(OPENER.split(" ")):
+            time.sleep(self.server.token_delay)
+            chunk({"content": word if i == 0 else " " + word})
+        if arguments:
+            half = len(arguments) // 2
+            chunk({"tool_calls": [{"index": 0, "id": "call_0", "type": "function",
+                                   "function": {"name": "get_summary_by_title", "arguments": arguments[:half]}}]})
+            chunk({"tool_calls": [{"index": 0, "function": {"arguments": arguments[half:]}}]})
+        chunk({}, finish="tool_calls" if arguments else "stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            chunk(None, usage=usage)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _embeddings(self, body: dict) -> None:
+        inputs = body.get("input")
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]    # one text, or one pre-tokenized text
+        data = []
+        for i, text in enumerate(inputs or []):
+            seed = int.from_bytes(hashlib.sha256(json.dumps(text).encode("utf-8")).digest()[:8], "little")
+            vector = np.random.default_rng(seed).standard_normal(self.server.embedding_dim)
+            vector /= np.linalg.norm(vector)
+            if body.get("encoding_format") == "base64":   # the SDK's default: packed float32
+                embedding = base64.b64encode(vector.astype(np.float32).tobytes()).decode("ascii")
+            else:
+                embedding = vector.round(6).tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        tokens = sum(len(json.dumps(t)) // 4 for t in inputs or [])
+        self._json({"object": "list", "data": data, "model": body.get("model"),
+                    "usage": {"prompt_tokens": tokens, "total_tokens": tokens}})
+
+    def _moderations(self, body: dict) -> None:
+        text = body.get("input")
+        text = " ".join(text) if isinstance(text, list) else (text or "")
+        flagged = any(word in text.casefold() for word in self.server.flag_words)
+        self._json({"id": f"modr-{uuid.uuid4().hex[:12]}", "model": body.get("model"), "results": [
+            {"flagged": flagged, "categories": {"harassment": flagged}, "category_scores": {"harassment": 0.9 if flagged else 0.0}}]})
+
+    def _images(self, body: dict) -> None:
+        self._json({"created": int(time.time()), "data": [{"b64_json": PNG_1X1}]})
+
+    def _speech(self, body: dict) -> None:
+        self._send(200, self.server.audio, "audio/mpeg")
+
+
+def start_fake_openai(host: str = "127.0.0.1", port: int = 0, **options) -> FakeOpenAIServer:
+    """Start the server on a background thread (port 0 = any free port)."""
+    server = FakeOpenAIServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", default="", help="per-kind seconds, e.g. chat=0.5,images=1")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="seconds between streamed chunks")
+    parser.add_argument("--embedding-dim", type=int, default=256)
+    parser.add_argument("--audio-kb", type=int, default=32)
+    parser.add_argument("--flag-words", default="badword", help="comma-separated words moderation flags")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer((args.host, args.port), latency=parse_latency(args.latency),
+                              token_delay=args.token_delay, embedding_dim=args.embedding_dim,
+                              audio_kb=args.audio_kb, flag_words=args.flag_words.split(","))
+    print(f"Fake OpenAI API on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+# benchmarks/load_test.py
+"""
+Offline load test: boots the app against the fake OpenAI server
+(benchmarks/fake_openai.py) and a throwaway SQLite database, drives a weighted
+mix of endpoints from many virtual users, and reports per endpoint the
+request count, errors, throughput and p50/p95/p99 latency, plus the app's
+resident memory (RSS, whole process tree).
+
+    python -m benchmarks.load_test [--duration 30] [--concurrency 16] [--users 32]
+        [--mix send=5,open=3,list=3,stt=1,login=1] [--per-endpoint]
+        [--latency chat=0.3,embeddings=0.02] [--label my-change] [--compare benchmarks/results/<file>.json]
+
+With --per-endpoint every endpoint is driven alone for --duration, so the RSS
+columns belong to that endpoint. Results are written to benchmarks/results/
+(named after the commit) for comparison with --compare. --app-cmd runs another
+server, e.g. "gunicorn -c gunicorn.conf.py -b 127.0.0.1:{port} main:app".
+"""
+import argparse
+import json
+import os
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from http.cookiejar import CookieJar
+from typing import Dict, List, Optional
+
+from benchmarks.fake_openai import parse_latency, start_fake_openai
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "results")
+DEFAULT_MIX = "send=5,open=3,list=3,stt=1,login=1"
+DEFAULT_APP_CMD = (f"{shlex.quote(sys.executable)} -m flask --app main run --host 127.0.0.1 --port {{port}} "
+                   f"--no-reload --no-debugger --with-threads")
+
+QUERIES = [
+    "Recommend me a book about friendship and adventure",
+    "I want a dystopian novel",
+    "Something about war and courage please",
+    "Tell me about The Hobbit",
+    "books about magic",
+    "A story about family and loss",
+    "What should I read if I liked 1984?",
+    "coming of age stories",
+]
+
+
+# -------- measurement helpers --------
+
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(p / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _children(pid: int) -> List[int]:
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children.extend(int(c) for c in f.read().split())
+    except OSError:
+        pass
+    return children
+
+
+def tree_rss_mb(pid: int) -> Optional[float]:
+    """RSS of a process and all its descendants (Linux /proc), e.g. every gunicorn worker."""
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+                        break
+        except OSError:
+            if current == pid:
+                return None
+            continue
+        stack.extend(_children(current))
+    return total / 1024
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, pid: int, interval: float = 0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[float] = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            rss = tree_rss_mb(self.pid)
+            if rss is not None:
+                self.samples.append(rss)
+            self._stop_event.wait(self.interval)
+
+    def stop(self) -> dict:
+        self._stop_event.set()
+        self.join()
+        if not self.samples:
+            return {}
+        return {"start_mb": round(self.samples[0], 1), "peak_mb": round(max(self.samples), 1),
+                "end_mb": round(self.samples[-1], 1)}
+
+
+# -------- virtual users --------
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None   # measure the login/register response itself, not the page it redirects to
+
+
+class VirtualUser:
+    def __init__(self, base_url: str, timeout: float):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.username = f"bench_{uuid.uuid4().hex[:10]}"
+        self.password = "bench-password"
+        self.conv_id: Optional[int] = None
+        self.last_seq: Optional[int] = None
+        self._opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect)
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None, content_type: Optional[str] = None):
+        """(status, body bytes); any HTTP status is returned, network errors raise."""
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        if content_type:
+            req.add_header("Content-Type", content_type)
+        try:
+            with self._opener.open(req, timeout=self.timeout) as resp:
+                return resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def form(self, path: str, fields: dict):
+        return self.request("POST", path, urllib.parse.urlencode(fields).encode(), "application/x-www-form-urlencoded")
+
+    def json(self, path: str, payload: dict):
+        return self.request("POST", path, json.dumps(payload).encode(), "application/json")
+
+    # The auth forms answer failures with 200 and an alert() page, so success is read from the response
+
+    def register(self):
+        status, body = self.form("/auth/register", {
+            "username": self.username, "email": f"{self.username}@bench.local", "password": self.password})
+        return (status if b"successful" in body else 400), body
+
+    def login(self):
+        status, body = self.form("/auth/login", {"username": self.username, "password": self.password})
+        return (status if status in (302, 303) else 400), body
+
+    def send(self):
+        payload = {"message": random.choice(QUERIES)}
+        if self.conv_id is not None:
+            payload.update({"conv_id": self.conv_id, "after_seq": self.last_seq or 0})
+        status, body = self.json("/api/send", payload)
+        if status == 200:
+            data = json.loads(body)
+            self.conv_id = data["conv"]["id"]
+            seqs = [m["seq"] for m in data.get("messages", []) if "seq" in m]
+            if seqs:
+                self.last_seq = max(seqs)
+        return status, body
+
+    def stream(self):
+        payload = {"message": random.choice(QUERIES), "conv_id": self.conv_id}
+        return self.json("/api/send/stream", payload)
+
+    def open(self):
+        return self.json("/api/open", {"conv_id": self.conv_id})
+
+    def list(self):
+        return self.request("GET", "/api/list")
+
+    def stt(self):
+        boundary = uuid.uuid4().hex
+        body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"audio\"; filename=\"speech.webm\"\r\n"
+                f"Content-Type: audio/webm\r\n\r\n").encode() + os.urandom(16 * 1024) + f"\r\n--{boundary}--\r\n".encode()
+        return self.request("POST", "/api/stt", body, f"multipart/form-data; boundary={boundary}")
+
+
+ENDPOINTS = {
+    "send": VirtualUser.send,
+    "stream": VirtualUser.stream,
+    "open": VirtualUser.open,
+    "list": VirtualUser.list,
+    "stt": VirtualUser.stt,
+    "login": VirtualUser.login,
+}
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise ValueError(f"unknown endpoint {name!r} (one of {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+# -------- driving load --------
+
+def run_phase(users: List[VirtualUser], mix: Dict[str, float], duration: float, concurrency: int) -> dict:
+    """Drive the mix with `concurrency` closed-loop workers for `duration` seconds."""
+    names, weights = list(mix), list(mix.values())
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(index: int):
+        rng = random.Random(index)
+        mine = users[index::concurrency] or users
+        i = 0
+        while time.monotonic() < deadline:
+            user = mine[i % len(mine)]
+            i += 1
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                status, _ = ENDPOINTS[name](user)
+                ok = status < 400
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies[name].append(elapsed)
+                if not ok:
+                    errors[name] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    out = {}
+    for name in names:
+        values = sorted(latencies[name])
+        out[name] = {
+            "requests": len(values),
+            "errors": errors[name],
+            "rps": round(len(values) / wall, 2),
+            **{f"p{p}_ms": round(percentile(values, p) * 1000, 1) if values else None for p in (50, 95, 99)},
+            "mean_ms": round(sum(values) / len(values) * 1000, 1) if values else None,
+        }
+    return {"seconds": round(wall, 2), "endpoints": out}
+
+
+def wait_for_200(url: str, proc: subprocess.Popen, timeout: float) -> bool:
+    """Poll until `url` answers 200; False if it answers 404 (an older commit without it)."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"app exited with code {proc.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=2) as resp:
+                if resp.status == 200:
+                    return True
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return False
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} not 200 after {timeout}s")
+
+
+def wait_until_ready(base_url: str, proc: subprocess.Popen, timeout: float = 300) -> dict:
+    """Seconds from launch until the app serves pages, and until /readyz says the catalog is loaded."""
+    started = time.monotonic()
+    wait_for_200(base_url + "/auth/index", proc, timeout)
+    startup = {"up_seconds": round(time.monotonic() - started, 2)}
+    if wait_for_200(base_url + "/readyz", proc, timeout):
+        startup["ready_seconds"] = round(time.monotonic() - started, 2)
+    return startup
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def git_revision() -> dict:
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=REPO_DIR, capture_output=True, text=True)
+    rev = git("rev-parse", "--short", "HEAD").stdout.strip() or "unknown"
+    return {"commit": rev, "dirty": git("diff", "--quiet", "HEAD").returncode == 1}
+
+
+# -------- reporting --------
+
+def print_phase(title: str, phase: dict, rss: dict) -> None:
+    print(f"\n{title} ({phase['seconds']}s)  RSS start {rss.get('start_mb')} MB, "
+          f"peak {rss.get('peak_mb')} MB, end {rss.get('end_mb')} MB")
+    print(f"  {'endpoint':<8} {'requests':>8} {'errors':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, r in phase["endpoints"].items():
+        print(f"  {name:<8} {r['requests']:>8} {r['errors']:>6} {r['rps']:>8} "
+              f"{r['p50_ms'] or '-':>8} {r['p95_ms'] or '-':>8} {r['p99_ms'] or '-':>8}")
+
+
+def compare(current: dict, previous_path: str) -> None:
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\nvs {os.path.basename(previous_path)} ({previous['git']['commit']}):")
+    for phase_name, phase in current["phases"].items():
+        before = previous["phases"].get(phase_name)
+        if not before:
+            continue
+        for name, r in phase["endpoints"].items():
+            b = before["endpoints"].get(name)
+            if not b:
+                continue
+            deltas = []
+            for key in ("p50_ms", "p95_ms", "p99_ms", "rps"):
+                if r[key] and b[key]:
+                    deltas.append(f"{key} {b[key]} → {r[key]} ({(r[key] - b[key]) / b[key] * 100:+.0f}%)")
+            print(f"  [{phase_name}] {name:<8} " + ", ".join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=30, help="seconds per phase")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight")
+    parser.add_argument("--users", type=int, default=32, help="virtual users (accounts with one conversation each)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"endpoint weights (default {DEFAULT_MIX})")
+    parser.add_argument("--per-endpoint", action="store_true", help="one phase per endpoint instead of the mix")
+    parser.add_argument("--latency", default="", help="fake OpenAI latency per kind, e.g. chat=0.5,images=1")
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--vector-backend", choices=["chroma", "numpy"], default="chroma")
+    parser.add_argument("--app-cmd", default=DEFAULT_APP_CMD, help="command serving the app; {port} is substituted")
+    parser.add_argument("--timeout", type=float, default=120, help="per-request timeout")
+    parser.add_argument("--label", default="", help="suffix for the results file name")
+    parser.add_argument("--compare", help="earlier results file to print deltas against")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    fake = start_fake_openai(latency=parse_latency(args.latency), token_delay=args.token_delay)
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+
+    with tempfile.TemporaryDirectory(prefix="librarian-bench-") as workdir:
+        env = {
+            **os.environ,
+            "PYTHONPATH": os.pathsep.join(filter(None, [REPO_DIR, os.environ.get("PYTHONPATH")])),
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.sqlite3')}?timeout=30",
+            "OPENAI_BASE_URL": fake.base_url,
+            "OPENAI_API_KEY": "bench",
+            "SUMMARY_FILES": os.environ.get("SUMMARY_FILES") or os.path.join(REPO_DIR, "data", "book_summaries.txt"),
+            "VECTOR_BACKEND": args.vector_backend,
+            "EMBED_TOKENIZE": "0",          # tiktoken would download its encoding
+            "ANONYMIZED_TELEMETRY": "False",
+            "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+        }
+        # cwd = workdir: embeddings/, cache/ and media/ are relative paths
+        app_log = open(os.path.join(workdir, "app.log"), "w+b")
+        proc = subprocess.Popen(shlex.split(args.app_cmd.format(port=port)), cwd=workdir, env=env,
+                                stdout=app_log, stderr=subprocess.STDOUT)
+        try:
+            startup = wait_until_ready(base_url, proc)
+            users = [VirtualUser(base_url, args.timeout) for _ in range(args.users)]
+            for user in users:
+                for step in (user.register, user.login):
+                    status, body = step()
+                    if status >= 400:
+                        raise RuntimeError(f"{step.__name__} failed for {user.username}: {body[:300]!r}")
+            # Warm-up, not measured: loads the catalog and index, gives everyone a conversation
+            for user in users:
+                status, body = user.send()
+                if status != 200:
+                    raise RuntimeError(f"warm-up /api/send failed ({status}): {body[:300]!r}")
+            print(f"{args.users} users, concurrency {args.concurrency}, {args.duration}s per phase, "
+                  f"app {base_url} (pid {proc.pid}), fake OpenAI {fake.base_url}")
+            print(f"startup: serving after {startup['up_seconds']}s, "
+                  f"catalog ready after {startup.get('ready_seconds', '-')}s")
+
+            phases = {}
+            plan = [(name, {name: 1.0}) for name in mix] if args.per_endpoint else [("mix", mix)]
+            for phase_name, phase_mix in plan:
+                sampler = RssSampler(proc.pid)
+                sampler.start()
+                phase = run_phase(users, phase_mix, args.duration, args.concurrency)
+                phase["rss"] = sampler.stop()
+                phases[phase_name] = phase
+                print_phase(phase_name, phase, phase["rss"])
+        except Exception:
+            app_log.seek(0)
+            sys.stderr.write(app_log.read()[-4000:].decode("utf-8", "replace"))
+            raise
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            app_log.close()
+            fake.shutdown()
+
+    result = {
+        "git": git_revision(),
+        "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "config": {k: v for k, v in vars(args).items() if k not in ("compare", "no_save")},
+        "openai_calls": dict(fake.counts),
+        "startup": startup,
+        "phases": phases,
+    }
+    if args.compare:
+        compare(result, args.compare)
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        name = "-".join(filter(None, [stamp, result["git"]["commit"], args.label])) + ".json"
+        path = os.path.join(RESULTS_DIR, name)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=1)
+        print(f"\nSaved {os.path.relpath(path, REPO_DIR)}")
+
+
+if __name__ == "__main__":
+    main()
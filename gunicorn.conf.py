@@ -0,0 +1,59 @@
+# gunicorn.conf.py
+"""
+Production serving: `gunicorn -c gunicorn.conf.py` (see README, "Production").
+
+The master imports wsgi.py once (schema, app, catalog and its indexes) and
+forks the workers, which share that memory copy-on-write. What can't cross a
+fork (DB connection pools, OpenAI HTTP clients, the stage thread pool, Chroma's
+SQLite connections) is re-created in each worker: see os.register_at_fork in
+those modules.
+
+`kill -HUP <master pid>` reloads the catalog in the master, then starts new
+workers from it and lets the old ones finish their requests (graceful_timeout).
+"""
+import gc
+import os
+
+# main.py leaves the media job threads to the workers (threads don't survive fork, see post_fork)
+os.environ["SERVER_PREFORK"] = "1"
+
+wsgi_app = "wsgi:app"
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}")
+preload_app = True
+
+# A request spends most of its time waiting on the OpenAI API, holding its
+# thread all along (a streamed reply for its whole duration), so threads carry
+# the concurrency: WEB_WORKERS x WEB_THREADS requests in flight. Workers add
+# CPU parallelism (JSON, BM25, numpy search) and cost little memory each.
+worker_class = "gthread"
+workers = int(os.getenv("WEB_WORKERS", str(os.cpu_count() or 1)))
+threads = int(os.getenv("WEB_THREADS", "16"))
+# Heartbeat of the worker process, not a request deadline (stages have their own timeouts)
+timeout = int(os.getenv("WEB_TIMEOUT", "60"))
+# How long replaced workers may finish requests in flight: above the slowest stage (IMAGE_TIMEOUT)
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "150"))
+keepalive = int(os.getenv("WEB_KEEPALIVE", "5"))
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", "0"))   # recycle workers after this many requests; 0 = never
+max_requests_jitter = max_requests // 10
+
+accesslog = None   # every request is already logged by the app, with its stage timings
+
+
+def pre_fork(server, worker):
+    # Keep the preloaded objects out of the cyclic GC: collections would write to
+    # their headers and turn the shared pages into per-worker copies
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from smart_librarian.utils.job_queue import get_job_queue
+    get_job_queue().start()
+
+
+def on_reload(server):
+    # Runs in the master before the replacement workers are forked from it
+    from smart_librarian.models.catalog import get_catalog
+    try:
+        get_catalog().reload()
+    except Exception:
+        server.log.exception("catalog reload failed; keeping the current catalog")
@@ -5,11 +5,30 @@ from smart_librarian.router import Router
 from flask import request
 from smart_librarian.database.user_db import init_db
 from smart_librarian.database.chat_db import init_chat_db
+from smart_librarian.database.job_db import init_job_db
+from smart_librarian.utils.job_queue import get_job_queue
+from smart_librarian.models.catalog import get_catalog, CATALOG_WARMUP
 
 app = create_app()
 router = Router()
 init_db()
 init_chat_db()
+init_job_db()
+router.preload()  # resolve controllers once instead of per request
+
+
+def _serves_requests() -> bool:
+    """False in a pre-fork master (gunicorn.conf.py starts the workers' background
+    work) and in the file watcher of `python main.py`, whose app runs in a child."""
+    if os.getenv("SERVER_PREFORK") == "1":
+        return False
+    return not (__name__ == "__main__" and os.getenv("WERKZEUG_RUN_MAIN") != "true")
+
+
+if _serves_requests():
+    get_job_queue().start()  # image/TTS workers + sweeper for jobs left over from a restart
+    if CATALOG_WARMUP:
+        get_catalog().warm_up()  # in the background: /readyz reports when it's done
 
 
 @app.route('/', defaults={'path': ''}, methods=['GET', 'POST'])
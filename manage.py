@@ -0,0 +1,86 @@
+# manage.py
+import argparse
+import os
+
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+
+
+def cmd_migrate_media(args):
+    from smart_librarian.database.migrations import migrate_inline_media
+    stats = migrate_inline_media(batch_size=args.batch_size)
+    print(f"✅ Media migration done: {stats}")
+
+
+def cmd_migrate_messages(args):
+    from smart_librarian.database.migrations import migrate_messages_table
+    stats = migrate_messages_table(batch_size=args.batch_size)
+    print(f"✅ Messages migration done: {stats}")
+
+
+def cmd_backfill_messages(args):
+    from smart_librarian.database.migrations import backfill_message_text
+    stats = backfill_message_text(batch_size=args.batch_size)
+    print(f"✅ Message backfill done: {stats}")
+
+
+def cmd_reindex(args):
+    from smart_librarian.models.indexer import sync_index
+    from smart_librarian.models.book_model import summary_sources, iter_records, iter_documents
+    docs = iter_documents(iter_records(args.file or summary_sources()))
+    result = sync_index(docs, backend=args.backend, full=args.full,
+                        batch_size=args.batch_size, concurrency=args.concurrency)
+    print(f"✅ Reindex done: {result.stats}")
+
+
+def cmd_build_catalog(args):
+    from smart_librarian.models.book_model import summary_sources
+    from smart_librarian.models.catalog_store import open_catalog_store
+    store = open_catalog_store(args.file or summary_sources(), rebuild=True)
+    print(f"✅ Catalog store built: {store.stats()}")
+
+
+def cmd_prerender_tts(args):
+    from smart_librarian.models.speech import prerender_catalog
+    stats = prerender_catalog(concurrency=args.concurrency, limit=args.limit)
+    print(f"✅ TTS pre-render done: {stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Smart Librarian maintenance commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("migrate-media", help="move inline base64 media from conversations into the media store")
+    p.add_argument("--batch-size", type=int, default=50)
+    p.set_defaults(func=cmd_migrate_media)
+
+    p = sub.add_parser("migrate-messages", help="move conversations.messages JSONB arrays into the messages table")
+    p.add_argument("--batch-size", type=int, default=50)
+    p.set_defaults(func=cmd_migrate_messages)
+
+    p = sub.add_parser("backfill-messages", help="precompute the LLM-ready text and media references of old messages")
+    p.add_argument("--batch-size", type=int, default=200)
+    p.set_defaults(func=cmd_backfill_messages)
+
+    p = sub.add_parser("reindex", help="embed new/changed summaries and drop removed ones from the vector index")
+    p.add_argument("--file", action="append", help="summaries file to index (repeatable; default $SUMMARY_FILES)")
+    p.add_argument("--backend", choices=["chroma", "numpy"], default=VECTOR_BACKEND)
+    p.add_argument("--full", action="store_true", help="ignore the manifest and re-embed everything")
+    p.add_argument("--batch-size", type=int, default=256)
+    p.add_argument("--concurrency", type=int, default=4, help="embedding requests in flight")
+    p.set_defaults(func=cmd_reindex)
+
+    p = sub.add_parser("build-catalog", help="rebuild the memory-mapped catalog store from the summary files")
+    p.add_argument("--file", action="append", help="summaries file (repeatable; default $SUMMARY_FILES)")
+    p.set_defaults(func=cmd_build_catalog)
+
+    p = sub.add_parser("prerender-tts", help="synthesize and cache the spoken summary of every catalog title")
+    p.add_argument("--concurrency", type=int, default=4, help="TTS requests in flight")
+    p.add_argument("--limit", type=int, default=None, help="render at most this many titles")
+    p.set_defaults(func=cmd_prerender_tts)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,12 @@ def create_app():
     # Point templates to the package's templates folder
     template_folder = os.path.join(os.path.dirname(__file__), "templates")
     app = Flask(__name__, template_folder=template_folder)
+    from smart_librarian.utils.metrics import init_metrics
+    init_metrics(app)
     from smart_librarian.api.message_api import api_bp
     app.register_blueprint(api_bp)
+    from smart_librarian.api.media_api import media_bp
+    app.register_blueprint(media_bp)
+    from smart_librarian.api.health_api import health_bp
+    app.register_blueprint(health_bp)
     return app
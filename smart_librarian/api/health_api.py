@@ -0,0 +1,20 @@
+# smart_librarian/api/health_api.py
+from flask import Blueprint, jsonify
+
+from smart_librarian.models.catalog import get_catalog
+
+health_bp = Blueprint("health", __name__)
+
+
+@health_bp.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving requests. Checks nothing else."""
+    return jsonify({"status": "ok"})
+
+
+@health_bp.get("/readyz")
+def readyz():
+    """Readiness: 200 once the catalog (store, indexes, vector index) is loaded, 503 until then."""
+    catalog = get_catalog().status()
+    ready = catalog["state"] == "ready"
+    return jsonify({"ready": ready, "catalog": catalog}), 200 if ready else 503
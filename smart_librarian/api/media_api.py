@@ -0,0 +1,33 @@
+# smart_librarian/api/media_api.py
+from flask import Blueprint, jsonify, request, send_file, Response
+from smart_librarian.utils.auth_guard import current_user
+from smart_librarian.database.media_store import get_media_store, mime_for, MEDIA_ID_RE
+
+media_bp = Blueprint("media", __name__, url_prefix="/api/media")
+
+# Blobs are content-addressed, so a given URL never changes content
+MEDIA_MAX_AGE = 60 * 60 * 24 * 365
+
+
+@media_bp.get("/<media_id>")
+def get_media(media_id):
+    if not current_user():
+        return jsonify({"error": "unauthorized"}), 401
+    if not MEDIA_ID_RE.match(media_id):
+        return jsonify({"error": "not_found"}), 404
+
+    store = get_media_store()
+    path = store.local_path(media_id)
+    if path:
+        # conditional=True gives us ETag/If-None-Match and Range/206 handling
+        resp = send_file(path, mimetype=mime_for(media_id), conditional=True,
+                         etag=media_id.split(".")[0], max_age=MEDIA_MAX_AGE)
+    else:
+        data = store.read(media_id)
+        if data is None:
+            return jsonify({"error": "not_found"}), 404
+        resp = Response(data, mimetype=mime_for(media_id))
+        resp.set_etag(media_id.split(".")[0])
+        resp = resp.make_conditional(request, accept_ranges=True, complete_length=len(data))
+    resp.headers["Cache-Control"] = f"private, max-age={MEDIA_MAX_AGE}, immutable"
+    return resp
@@ -1,39 +1,56 @@
 # smart_librarian/api/message_api.py
-from flask import Blueprint, request, jsonify,Response
+from flask import Blueprint, request, jsonify,Response, stream_with_context
 from smart_librarian.utils.auth_guard import current_user
-from smart_librarian.utils.message_helper import check_profanity,sanitize_ctx_messages,to_b64
+from smart_librarian.utils.message_helper import check_profanity,media_tag,api_error
+from smart_librarian.utils.stages import run_async, wait_for, completed, stage_timeout, StageTimeout
+from smart_librarian.database.media_store import get_media_store, media_url
 from smart_librarian.database.chat_db import Conversation
+from smart_librarian.database.engine import DATABASE_REPLICA_URL, DB_REPLICA_PIN_SECONDS, REPLICA_PIN_COOKIE
+from smart_librarian.utils.job_queue import get_job_queue
+from smart_librarian.utils.log import get_logger
+from smart_librarian.utils.metrics import timed, timed_stage, record, record_tokens
+from smart_librarian.utils.openai_client import get_openai
 import json
-from uuid import uuid4
-from openai import OpenAI
-import tempfile
+import hashlib
+import threading
+import time
+from concurrent.futures import as_completed
 import os
-from smart_librarian.models.book_model import load_summaries, build_vectorstore,get_summary_by_title,titles
-import base64
-import io
-import openai
+from smart_librarian.models.book_model import get_summary_by_title
+from smart_librarian.models.catalog import get_catalog
+from smart_librarian.models.answer_cache import lookup_answer, store_answer, answer_cache_stats
+from smart_librarian.models.context import build_context, roll_summary
+from smart_librarian.models.moderation import fails_closed, moderation_stats
+from smart_librarian.models.images import generate_image, image_cache_stats
+from smart_librarian.models.speech import synthesize_speech, tts_text, tts_cache_stats, TTS_VOICE
 api_bp = Blueprint("api", __name__, url_prefix="/api")
+log = get_logger(__name__)
 
 COOKIE_CONV = "current_conv_id"
-summaries = load_summaries()
-VECTORSTORE = build_vectorstore(summaries)
 GPT_MODEL="gpt-4o-mini"
-# print(summaries)
-
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-tools = [
+PAGE_SIZE = 50        # messages per history page
+MAX_PAGE_SIZE = 200
+# "1": image/TTS for /api/send run as background jobs and the reply returns right away
+MEDIA_JOBS = os.getenv("MEDIA_JOBS", "1") == "1"
+MAX_JOB_WAIT = 25     # seconds a /api/jobs/<id>?wait= long-poll may hang
+# Endpoints that change conversations: their responses pin the client's reads to the primary
+WRITE_ENDPOINTS = {"api.api_new", "api.api_delete", "api.api_send", "api.api_send_stream"}
+
+# Titles are resolved server-side (see TitleIndex), so the schema stays the same size
+# whatever the catalog holds
+TOOLS = [
     {
         "type": "function",
         "function": {
             "name": "get_summary_by_title",
-            "description": "Retrieves the FULL summary for the given exact book title.",
+            "description": "Retrieves the FULL summary for the given book title. "
+                           "Spelling, case and punctuation variants are resolved to the library's title.",
             "parameters": {
                 "type": "object",
                 "properties": {
                     "title": {
                         "type": "string",
-                        "enum": titles,
-                        "description": "Exact title of the book (must match a candidate)."
+                        "description": "Title of the book, preferably as written in the candidate list."
                     }
                 },
                 "required": ["title"],
@@ -49,31 +66,121 @@ def _require_user():
     if not u: return None, (jsonify({"error":"unauthorized"}), 401)
     return u, None
 
+def _page_limit(value) -> int:
+    try:
+        return max(1, min(int(value), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+
+def _history_page(user, conv_id: int, before_seq=None, limit: int = PAGE_SIZE) -> dict:
+    """One page of history (oldest → newest) plus the cursor to fetch the page before it."""
+    msgs = Conversation.get_messages(user, conv_id, before_seq=before_seq, limit=limit)
+    has_older = bool(msgs) and msgs[0]["seq"] > 1
+    return {"messages": msgs, "cursor": {"before_seq": msgs[0]["seq"]} if has_older else None}
+
+def _optional_int(value):
+    try:
+        return int(value) if value is not None and value != "" else None
+    except (TypeError, ValueError):
+        return None
+
+def _new_messages(user, conv_id: int, after_seq: int) -> list:
+    """Delta mode: only the messages the client hasn't seen yet."""
+    return Conversation.get_messages(user, conv_id, after_seq=after_seq, limit=None)
+
+def _etag(*parts) -> str:
+    return hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+def _not_modified(etag: str):
+    """304 response if the client's If-None-Match already has this version, else None."""
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "private, no-cache"
+        return resp
+    return None
+
+def _with_etag(resp, etag: str):
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"   # cache, but always revalidate
+    return resp
+
+@api_bp.after_request
+def _pin_reads_to_primary(response):
+    if DATABASE_REPLICA_URL and request.endpoint in WRITE_ENDPOINTS:
+        response.set_cookie(REPLICA_PIN_COOKIE, "1", max_age=DB_REPLICA_PIN_SECONDS, httponly=True, samesite="Strict")
+    return response
+
+def _replica_reads() -> bool:
+    """Lag-tolerant reads may use the replica, unless this client wrote moments ago."""
+    return REPLICA_PIN_COOKIE not in request.cookies
+
 @api_bp.get("/list")
 def list_convs():
     user, err = _require_user()
     if err: 
         return err
-    convs = Conversation.list_conversations(user)
-    return jsonify({"conversations": [
+    # Cheap aggregate first: unchanged lists are answered without loading rows.
+    # Both reads use the same database, so the ETag always matches the list it is sent with.
+    replica = _replica_reads()
+    etag = _etag("list", user, *Conversation.list_version(user, replica=replica))
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+    convs = Conversation.list_conversations(user, replica=replica)
+    return _with_etag(jsonify({"conversations": [
         {"id": c["id"], "title": c["title"], "updated_at": str(c["updated_at"])} for c in convs
-    ]})
+    ]}), etag)
 
 @api_bp.post("/open")
 def api_open():
     user, err = _require_user()  
     if err: 
         return err
-    conv_id = (request.get_json(silent=True) or {}).get("conv_id")
+    data = request.get_json(silent=True) or {}
+    conv_id = data.get("conv_id")
     if not conv_id:
         return jsonify({"error":"missing_conv_id"}), 400
+    # Primary: the ETag must come from the same database as the messages it covers
     conv = Conversation.get_conversation(user, int(conv_id))
     if not conv: return jsonify({"error":"not_found"}), 404
+
+    after_seq = _optional_int(data.get("after_seq"))
+    limit = _page_limit(data.get("limit"))
+    etag = _etag("open", conv["id"], conv["updated_at"], conv["last_seq"], limit, after_seq)
+    not_modified = _not_modified(etag)
+    if not_modified:
+        not_modified.set_cookie(COOKIE_CONV, str(conv["id"]), httponly=True, samesite="Strict")
+        return not_modified
+
+    if after_seq is not None:
+        # Delta: the client already has everything up to after_seq
+        page = {"messages": _new_messages(user, conv["id"], after_seq), "cursor": None}
+    else:
+        # Only the latest page; older history is fetched with /api/messages + cursor
+        page = _history_page(user, conv["id"], limit=limit)
     resp = jsonify({"conv": {
-        "id": conv["id"], "title": conv["title"], "messages": conv.get("messages", [])
+        "id": conv["id"], "title": conv["title"], "messages": page["messages"], "cursor": page["cursor"],
+        "last_seq": conv["last_seq"], "delta": after_seq is not None
     }})
     resp.set_cookie(COOKIE_CONV, str(conv["id"]), httponly=True, samesite="Strict")
-    return resp
+    return _with_etag(resp, etag)
+
+@api_bp.post("/messages")
+def api_messages():
+    user, err = _require_user()
+    if err:
+        return err
+    data = request.get_json(silent=True) or {}
+    conv_id = data.get("conv_id")
+    if not conv_id:
+        return jsonify({"error":"missing_conv_id"}), 400
+    after_seq = _optional_int(data.get("after_seq"))
+    if after_seq is not None:
+        return jsonify({"conv_id": int(conv_id), "messages": _new_messages(user, int(conv_id), after_seq), "cursor": None})
+    page = _history_page(user, int(conv_id), before_seq=_optional_int(data.get("before_seq")),
+                         limit=_page_limit(data.get("limit")))
+    return jsonify({"conv_id": int(conv_id), **page})
 
 @api_bp.post("/new")
 def api_new():
@@ -82,7 +189,7 @@ def api_new():
         return err
     cid = Conversation.create_conversation(user, "New chat")
     conv = Conversation.get_conversation(user, cid)
-    resp = jsonify({"conv": {"id": conv["id"], "title": conv["title"], "messages": []}})
+    resp = jsonify({"conv": {"id": conv["id"], "title": conv["title"], "messages": [], "cursor": None}})
     resp.set_cookie(COOKIE_CONV, str(cid), httponly=True, samesite="Strict")
     return resp
 
@@ -96,55 +203,38 @@ def api_delete():
     Conversation.delete_conversation(user, int(conv_id))
     return jsonify({"ok": True})
 
-@api_bp.post("/send")
-def api_send():
-    user, err = _require_user()
-    if err:
-        return err
+PROFANITY_WARNING = ("Inappropriate language was detected. This message was flagged and you won't get a reply for it. "
+                     "Please use an appropriate manner")
 
-    data = request.get_json(silent=True) or {}
-    user_msg = (data.get("message") or "").strip()
-    if not user_msg:
-        return jsonify({"error": "empty_message"}), 400
 
+def _open_or_create_conversation(user, data):
     conv_id = data.get("conv_id") or request.cookies.get(COOKIE_CONV) or Conversation.create_conversation(user, "New chat")
-    conv_id = int(conv_id)
-    conv = Conversation.get_conversation(user, conv_id) or Conversation.get_conversation(
+    conv = Conversation.get_conversation(user, int(conv_id)) or Conversation.get_conversation(
         user, Conversation.create_conversation(user, "New chat")
     )
+    return conv["id"], conv
 
-    # --- PROFANITY: show but don't persist ---
-    if check_profanity(client, user_msg) is True:
-        warning = ("Inappropriate language was detected. This message was flagged and you won't get a reply for it. "
-                "Please use an appropriate manner")
-        resp_json = jsonify({
-            "ok": True,
-            "conv": {"id": conv_id, "title": conv["title"]},
-            "messages": conv.get("messages", []),  # DB-backed; unchanged
-            # NEW: UI-only hints
-            "profanity_warning": warning,
-            "ephemeral_user_message": user_msg
-        })
-        resp_json.set_cookie(COOKIE_CONV, str(conv_id), httponly=True, samesite="Strict")
-        return resp_json
 
-    
-    if not conv.get("messages"):
-        Conversation.set_title(user, conv_id, user_msg[:60])
-    Conversation.add_message(user, conv_id, "user", user_msg)
-    msgs = conv.get("messages", [])
-    
-    
-    # === RAG: top-k candidați + scoruri ===
-    docs = VECTORSTORE.similarity_search_with_relevance_scores(user_msg, k=3)
-    candidates_text = "\n\n".join(
-        f"- id: {i+1}\n  title: {d.metadata.get('title', 'Untitled')}\n  relevance: {score:.2f}"
-        for i, (d, score) in enumerate(docs)
+def _retrieve_candidates(user_msg: str):
+    """Retrieval: [(title, relevance), ...] for the prompt and the query vector (see CatalogService.search)."""
+    # === RAG: top-k candidați + scoruri (lexical + vector) ===
+    return get_catalog().search(user_msg, k=3)
+
+
+def _format_candidates(candidates: list) -> str:
+    return "\n\n".join(
+        f"- id: {i+1}\n  title: {title}\n  relevance: {score:.2f}"
+        for i, (title, score) in enumerate(candidates)
     )
-    # print(msgs)
+
+
+# Bump whenever the prompt below changes: cached answers were produced with the old one
+SYSTEM_PROMPT_VERSION = "2"
+
+
+def _build_system_prompt(candidates_text: str) -> str:
     # === Prompt assistant (reguli clare) ===
-    allowed_titles = ", ".join(titles)  # the enum you already pass to the tool
-    system_prompt = ( f'''
+    return ( f'''
 You are a friendly Library Assistant AI with a warm, encouraging tone.
 
 You MUST ONLY recommend books that appear in this candidate list (the library):
@@ -157,18 +247,14 @@ Each item looks like:
 NON-NEGOTIABLE RULES
 1) Library-only: Never mention books outside {candidates_text}. If nothing matches, say kindly that it’s not in the library.
 2) No hallucinations: Do NOT invent or paraphrase summaries, titles, authors, or themes.
-3) Auto-fetch summaries: Any time you present or even mention a book, you MUST immediately call the tool `fetch_summary` with its exact canonical title and then display the tool’s returned summary verbatim. Do not ask the user first.
-4) Robust title matching BEFORE you claim “not found”:
-   - Normalize the user’s title query by: lowercase, trim spaces, collapse multiple spaces, and remove punctuation/quotes (e.g., smart quotes, commas, periods, dashes, apostrophes).
-   - Normalize all library titles the same way.
-   - If a normalized exact match exists, treat it as found and fetch its summary. DO NOT propose alternatives.
-   - Only if no normalized exact match is found may you treat it as not in the library.
+3) Auto-fetch summaries: Any time you present or even mention a book, you MUST immediately call the tool `get_summary_by_title` with its title (one call per book) and then display the tool’s returned summary verbatim. Do not ask the user first.
+4) Titles the user names are already matched for you: a candidate with relevance 1.00 is the book they asked for, whatever its spelling or punctuation. Fetch it; DO NOT propose alternatives.
 5) Theme matching:
    - If the user asks by theme/keywords (e.g., “dystopian”, “friendship”), select up to 3 titles whose summaries’ “Themes:” line overlaps best.
    - For each selected title, ALWAYS fetch and display the verbatim summary.
 6) Output policy:
    - Present a warm, concise opener (one sentence max). No more than one emoji, and only if it fits the user’s vibe.
-   - For each title you output: **Title** — [VERBATIM summary returned by `fetch_summary`].
+   - For each title you output: **Title** — [VERBATIM summary returned by `get_summary_by_title`].
    - If no matches: say so kindly, then offer up to 3 closest thematic alternatives, each with a verbatim fetched summary.
 7) Safety rails against paraphrasing:
    - Never summarize in your own words.
@@ -179,115 +265,533 @@ Be strict about sources. Friendly tone, but accuracy first.
  ''' )
 
 
+def _read_history(user, conv: dict) -> list:
+    """Messages not yet folded into the running summary, oldest → newest."""
+    return Conversation.get_context_messages(user, conv["id"], after_seq=conv["summary_seq"] or None)
+
+
+def _build_context(conv: dict, candidates: list, history: list, user_msg: str):
+    """Token-budgeted context; older turns that no longer fit are summarized in the background."""
+    built = build_context(_build_system_prompt(_format_candidates(candidates)), conv["summary"], history, user_msg)
+    if built.overflow:
+        run_async(roll_summary, conv["id"], conv["summary"], conv["summary_seq"], history)
+    return built
 
 
+def _cached_answer(conv: dict, retrieval, history: list):
+    """
+    (text, tool calls) from the semantic answer cache, and the slot to store a
+    fresh answer in. Only first turns are cacheable: later ones depend on the history.
+    """
+    if history or conv["summary"]:
+        return None, None
+    try:
+        return lookup_answer(retrieval.query_vector, [title for title, _ in retrieval.candidates],
+                             SYSTEM_PROMPT_VERSION)
+    except Exception as e:
+        log.warning("answer cache lookup failed", extra={"error": str(e)})
+        return None, None
+
+
+def _save_turn(user, conv: dict, user_msg: str, reply: str):
+    """
+    Store the user message together with its reply, in one transaction: a failed or
+    timed-out LLM call leaves no unanswered user turn behind for a retry to repeat.
+    Returns (conversation title, seq of the reply).
+    """
+    title = conv["title"]
+    if not conv["last_seq"]:
+        title = user_msg[:60]
+        Conversation.set_title(user, conv["id"], title)
+    seqs = Conversation.add_turn(user, conv["id"], [("user", user_msg), ("assistant", reply)])
+    return title, seqs[-1] if seqs else None
+
+
+def _report_usage(conv_id: int, usage: dict) -> dict:
+    record_tokens(usage)
+    log.info("llm usage", extra={"conv_id": conv_id, **usage})
+    return usage
+
+
+def _resolve_tool_call(name: str, raw_args: str):
+    """Run one `get_summary_by_title` call. Returns (canonical title, summary) or None."""
+    if name != "get_summary_by_title":
+        return None
+    log.debug("tool call", extra={"tool": name})
+    # arguments e un string JSON
+    try:
+        args = json.loads(raw_args or "{}")
+    except json.JSONDecodeError:
+        args = {}
+    title = get_catalog().resolve_title((args.get("title") or "").strip())
+    if not title:
+        return None
+    return title, get_summary_by_title(title)
 
-    ctx_messages = [
-        {"role": "system", "content": system_prompt},
-    ]
-    msgs = sanitize_ctx_messages(msgs)
-    
-    for m in msgs:
-        ctx_messages.append(m)
-    ctx_messages.append( {"role": "user", "content": user_msg})
 
-    ai = client.chat.completions.create(
+def _format_summary(title: str, summary_text: str) -> str:
+    return f"\n\n „{title}”\n{summary_text}"
+
+
+def _store_media(data: bytes, mime: str) -> str:
+    """Write a blob to the media store once and return its URL."""
+    return media_url(get_media_store().put(data, mime))
+
+
+def _moderate(user_msg: str) -> bool:
+    """True if the message is flagged by the moderation model."""
+    return check_profanity(get_openai().with_options(timeout=stage_timeout("moderation")), user_msg) is True
+
+
+@timed_stage("llm_ttfb")
+def _stream_chat(ctx_messages: list):
+    return get_openai().with_options(timeout=stage_timeout("llm")).chat.completions.create(
         model=GPT_MODEL,
         messages=ctx_messages,
         temperature=0.6,
-        tools=tools,
-        tool_choice="auto"
-
+        tools=TOOLS,
+        tool_choice="auto",
+        stream=True,
+        stream_options={"include_usage": True},
     )
-    assistant_response = ""
-    assistant_response_raw = ai.choices[0].message
-    text_response = assistant_response_raw.content or ""
-    
-    # print(tool_raw_reply.content)
-    print(assistant_response_raw)
-    # print(first.output)
-    tool_calls = assistant_response_raw.tool_calls or []
-    summary_text=""
-    if tool_calls == []:
-        print("tool_calls este gol")
-    for call in tool_calls:
-        print(f"Function called {call.function.name}")
-        if call.type == "function" and call.function and call.function.name == "get_summary_by_title":
-            print(f"Function called {call.function.name}")
-             # arguments e un string JSON
-            raw_args = call.function.arguments or "{}"
-            try:
-                args = json.loads(raw_args)
-            except json.JSONDecodeError:
-                args = {}
-            title = (args.get("title") or "").strip()
-            if title:
-                summary_text = get_summary_by_title(title)
-                text_response += f"\n\n „{title}”\n{summary_text}"
-            break
-    
+
+
+def _iter_completion(stream, pending_calls: dict, cancel=None, usage: dict = None):
+    """
+    Yield content deltas of a streamed completion. Tool-call fragments are
+    accumulated into pending_calls ({index: {"name", "arguments"}}) and the
+    token counts of the final chunk into `usage`.
+    Setting `cancel` closes the HTTP stream, aborting the generation.
+    Time spent reading the stream is recorded as the `llm_stream` stage.
+    """
+    started = time.perf_counter()
+    try:
+        for chunk in stream:
+            if cancel is not None and cancel.is_set():
+                log.info("chat completion cancelled")
+                break
+            if usage is not None and getattr(chunk, "usage", None):
+                usage["prompt_tokens"] = chunk.usage.prompt_tokens
+                usage["completion_tokens"] = chunk.usage.completion_tokens
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            for tc in delta.tool_calls or []:
+                call = pending_calls.setdefault(tc.index, {"name": "", "arguments": ""})
+                if tc.function and tc.function.name:
+                    call["name"] += tc.function.name
+                if tc.function and tc.function.arguments:
+                    call["arguments"] += tc.function.arguments
+            if delta.content:
+                yield delta.content
+    finally:
+        stream.close()
+        record("llm_stream", time.perf_counter() - started)
+
+
+def _complete_chat(ctx_messages: list, cancel=None, usage: dict = None):
+    """Whole completion as (text, tool calls); streamed under the hood so it can be cancelled."""
+    pending_calls = {}
+    text = "".join(_iter_completion(_stream_chat(ctx_messages), pending_calls, cancel, usage))
+    return text, [pending_calls[i] for i in sorted(pending_calls)]
+
+
+def _apply_tool_calls(text_response: str, tool_calls: list):
+    """
+    Append the summary fetched by every tool call (each book once).
+    Returns (text, summary_text, [(title, summary), ...]).
+    """
+    resolved = []
+    with timed("tools"):
+        for call in tool_calls:
+            found = _resolve_tool_call(call["name"], call["arguments"])
+            if found and all(found[0] != title for title, _ in resolved):
+                resolved.append(found)
+                text_response += _format_summary(*found)
+    summary_text = "\n\n".join(summary for _, summary in resolved)
+    return text_response, summary_text, resolved
+
+
+def _start_media(text_response: str, summary_text: str, titles: list,
+                 image_requested: bool, tts_requested: bool) -> dict:
+    """Start image generation and TTS side by side; returns {"image"|"tts": Future}."""
+    futures = {}
+    image_generation_text = (text_response or "").strip()
+    if image_requested and image_generation_text:
+        futures["image"] = run_async(generate_image, image_generation_text, titles)
+    spoken_text = tts_text(summary_text, text_response)
+    if tts_requested and spoken_text:
+        futures["tts"] = run_async(synthesize_speech, spoken_text)
+    return futures
+
+
+def _finish_media(kind: str, future):
+    """Wait for one media stage and store its output. Returns the media URL, or None on failure."""
+    try:
+        data = wait_for(future, kind, default=None)
+    except Exception as e:
+        log.warning("media stage failed", extra={"kind": kind, "error": str(e)})
+        data = None
+    if not data:
+        return None
+    return _store_media(data, "image/png" if kind == "image" else "audio/mpeg")
+
+
+IMAGE_FAILED_NOTE = "\n\n[Image generation failed]"
+
+MEDIA_JOB_KINDS = {
+    # job kind -> (tag, mime)
+    "image": ("image", "image/png"),
+    "tts":   ("audio", "audio/mpeg"),
+}
+
+
+def _image_job_payload(text: str, titles: list) -> str:
+    return json.dumps({"text": text, "titles": titles}, ensure_ascii=False)
+
+
+def _image_job_args(payload: str):
+    """(text, titles) of an image job; payloads of older jobs are the bare prompt text."""
+    try:
+        args = json.loads(payload)
+        return args["text"], args.get("titles") or []
+    except (ValueError, TypeError, KeyError):
+        return payload, []
+
+
+def _run_media_job(job: dict):
+    """Job handler: generate the media, store it and attach it to the assistant message."""
+    tag, mime = MEDIA_JOB_KINDS[job["kind"]]
+    try:
+        if job["kind"] == "image":
+            data = generate_image(*_image_job_args(job["payload"]))
+        else:
+            data = synthesize_speech(job["payload"])
+    except Exception as e:
+        log.warning("media job failed", extra={"job_id": job["id"], "kind": job["kind"], "error": str(e)})
+        data = None
+    # A requeued job can run twice: a message gets at most one result of each kind
+    if not data:
+        if job["kind"] == "image":
+            Conversation.append_to_message(job["conv_id"], job["message_seq"], IMAGE_FAILED_NOTE,
+                                           unless=IMAGE_FAILED_NOTE)
+        return None
+    url = _store_media(data, mime)
+    if not Conversation.append_to_message(job["conv_id"], job["message_seq"], media_tag(tag, mime, url),
+                                          unless=f"<{tag} "):
+        log.info("media job result not attached", extra={"job_id": job["id"], "kind": job["kind"]})
+    return url
+
+
+for _kind in MEDIA_JOB_KINDS:
+    get_job_queue().register(_kind, _run_media_job)
+
+
+def _send_with_jobs(user, conv: dict, user_msg: str, after_seq, text_response: str, summary_text: str,
+                    titles: list, image_requested: bool, tts_requested: bool, usage: dict):
+    """Store the turn with its text reply now and hand image/TTS to the job queue; the client polls /api/jobs/<id>."""
+    conv_id = conv["id"]
+    conv_title, seq = _save_turn(user, conv, user_msg, text_response)
+
+    jobs = []
+    image_generation_text = (text_response or "").strip()
+    if image_requested and image_generation_text:
+        jobs.append(get_job_queue().submit(user, conv_id, seq, "image",
+                                           _image_job_payload(image_generation_text, titles)))
+    spoken_text = tts_text(summary_text, text_response)
+    if tts_requested and spoken_text:
+        jobs.append(get_job_queue().submit(user, conv_id, seq, "tts", spoken_text))
+
+    if after_seq is not None:
+        page = {"messages": _new_messages(user, conv_id, after_seq), "cursor": None}
+    else:
+        page = _history_page(user, conv_id)
+    with timed("serialize"):
+        resp_json = jsonify({
+            "ok": True,
+            "conv": {"id": conv_id, "title": conv_title},
+            "messages": page["messages"],
+            "cursor": page["cursor"],
+            "delta": after_seq is not None,
+            "assistant_reply": text_response,
+            "tts": None,
+            "jobs": jobs,
+            "usage": usage,
+        })
+    resp_json.set_cookie(COOKIE_CONV, str(conv_id), httponly=True, samesite="Strict")
+    return resp_json
+
+
+@api_bp.get("/jobs/<job_id>")
+def api_job(job_id):
+    """Job status; with ?wait=N the request waits up to N seconds for the job to finish."""
+    user, err = _require_user()
+    if err:
+        return err
+    try:
+        wait = min(max(float(request.args.get("wait", 0)), 0.0), MAX_JOB_WAIT)
+    except ValueError:
+        wait = 0.0
+    job = get_job_queue().wait(job_id, user, wait)
+    if not job:
+        return jsonify({"error": "not_found"}), 404
+    if job["kind"] == "tts" and job["url"]:
+        job["voice"] = TTS_VOICE
+    return jsonify({"job": job})
+
+
+@api_bp.post("/send")
+def api_send():
+    user, err = _require_user()
+    if err:
+        return err
+
+    data = request.get_json(silent=True) or {}
+    user_msg = (data.get("message") or "").strip()
+    if not user_msg:
+        return jsonify({"error": "empty_message"}), 400
+
+    conv_id, conv = _open_or_create_conversation(user, data)
+    after_seq = _optional_int(data.get("after_seq"))
+
+    # Moderation, retrieval and the history read don't depend on each other
+    moderation = run_async(_moderate, user_msg)
+    retrieval = run_async(_retrieve_candidates, user_msg)
+    # history for the LLM context, read before the new message is stored
+    history = run_async(_read_history, user, conv)
+
+    # Start the LLM speculatively while moderation is still in flight;
+    # it is cancelled if the message gets flagged.
+    try:
+        retrieved, history = wait_for(retrieval, "retrieval"), wait_for(history, "db")
+    except StageTimeout:
+        moderation.cancel()
+        return api_error()
+    context = _build_context(conv, retrieved.candidates, history, user_msg)
+    cancel_llm = threading.Event()
+    usage = dict(context.usage)
+    cached, answer_slot = _cached_answer(conv, retrieved, history)
+    if cached is not None:
+        usage["answer_cache"] = "hit"
+        completion = completed(cached)
+    else:
+        completion = run_async(_complete_chat, context.messages, cancel_llm, usage)
+
+    # --- PROFANITY: show but don't persist --- (on timeout MODERATION_FAIL decides)
+    if wait_for(moderation, "moderation", default=fails_closed()):
+        cancel_llm.set()
+        completion.cancel()
+        page = {"messages": [], "cursor": None} if after_seq is not None else _history_page(user, conv_id)
+        resp_json = jsonify({
+            "ok": True,
+            "conv": {"id": conv_id, "title": conv["title"]},
+            "messages": page["messages"],  # DB-backed; unchanged
+            "cursor": page["cursor"],
+            "delta": after_seq is not None,
+            # NEW: UI-only hints
+            "profanity_warning": PROFANITY_WARNING,
+            "ephemeral_user_message": user_msg
+        })
+        resp_json.set_cookie(COOKIE_CONV, str(conv_id), httponly=True, samesite="Strict")
+        return resp_json
+
+    # The user message is only stored along with the reply (see _save_turn)
+    try:
+        text_response, tool_calls = wait_for(completion, "llm")
+    except StageTimeout:
+        cancel_llm.set()
+        return api_error()
+    if cached is None:
+        store_answer(answer_slot, (text_response, tool_calls))
+    _report_usage(conv_id, usage)
+    text_response, summary_text, resolved = _apply_tool_calls(text_response, tool_calls)
+    titles = [title for title, _ in resolved]
+
+    tts_requested = bool(data.get("tts_enable"))
+    if MEDIA_JOBS:
+        return _send_with_jobs(user, conv, user_msg, after_seq, text_response, summary_text, titles,
+                               bool(data.get("image_enable")), tts_requested, usage)
+    # Image and TTS only need the final text: run them side by side
+    media = _start_media(text_response, summary_text, titles, bool(data.get("image_enable")), tts_requested)
+
+    assistant_response = text_response
+    if "image" in media:
+        image_url = _finish_media("image", media["image"])
+        if image_url:
+            # Reference the stored blob from the assistant content so it persists in history
+            assistant_response += media_tag("image", "image/png", image_url)
+        else:
+            assistant_response += IMAGE_FAILED_NOTE
 
     tts_payload = None
+    if "tts" in media:
+        audio_url = _finish_media("tts", media["tts"])
+        if audio_url:
+            assistant_response += media_tag("audio", "audio/mpeg", audio_url)
+            tts_payload = {
+            "url": audio_url,
+            "mime": "audio/mpeg",
+            "voice": TTS_VOICE,
+            }
+
+    conv_title, _ = _save_turn(user, conv, user_msg, assistant_response)
+
+    # With after_seq the client gets only what it hasn't seen (this turn's messages)
+    if after_seq is not None:
+        page = {"messages": _new_messages(user, conv_id, after_seq), "cursor": None}
+    else:
+        page = _history_page(user, conv_id)
+    with timed("serialize"):
+        resp_json = jsonify({
+            "ok": True,
+            "conv": {"id": conv_id, "title": conv_title},
+            "messages": page["messages"],
+            "cursor": page["cursor"],
+            "delta": after_seq is not None,
+            "assistant_reply": assistant_response,
+            "tts":tts_payload,
+            "usage": usage,
+        })
+    resp_json.set_cookie(COOKIE_CONV, str(conv_id), httponly=True, samesite="Strict")
+    return resp_json
+
+
+def _sse(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+@api_bp.post("/send/stream")
+def api_send_stream():
+    """
+    Streaming variant of /api/send (Server-Sent Events over a POST body).
+
+    Events, in order: `meta`, then either `profanity` or any number of `token`
+    followed by `summary`, `image`/`audio` (when requested, whichever is ready
+    first), and finally `done` once the assistant message is persisted.
+    Failures are reported as `error`.
+    """
+    user, err = _require_user()
+    if err:
+        return err
+
+    data = request.get_json(silent=True) or {}
+    user_msg = (data.get("message") or "").strip()
+    if not user_msg:
+        return jsonify({"error": "empty_message"}), 400
+
+    conv_id, conv = _open_or_create_conversation(user, data)
     tts_requested = bool(data.get("tts_enable"))
-    print(f"tts_requested = {tts_requested}", flush=True)
-    
-    
-    tts_text = (summary_text.strip() or (text_response or "").strip())
-    MAX_TTS_CHARS = 1800
-    tts_text = tts_text[:MAX_TTS_CHARS]
-
-    image_payload = None
     image_generation_requested = bool(data.get("image_enable"))
-    image_generation_text = (text_response or "").strip()
 
-    if image_generation_requested and image_generation_text :
+    def generate():
+        yield _sse("meta", {"conv": {"id": conv_id, "title": conv["title"]}})
+
+        moderation = run_async(_moderate, user_msg)
+        retrieval = run_async(_retrieve_candidates, user_msg)
+        history = run_async(_read_history, user, conv)
+
+        # Tokens must not reach the client before moderation has passed
+        if wait_for(moderation, "moderation", default=fails_closed()):
+            retrieval.cancel()
+            history.cancel()
+            yield _sse("profanity", {"profanity_warning": PROFANITY_WARNING, "ephemeral_user_message": user_msg})
+            yield _sse("done", {"conv": {"id": conv_id, "title": conv["title"]}, "persisted": False})
+            return
+
         try:
-            # Use the Images API to get a base64 PNG (compact & predictable)
-            img = client.images.generate(
-                model="gpt-image-1",
-                prompt=f"Generate an image where you expose the action from this summary(with the characters or the action mentioned):\n{image_generation_text}\nHard rules!!:\nDon't add text except for the title",
-                size="1024x1024"
-            )
-            image_b64 = img.data[0].b64_json  # <-- base64 PNG string
-
-            # Embed into the assistant content so it persists in history
-            text_response += f"<image type=\"image/png\">{image_b64}</image>"
+            retrieved, history = wait_for(retrieval, "retrieval"), wait_for(history, "db")
+            context = _build_context(conv, retrieved.candidates, history, user_msg)
+            usage = dict(context.usage)
+            cached, answer_slot = _cached_answer(conv, retrieved, history)
+
+            if cached is not None:
+                usage["answer_cache"] = "hit"
+                text_response, tool_calls = cached
+                if text_response:
+                    yield _sse("token", {"text": text_response})
+            else:
+                text_response = ""
+                pending_calls = {}
+                for token in _iter_completion(_stream_chat(context.messages), pending_calls, usage=usage):
+                    text_response += token
+                    yield _sse("token", {"text": token})
+                tool_calls = [pending_calls[i] for i in sorted(pending_calls)]
+                store_answer(answer_slot, (text_response, tool_calls))
+            _report_usage(conv_id, usage)
+
+            text_response, summary_text, resolved = _apply_tool_calls(text_response, tool_calls)
+            for title, summary in resolved:
+                yield _sse("summary", {"title": title, "text": summary})
+
+            titles = [title for title, _ in resolved]
+            media = _start_media(text_response, summary_text, titles, image_generation_requested, tts_requested)
+            media_urls = {}
+            for future in as_completed(list(media.values())):
+                kind = "image" if future is media.get("image") else "tts"
+                media_urls[kind] = _finish_media(kind, future)
+                if kind == "image":
+                    if media_urls[kind]:
+                        yield _sse("image", {"url": media_urls[kind], "mime": "image/png"})
+                    else:
+                        yield _sse("image", {"error": "image_generation_failed"})
+                elif media_urls[kind]:
+                    yield _sse("audio", {"url": media_urls[kind], "mime": "audio/mpeg", "voice": TTS_VOICE})
+
+            # keep the stored order stable: image before audio, as in /api/send
+            assistant_response = text_response
+            if "image" in media:
+                assistant_response += (media_tag("image", "image/png", media_urls["image"]) if media_urls.get("image")
+                                       else IMAGE_FAILED_NOTE)
+            if media_urls.get("tts"):
+                assistant_response += media_tag("audio", "audio/mpeg", media_urls["tts"])
+
+            conv_title, _ = _save_turn(user, conv, user_msg, assistant_response)
+            done = {"conv": {"id": conv_id, "title": conv_title}, "persisted": True, "usage": usage}
+            after_seq = _optional_int(data.get("after_seq"))
+            if after_seq is not None:
+                done["messages"] = _new_messages(user, conv_id, after_seq)
+            yield _sse("done", done)
         except Exception as e:
-            # Optional: add a small notice in the text; or ignore silently
-            print(e)
-            text_response += "\n\n[Image generation failed]"
-        
-    assistant_response += text_response
-
-    if tts_requested and tts_text:
-        resp = client.audio.speech.create(
-            model=GPT_MODEL+"-tts",
-            voice="alloy",
-            input=tts_text,
-        )
-
-        audio_bytes = resp.read()
-        audio_b64 = base64.b64encode(audio_bytes).decode("ascii")
-        assistant_response += f"<audio>{audio_b64}</audio>"
-
-        tts_payload = {
-        "audio_b64": audio_b64,
-        "mime": "audio/mpeg",
-        "voice": "alloy",
-        }
-    
-    Conversation.add_message(user, conv_id, "assistant", assistant_response)
-
-    conv = Conversation.get_conversation(user, conv_id)
-    resp_json = jsonify({
-        "ok": True,
-        "conv": {"id": conv_id, "title": conv["title"]},
-        "messages": conv.get("messages", []),
-        "assistant_reply": assistant_response,
-        "tts":tts_payload
-    })
-    resp_json.set_cookie(COOKIE_CONV, str(conv_id), httponly=True, samesite="Strict")
-    return resp_json
+            log.exception("streamed reply failed", extra={"conv_id": conv_id})
+            yield _sse("error", {"error": "api_unavailable", "message": str(e)})
+
+    resp = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"   # disable proxy buffering (nginx)
+    resp.set_cookie(COOKIE_CONV, str(conv_id), httponly=True, samesite="Strict")
+    return resp
+
+@api_bp.get("/themes")
+def api_themes():
+    """Browse the catalog by theme, straight from the theme index (no embeddings, no LLM)."""
+    user, err = _require_user()
+    if err:
+        return err
+    catalog = get_catalog()
+    index = catalog.theme_index
+    theme = (request.args.get("theme") or "").strip()
+    etag = _etag("themes", catalog.loaded_at, theme)
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+    if theme:
+        titles = index.titles_for(theme)
+        if not titles:
+            return jsonify({"error": "not_found"}), 404
+        return _with_etag(jsonify({"theme": theme, "titles": titles}), etag)
+    return _with_etag(jsonify({"themes": [
+        {"theme": name, "count": len(titles), "titles": titles} for name, titles in index.themes()
+    ]}), etag)
+
+
+@api_bp.get("/catalog/stats")
+def catalog_stats():
+    user, err = _require_user()
+    if err:
+        return err
+    return jsonify({**get_catalog().stats(), "tts_cache": tts_cache_stats(),
+                    "image_cache": image_cache_stats(), "moderation": moderation_stats(),
+                    "answer_cache": answer_cache_stats()})
 
 @api_bp.post("/stt")
 def stt():
@@ -305,8 +809,10 @@ def stt():
     if language: args["language"] = language
     if prompt:   args["prompt"]   = prompt
 
+    import openai   # loaded by get_openai() by now; imported here to keep it out of startup
+
     try:
-        tr = client.audio.transcriptions.create(**args)
+        tr = get_openai().audio.transcriptions.create(**args)
     except openai.BadRequestError as e:
         msg = str(e)
         # Detect the short-audio case and return a helpful response
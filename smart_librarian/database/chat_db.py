@@ -1,25 +1,24 @@
 # smart_librarian/models/chat_db.py
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
-from sqlalchemy import Column, Integer, String, DateTime, func
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, JSON, func, case
 from sqlalchemy.orm import declarative_base, Session
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import inspect, update
 from sqlalchemy import text
 
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.mutable import MutableList
-import os
 
-# --- SQLAlchemy wiring (use the same DATABASE_URL you already set) ---
-DATABASE_URL = os.getenv("DATABASE_URL", "postgresql+psycopg2://smartlib:smartlib@db:5432/smartlib")
-
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+from smart_librarian.database.engine import engine, SessionLocal, ReadSessionLocal
+from smart_librarian.utils.message_helper import split_message, sanitize_text
+from smart_librarian.utils.metrics import timed_stage
 
 Base = declarative_base()
 
+# JSONB on Postgres; plain JSON elsewhere (e.g. the SQLite database of the benchmarks)
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
 
 class ConversationORM(Base):
     __tablename__ = "conversations"
@@ -27,14 +26,93 @@ class ConversationORM(Base):
     id          = Column(Integer, primary_key=True, autoincrement=True)
     username    = Column(String, index=True, nullable=False)  # or user_id if you prefer
     title       = Column(String, nullable=False, default="New chat")
-    # ✅ Mutable JSONB so appends are tracked and committed
-    messages    = Column(MutableList.as_mutable(JSONB), nullable=False, default=text("'[]'::jsonb"))
+    # Legacy storage: messages now live in the `messages` table (see MessageORM).
+    # Kept so `python manage.py migrate-messages` can move old rows over.
+    messages    = Column(MutableList.as_mutable(JSONType), nullable=False, default=list)
+    # Highest MessageORM.seq handed out for this conversation
+    last_seq    = Column(Integer, nullable=False, default=0, server_default="0")
+    # Running summary of the turns that no longer fit the LLM context, up to summary_seq
+    summary     = Column(Text, nullable=True)
+    summary_seq = Column(Integer, nullable=False, default=0, server_default="0")
     created_at  = Column(DateTime, nullable=False, server_default=func.now())
     updated_at  = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
 
 
+class MessageORM(Base):
+    """One row per message; appends never rewrite earlier history."""
+    __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_conversation_seq", "conversation_id", "seq", unique=True),
+    )
+
+    id              = Column(Integer, primary_key=True, autoincrement=True)
+    conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False)
+    seq             = Column(Integer, nullable=False)   # 1, 2, 3... within a conversation
+    role            = Column(String, nullable=False)
+    content         = Column(Text, nullable=False)
+    # Computed from content at write time so reads never re-run the sanitizer:
+    # the LLM-ready text and the media the message references. NULL until backfilled.
+    llm_text        = Column(Text, nullable=True)
+    media           = Column(JSONType, nullable=True)
+    created_at      = Column(DateTime, nullable=False, server_default=func.now())
+
+
+def _add_missing_columns():
+    # create_all() never alters existing tables; add columns introduced after the first deploy
+    added = {
+        "conversations": {
+            "last_seq": "INTEGER NOT NULL DEFAULT 0",
+            "summary": "TEXT",
+            "summary_seq": "INTEGER NOT NULL DEFAULT 0",
+        },
+        "messages": {
+            "llm_text": "TEXT",
+            "media": "JSONB" if engine.dialect.name == "postgresql" else "JSON",
+        },
+    }
+    inspector = inspect(engine)
+    for table, table_columns in added.items():
+        columns = {c["name"] for c in inspector.get_columns(table)}
+        for name, ddl in table_columns.items():
+            if name not in columns:
+                with engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
+
 def init_chat_db():
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+
+
+def _message_dict(m: MessageORM) -> Dict[str, Any]:
+    if m.llm_text is None:
+        # not backfilled yet: the client parses the raw content itself
+        return {"seq": m.seq, "role": m.role, "content": m.content}
+    return {"seq": m.seq, "role": m.role, "text": m.llm_text, "media": m.media or []}
+
+
+def message_row(conv_id: int, seq: int, role: str, content: str) -> MessageORM:
+    llm_text, media = split_message(content)
+    return MessageORM(conversation_id=conv_id, seq=seq, role=role, content=content,
+                      llm_text=llm_text, media=media)
+
+
+def _append_messages(username: str, conv_id: int, messages: List[Tuple[str, str]]) -> Optional[List[int]]:
+    with SessionLocal() as s:
+        # Bumping last_seq row-locks the conversation, so concurrent sends
+        # get distinct, ordered seqs instead of overwriting each other.
+        last_seq = s.execute(
+            update(ConversationORM)
+            .where(ConversationORM.id == conv_id, ConversationORM.username == username)
+            .values(last_seq=ConversationORM.last_seq + len(messages), updated_at=func.now())
+            .returning(ConversationORM.last_seq)
+        ).scalar_one_or_none()
+        if last_seq is None:
+            return None
+        seqs = list(range(last_seq - len(messages) + 1, last_seq + 1))
+        s.add_all(message_row(conv_id, seq, role, content) for seq, (role, content) in zip(seqs, messages))
+        s.commit()
+        return seqs
 
 
 # -------- Public API your controller calls --------
@@ -42,8 +120,10 @@ def init_chat_db():
 class Conversation:
     """Convenience wrapper returning plain dicts for Jinja."""
     @staticmethod
-    def list_conversations(username: str) -> List[Dict[str, Any]]:
-        with SessionLocal() as s:
+    @timed_stage("db")
+    def list_conversations(username: str, replica: bool = False) -> List[Dict[str, Any]]:
+        """replica=True reads from the read replica (if configured), which may lag behind writes."""
+        with (ReadSessionLocal if replica else SessionLocal)() as s:
             rows = (
                 s.query(ConversationORM)
                 .filter(ConversationORM.username == username)
@@ -60,6 +140,19 @@ class Conversation:
             ]
 
     @staticmethod
+    @timed_stage("db")
+    def list_version(username: str, replica: bool = False) -> tuple:
+        """(conversation count, latest updated_at): changes whenever the list would."""
+        with (ReadSessionLocal if replica else SessionLocal)() as s:
+            count, latest = (
+                s.query(func.count(ConversationORM.id), func.max(ConversationORM.updated_at))
+                .filter(ConversationORM.username == username)
+                .one()
+            )
+            return count, latest
+
+    @staticmethod
+    @timed_stage("db")
     def get_conversation(username: str, conv_id: int) -> Optional[Dict[str, Any]]:
         with SessionLocal() as s:
             r = (
@@ -69,16 +162,79 @@ class Conversation:
             )
             if not r:
                 return None
-            # ✅ r.messages is a PY list (thanks to JSONB + MutableList)
+            # Metadata only: page through the history with get_messages()
             return {
                 "id": r.id,
                 "title": r.title,
-                "messages": r.messages or [],
+                "last_seq": r.last_seq,
+                "summary": r.summary,
+                "summary_seq": r.summary_seq,
                 "updated_at": r.updated_at,
                 "created_at": r.created_at,
             }
 
     @staticmethod
+    @timed_stage("db")
+    def get_messages(
+        username: str,
+        conv_id: int,
+        after_seq: Optional[int] = None,
+        before_seq: Optional[int] = None,
+        limit: Optional[int] = 50,
+    ) -> List[Dict[str, Any]]:
+        """
+        Keyset-paginated history, always returned oldest → newest.
+
+        - after_seq:  only messages with seq > after_seq (the oldest `limit` of them)
+        - before_seq: only messages with seq < before_seq (the newest `limit` of them)
+        - neither:    the latest `limit` messages
+        limit=None returns every matching message.
+        """
+        with SessionLocal() as s:
+            q = (
+                s.query(MessageORM)
+                .join(ConversationORM, ConversationORM.id == MessageORM.conversation_id)
+                .filter(MessageORM.conversation_id == conv_id, ConversationORM.username == username)
+            )
+            if after_seq is not None:
+                q = q.filter(MessageORM.seq > after_seq).order_by(MessageORM.seq.asc())
+                rows = q.limit(limit).all() if limit else q.all()
+                return [_message_dict(m) for m in rows]
+
+            if before_seq is not None:
+                q = q.filter(MessageORM.seq < before_seq)
+            q = q.order_by(MessageORM.seq.desc())
+            rows = q.limit(limit).all() if limit else q.all()
+            return [_message_dict(m) for m in reversed(rows)]
+
+    @staticmethod
+    @timed_stage("db")
+    def get_context_messages(username: str, conv_id: int, after_seq: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        LLM-ready history (seq > after_seq), oldest → newest, as {"seq", "role", "content"}.
+        Reads the precomputed text; raw content is only fetched for rows not backfilled yet.
+        """
+        with SessionLocal() as s:
+            q = (
+                s.query(
+                    MessageORM.seq,
+                    MessageORM.role,
+                    MessageORM.llm_text,
+                    case((MessageORM.llm_text.is_(None), MessageORM.content), else_=None).label("raw"),
+                )
+                .join(ConversationORM, ConversationORM.id == MessageORM.conversation_id)
+                .filter(MessageORM.conversation_id == conv_id, ConversationORM.username == username)
+            )
+            if after_seq is not None:
+                q = q.filter(MessageORM.seq > after_seq)
+            return [
+                {"seq": r.seq, "role": r.role,
+                 "content": r.llm_text if r.llm_text is not None else sanitize_text(r.raw or "")}
+                for r in q.order_by(MessageORM.seq.asc()).all()
+            ]
+
+    @staticmethod
+    @timed_stage("db")
     def create_conversation(username: str, title: str) -> int:
         with SessionLocal() as s:
             obj = ConversationORM(username=username, title=title, messages=[])
@@ -87,6 +243,7 @@ class Conversation:
             return obj.id
 
     @staticmethod
+    @timed_stage("db")
     def set_title(username: str, conv_id: int, title: str) -> None:
         with SessionLocal() as s:
             r = (
@@ -100,25 +257,80 @@ class Conversation:
             s.commit()
 
     @staticmethod
-    def add_message(username: str, conv_id: int, role: str, content: str) -> None:
+    @timed_stage("db")
+    def add_message(username: str, conv_id: int, role: str, content: str) -> Optional[int]:
+        """Append one message row and return its seq (None if the conversation isn't found)."""
+        seqs = _append_messages(username, conv_id, [(role, content)])
+        return seqs[0] if seqs else None
+
+    @staticmethod
+    @timed_stage("db")
+    def add_turn(username: str, conv_id: int, messages: List[Tuple[str, str]]) -> Optional[List[int]]:
+        """
+        Append several (role, content) messages, e.g. a user message and its reply,
+        in one transaction with consecutive seqs. Returns their seqs (None if the
+        conversation isn't found).
+        """
+        return _append_messages(username, conv_id, messages)
+
+    @staticmethod
+    @timed_stage("db")
+    def append_to_message(conv_id: int, seq: int, suffix: str, unless: Optional[str] = None) -> bool:
+        """
+        Append text (e.g. a media tag from a finished background job) to a stored
+        message and bump the conversation's updated_at so clients see the change.
+        The append is a single UPDATE, so concurrent jobs on one message (image
+        and TTS) never overwrite each other; the derived text and media are then
+        recomputed from the updated content while the row is still locked.
+        With `unless`, nothing is appended if the content already contains it.
+        Returns True if the message was changed.
+        """
+        where = (MessageORM.conversation_id == conv_id, MessageORM.seq == seq)
         with SessionLocal() as s:
-            r = (
-                s.query(ConversationORM)
-                .filter(ConversationORM.id == conv_id, ConversationORM.username == username)
-                .one_or_none()
+            content = s.execute(
+                update(MessageORM)
+                .where(*where, *([~MessageORM.content.contains(unless, autoescape=True)] if unless else []))
+                .values(content=MessageORM.content + suffix)
+                .returning(MessageORM.content)
+            ).scalar_one_or_none()
+            if content is None:
+                return False
+            llm_text, media = split_message(content)
+            s.execute(update(MessageORM).where(*where).values(llm_text=llm_text, media=media))
+            s.execute(
+                update(ConversationORM)
+                .where(ConversationORM.id == conv_id)
+                .values(updated_at=func.now())
             )
-            if not r:
-                return
-            # ✅ Append to the Python list; MutableList marks it dirty
-            msgs = r.messages or []
-            msgs.append({"role": role, "content": content})
-            r.messages = msgs   # (re-assign is optional w/ MutableList, but safe)
             s.commit()
+            return True
 
     @staticmethod
+    @timed_stage("db")
+    def set_summary(conv_id: int, summary: str, summary_seq: int, expected_seq: int) -> bool:
+        """
+        Store a new running summary covering messages up to summary_seq. Only applies
+        if the stored summary still ends at expected_seq (another request may have
+        rolled it forward meanwhile). updated_at is left alone: the visible history is unchanged.
+        """
+        with SessionLocal() as s:
+            updated = s.execute(
+                update(ConversationORM)
+                .where(ConversationORM.id == conv_id, ConversationORM.summary_seq == expected_seq)
+                .values(summary=summary, summary_seq=summary_seq, updated_at=ConversationORM.updated_at)
+            ).rowcount
+            s.commit()
+            return bool(updated)
+
+    @staticmethod
+    @timed_stage("db")
     def delete_conversation(username: str, conv_id: int) -> None:
         with SessionLocal() as s:
-            s.query(ConversationORM).filter(
+            owned = s.query(ConversationORM.id).filter(
                 ConversationORM.id == conv_id, ConversationORM.username == username
-            ).delete()
+            ).one_or_none()
+            if not owned:
+                return
+            s.query(MessageORM).filter(MessageORM.conversation_id == conv_id).delete()
+            s.query(ConversationORM).filter(ConversationORM.id == conv_id).delete()
             s.commit()
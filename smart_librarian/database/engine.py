@@ -0,0 +1,146 @@
+# smart_librarian/database/engine.py
+"""
+The process's SQLAlchemy engine and session factories.
+
+Every table (users, conversations, messages, media jobs) goes through one
+engine, so a worker holds a single connection pool. Read-only, lag-tolerant
+queries can opt into ReadSessionLocal, which uses DATABASE_REPLICA_URL when it
+is set and the primary otherwise.
+
+Both engines report pool usage and per-statement timings on /metrics and log
+statements slower than DB_SLOW_QUERY_MS.
+"""
+import os
+import time
+from typing import Dict, Tuple
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from smart_librarian.utils.log import get_logger
+from smart_librarian.utils.metrics import REGISTRY
+
+DATABASE_URL = os.getenv("DATABASE_URL", "postgresql+psycopg2://smartlib:smartlib@db:5432/smartlib")
+# Optional read replica for conversation lists and metadata; empty = read from the primary
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL", "")
+# After a client writes, its reads stay on the primary this long (set as a cookie, so
+# any worker honours it): it sees its own writes despite replica lag
+DB_REPLICA_PIN_SECONDS = int(os.getenv("DB_REPLICA_PIN_SECONDS", "30"))
+REPLICA_PIN_COOKIE = "db_primary"
+
+# Per worker: keep DB_POOL_SIZE + DB_MAX_OVERFLOW at or above the threads that query at once
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))       # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))       # reopen connections older than this
+# Ping every connection on checkout. Off by default: recycling retires connections
+# before idle timeouts, and a dropped connection invalidates the whole pool anyway.
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "0") == "1"
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))   # Postgres only, 0 = none
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "500"))
+
+DB_STATEMENT_SECONDS = REGISTRY.histogram(
+    "librarian_db_statement_duration_seconds", "Time to execute each SQL statement.", ("engine", "operation"))
+DB_STATEMENT_ERRORS = REGISTRY.counter(
+    "librarian_db_statement_errors_total", "SQL statements that raised.", ("engine",))
+DB_POOL_CONNECTIONS = REGISTRY.gauge(
+    "librarian_db_pool_connections", "Pooled connections by state (checked_out, idle) and the pool's capacity.",
+    ("engine", "state"))
+DB_POOL_CHECKOUTS = REGISTRY.counter(
+    "librarian_db_pool_checkouts_total", "Connections handed out by the pool.", ("engine",))
+DB_CONNECTS = REGISTRY.counter(
+    "librarian_db_connects_total", "New database connections opened (churn when it keeps growing).", ("engine",))
+
+OPERATIONS = ("SELECT", "INSERT", "UPDATE", "DELETE")
+
+log = get_logger(__name__)
+
+
+def _operation(statement: str) -> str:
+    word = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return word if word in OPERATIONS else "OTHER"
+
+
+def _engine_options(url: str) -> dict:
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        return options   # local/benchmark databases: SQLite's default pool
+    options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        # Reuse the most recently returned connection: idle extras age out via recycling
+        pool_use_lifo=True,
+    )
+    if backend == "postgresql":
+        connect_args = {"connect_timeout": DB_CONNECT_TIMEOUT}
+        if DB_STATEMENT_TIMEOUT_MS > 0:
+            connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+        options["connect_args"] = connect_args
+    return options
+
+
+def _instrument(engine: Engine, name: str, capacity: int) -> None:
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        DB_CONNECTS.inc(engine=name)
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKOUTS.inc(engine=name)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        context._librarian_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._librarian_started
+        DB_STATEMENT_SECONDS.observe(elapsed, engine=name, operation=_operation(statement))
+        if elapsed * 1000 >= DB_SLOW_QUERY_MS:
+            log.warning("slow query", extra={"engine": name, "ms": round(elapsed * 1000, 1),
+                                             "statement": " ".join(statement.split())[:500]})
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(exception_context):
+        DB_STATEMENT_ERRORS.inc(engine=name)
+
+    def pool_usage() -> Dict[Tuple, float]:
+        pool = engine.pool
+        if not isinstance(pool, QueuePool):
+            return {}
+        usage = {(name, "checked_out"): pool.checkedout(), (name, "idle"): pool.checkedin()}
+        if capacity:
+            usage[(name, "capacity")] = capacity
+        return usage
+
+    DB_POOL_CONNECTIONS.track(pool_usage)
+
+
+def _make_engine(url: str, name: str) -> Engine:
+    options = _engine_options(url)
+    engine = create_engine(url, **options)
+    _instrument(engine, name, options.get("pool_size", 0) + options.get("max_overflow", 0))
+    return engine
+
+
+engine = _make_engine(DATABASE_URL, "primary")
+SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+
+replica_engine = _make_engine(DATABASE_REPLICA_URL, "replica") if DATABASE_REPLICA_URL else engine
+ReadSessionLocal = sessionmaker(bind=replica_engine, expire_on_commit=False) if DATABASE_REPLICA_URL else SessionLocal
+
+
+def _reset_after_fork() -> None:
+    # A forked worker opens its own connections instead of sharing the parent's sockets
+    engine.dispose(close=False)
+    if replica_engine is not engine:
+        replica_engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,129 @@
+# smart_librarian/database/job_db.py
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, func, update
+
+from smart_librarian.database.chat_db import Base, engine, SessionLocal
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class MediaJobORM(Base):
+    """A background media task (image generation / TTS) for one stored assistant message."""
+    __tablename__ = "media_jobs"
+    __table_args__ = (
+        Index("ix_media_jobs_status_updated", "status", "updated_at"),
+    )
+
+    id              = Column(String(32), primary_key=True)
+    username        = Column(String, nullable=False, index=True)
+    conversation_id = Column(Integer, nullable=False)
+    message_seq     = Column(Integer, nullable=False)     # assistant message the media is attached to
+    kind            = Column(String(16), nullable=False)  # "image" | "tts"
+    payload         = Column(Text, nullable=False)        # prompt / text to speak
+    status          = Column(String(16), nullable=False, default=JOB_QUEUED)
+    attempts        = Column(Integer, nullable=False, default=0)
+    result_url      = Column(String, nullable=True)
+    error           = Column(Text, nullable=True)
+    created_at      = Column(DateTime, nullable=False, server_default=func.now())
+    updated_at      = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+
+
+def _lease_cutoff(lease_seconds: float):
+    """Start of the lease window by the database clock, the one that stamps updated_at."""
+    if engine.dialect.name == "sqlite":
+        return func.datetime("now", f"-{lease_seconds} seconds")
+    return func.now() - timedelta(seconds=lease_seconds)
+
+
+def init_job_db():
+    Base.metadata.create_all(bind=engine, tables=[MediaJobORM.__table__])
+
+
+def _job_dict(j: MediaJobORM) -> Dict[str, Any]:
+    return {
+        "id": j.id,
+        "kind": j.kind,
+        "status": j.status,
+        "conv_id": j.conversation_id,
+        "message_seq": j.message_seq,
+        "url": j.result_url,
+        "error": j.error,
+    }
+
+
+class MediaJob:
+    """Persisted job state, so queued work survives restarts."""
+
+    @staticmethod
+    def create(username: str, conv_id: int, message_seq: int, kind: str, payload: str) -> Dict[str, Any]:
+        with SessionLocal() as s:
+            job = MediaJobORM(id=uuid4().hex, username=username, conversation_id=conv_id,
+                              message_seq=message_seq, kind=kind, payload=payload, status=JOB_QUEUED)
+            s.add(job)
+            s.commit()
+            return _job_dict(job)
+
+    @staticmethod
+    def get(job_id: str, username: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        with SessionLocal() as s:
+            q = s.query(MediaJobORM).filter(MediaJobORM.id == job_id)
+            if username is not None:
+                q = q.filter(MediaJobORM.username == username)
+            j = q.one_or_none()
+            return _job_dict(j) if j else None
+
+    @staticmethod
+    def claim(job_id: str, max_attempts: int) -> Optional[Dict[str, Any]]:
+        """Atomically move a queued job to running; None if another worker got it first."""
+        with SessionLocal() as s:
+            claimed = s.execute(
+                update(MediaJobORM)
+                .where(MediaJobORM.id == job_id, MediaJobORM.status == JOB_QUEUED,
+                       MediaJobORM.attempts < max_attempts)
+                .values(status=JOB_RUNNING, attempts=MediaJobORM.attempts + 1, updated_at=func.now())
+            ).rowcount
+            s.commit()
+            if not claimed:
+                return None
+            j = s.get(MediaJobORM, job_id)
+            return {**_job_dict(j), "payload": j.payload}
+
+    @staticmethod
+    def finish(job_id: str, result_url: Optional[str], error: Optional[str] = None) -> None:
+        with SessionLocal() as s:
+            s.execute(
+                update(MediaJobORM)
+                .where(MediaJobORM.id == job_id)
+                .values(status=JOB_DONE if result_url else JOB_FAILED, result_url=result_url,
+                        error=error, updated_at=func.now())
+            )
+            s.commit()
+
+    @staticmethod
+    def requeue_stale(lease_seconds: float, max_attempts: int) -> None:
+        """Running jobs whose worker died (no update within the lease) go back to the queue, or fail."""
+        with SessionLocal() as s:
+            stale = (MediaJobORM.status == JOB_RUNNING, MediaJobORM.updated_at < _lease_cutoff(lease_seconds))
+            s.execute(update(MediaJobORM).where(*stale, MediaJobORM.attempts < max_attempts)
+                      .values(status=JOB_QUEUED, updated_at=func.now()))
+            s.execute(update(MediaJobORM).where(*stale, MediaJobORM.attempts >= max_attempts)
+                      .values(status=JOB_FAILED, error="worker lost", updated_at=func.now()))
+            s.commit()
+
+    @staticmethod
+    def queued_ids(limit: int, max_attempts: int) -> List[str]:
+        with SessionLocal() as s:
+            rows = (
+                s.query(MediaJobORM.id)
+                .filter(MediaJobORM.status == JOB_QUEUED, MediaJobORM.attempts < max_attempts)
+                .order_by(MediaJobORM.created_at)
+                .limit(limit)
+                .all()
+            )
+            return [r.id for r in rows]
@@ -0,0 +1,126 @@
+# smart_librarian/database/media_store.py
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from src.file_paths import MEDIA_DIR
+
+MEDIA_URL_PREFIX = "/api/media/"
+
+# <sha256 hex>.<ext>, e.g. 3f5a...e1.png
+MEDIA_ID_RE = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]{1,8}$")
+
+MIME_EXTENSIONS = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/webp": ".webp",
+    "audio/mpeg": ".mp3",
+    "audio/wav": ".wav",
+}
+EXTENSION_MIMES = {ext: mime for mime, ext in MIME_EXTENSIONS.items()}
+
+
+def media_url(media_id: str) -> str:
+    return MEDIA_URL_PREFIX + media_id
+
+
+def mime_for(media_id: str) -> str:
+    return EXTENSION_MIMES.get(os.path.splitext(media_id)[1], "application/octet-stream")
+
+
+class MediaStore(ABC):
+    """
+    Content-addressed blob store: identical bytes are written once and share one id.
+    Backends implement put/exists/read; one that misses any of them fails when it
+    is constructed, not on the first request that needs it.
+    """
+
+    @abstractmethod
+    def put(self, data: bytes, mime: str) -> str:
+        """Store the blob (if new) and return its media id."""
+
+    @abstractmethod
+    def exists(self, media_id: str) -> bool:
+        ...
+
+    def local_path(self, media_id: str) -> Optional[str]:
+        """Filesystem path for `send_file`, or None if the backend is not file-based."""
+        return None
+
+    @abstractmethod
+    def read(self, media_id: str) -> Optional[bytes]:
+        """The blob's bytes, or None if it isn't stored."""
+
+    @staticmethod
+    def media_id_for(data: bytes, mime: str) -> str:
+        return hashlib.sha256(data).hexdigest() + MIME_EXTENSIONS.get(mime, ".bin")
+
+
+class LocalMediaStore(MediaStore):
+    """Stores blobs under <root>/<first 2 hex chars>/<media id>."""
+
+    def __init__(self, root: str = MEDIA_DIR):
+        self.root = root
+
+    def _path(self, media_id: str) -> str:
+        return os.path.join(self.root, media_id[:2], media_id)
+
+    def put(self, data: bytes, mime: str) -> str:
+        media_id = self.media_id_for(data, mime)
+        path = self._path(media_id)
+        if os.path.exists(path):
+            return media_id  # already stored: content-addressed, nothing to do
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temp file then rename, so readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return media_id
+
+    def exists(self, media_id: str) -> bool:
+        return os.path.isfile(self._path(media_id))
+
+    def local_path(self, media_id: str) -> Optional[str]:
+        path = self._path(media_id)
+        return os.path.abspath(path) if os.path.isfile(path) else None
+
+    def read(self, media_id: str) -> Optional[bytes]:
+        path = self.local_path(media_id)
+        if not path:
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+
+# Backends selectable with MEDIA_STORE=<name>; register others with register_media_store()
+MEDIA_STORE_BACKENDS = {
+    "local": LocalMediaStore,
+}
+
+_store: Optional[MediaStore] = None
+_store_lock = threading.Lock()
+
+
+def register_media_store(name: str, factory) -> None:
+    MEDIA_STORE_BACKENDS[name] = factory
+
+
+def get_media_store() -> MediaStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                backend = os.getenv("MEDIA_STORE", "local")
+                _store = MEDIA_STORE_BACKENDS[backend]()
+    return _store
@@ -0,0 +1,168 @@
+# smart_librarian/database/migrations.py
+"""One-off data migrations, run through `python manage.py <command>`."""
+from sqlalchemy import func, update
+
+from smart_librarian.database.chat_db import SessionLocal, ConversationORM, MessageORM, message_row
+from smart_librarian.database.media_store import get_media_store
+from smart_librarian.utils.message_helper import extract_inline_media, split_message
+
+
+def migrate_inline_media(batch_size: int = 50) -> dict:
+    """
+    Move base64 <image>/<audio> payloads out of stored messages (the legacy
+    conversations.messages JSONB and the messages table) into the media store,
+    rewriting each message to reference the stored blob.
+    Safe to re-run: already-migrated messages contain no inline payloads.
+    """
+    store = get_media_store()
+    stats = {"conversations": 0, "rewritten": 0, "blobs": 0, "message_rows": 0}
+    last_id = 0
+    while True:
+        with SessionLocal() as s:
+            rows = (
+                s.query(ConversationORM)
+                .filter(ConversationORM.id > last_id)
+                .order_by(ConversationORM.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            for r in rows:
+                last_id = r.id
+                stats["conversations"] += 1
+                changed = False
+                new_messages = []
+                for m in r.messages or []:
+                    content = m.get("content")
+                    if isinstance(content, str) and content:
+                        content, extracted = extract_inline_media(content, store)
+                        if extracted:
+                            m = {**m, "content": content}
+                            stats["blobs"] += extracted
+                            changed = True
+                    new_messages.append(m)
+                if changed:
+                    r.messages = new_messages
+                    stats["rewritten"] += 1
+            s.commit()
+
+    last_id = 0
+    while True:
+        with SessionLocal() as s:
+            rows = (
+                s.query(MessageORM)
+                .filter(MessageORM.id > last_id)
+                .order_by(MessageORM.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            for m in rows:
+                last_id = m.id
+                content, extracted = extract_inline_media(m.content, store)
+                if extracted:
+                    m.content = content
+                    # llm_text/media were derived from the inline payload: derive them again
+                    m.llm_text, m.media = split_message(content)
+                    stats["blobs"] += extracted
+                    stats["message_rows"] += 1
+            s.commit()
+    return stats
+
+
+def migrate_messages_table(batch_size: int = 50) -> dict:
+    """
+    Copy the legacy conversations.messages JSONB arrays into the append-only
+    messages table as seq 1..n, then empty the JSONB column. Inline base64
+    payloads are moved to the media store on the way, so the rows' media
+    references are complete from the start.
+    Conversations that received messages before the migration ran keep them,
+    renumbered after the legacy ones; their running summary, which never saw
+    the legacy turns, is dropped so it gets rebuilt.
+    Safe to re-run: migrated conversations have an empty JSONB column.
+    """
+    store = get_media_store()
+    stats = {"conversations": 0, "messages": 0, "blobs": 0, "shifted": 0}
+    last_id = 0
+    while True:
+        with SessionLocal() as s:
+            rows = (
+                s.query(ConversationORM.id, ConversationORM.messages)
+                .filter(ConversationORM.id > last_id)
+                .order_by(ConversationORM.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            for conv_id, messages in rows:
+                last_id = conv_id
+                legacy = list(messages or [])
+                if not legacy:
+                    continue
+                n = len(legacy)
+                # Bumping last_seq first row-locks the conversation: a concurrent
+                # add_message waits, then appends after the renumbered history
+                last_seq = s.execute(
+                    update(ConversationORM)
+                    .where(ConversationORM.id == conv_id)
+                    .values(last_seq=ConversationORM.last_seq + n, messages=[], updated_at=func.now())
+                    .returning(ConversationORM.last_seq)
+                ).scalar_one()
+                if last_seq > n:
+                    # Two steps, so no intermediate seq collides with the unique (conversation_id, seq) index
+                    for seq in (-(MessageORM.seq + n), -MessageORM.seq):
+                        s.execute(
+                            update(MessageORM)
+                            .where(MessageORM.conversation_id == conv_id)
+                            .values(seq=seq)
+                        )
+                    s.execute(
+                        update(ConversationORM)
+                        .where(ConversationORM.id == conv_id)
+                        .values(summary=None, summary_seq=0)
+                    )
+                    stats["shifted"] += 1
+                for seq, m in enumerate(legacy, start=1):
+                    content = m.get("content") if isinstance(m.get("content"), str) else ""
+                    content, extracted = extract_inline_media(content, store)
+                    stats["blobs"] += extracted
+                    s.add(message_row(conv_id, seq, m.get("role", "user"), content))
+                stats["conversations"] += 1
+                stats["messages"] += n
+            s.commit()
+    return stats
+
+
+def backfill_message_text(batch_size: int = 200) -> dict:
+    """
+    Fill messages.llm_text / messages.media for rows written before they existed.
+    Inline base64 payloads are moved to the media store on the way, so every
+    media reference is a URL. Safe to re-run: only rows with llm_text NULL are touched.
+    """
+    store = get_media_store()
+    stats = {"messages": 0, "blobs": 0}
+    last_id = 0
+    while True:
+        with SessionLocal() as s:
+            rows = (
+                s.query(MessageORM)
+                .filter(MessageORM.id > last_id, MessageORM.llm_text.is_(None))
+                .order_by(MessageORM.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            for m in rows:
+                last_id = m.id
+                content, extracted = extract_inline_media(m.content, store)
+                if extracted:
+                    m.content = content
+                    stats["blobs"] += extracted
+                m.llm_text, m.media = split_message(m.content)
+                stats["messages"] += 1
+            s.commit()
+    return stats
@@ -1,24 +1,16 @@
 # smart_librarian/models/user_db.py
-import os
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, func, UniqueConstraint
+from sqlalchemy import Column, Integer, String, DateTime, func, UniqueConstraint
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.exc import OperationalError
 import time
 import bcrypt
 
-DATABASE_URL = os.getenv(
-    "DATABASE_URL",
-    "postgresql+psycopg2://smartlib:smartlib@db:5432/smartlib"
-)
+# Same engine and pool as the conversation tables (see database/engine.py)
+from smart_librarian.database.engine import engine
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,          # drops dead connections gracefully
-    future=True
-)
-
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+# The user/auth queries keep their own session settings: no autoflush, expire on commit
+SessionLocal = sessionmaker(bind=engine, autoflush=False)
 Base = declarative_base()
 
 class User(Base):
@@ -0,0 +1,153 @@
+# smart_librarian/models/answer_cache.py
+"""
+Semantic answer cache for first-turn recommendation queries.
+
+Replies are grouped by (system prompt version, retrieved candidate titles);
+within a group a stored reply is reused when the new query's embedding has a
+cosine similarity of at least ANSWER_CACHE_THRESHOLD with the query that
+produced it. Only used when the conversation has no prior context, since the
+reply would otherwise depend on the history.
+
+The query embedding is the one retrieval computed for its vector search.
+Queries answered by the title/theme fast paths have none and skip the cache
+rather than paying for an embedding.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from itertools import count
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+import numpy as np
+
+
+ANSWER_CACHE = os.getenv("ANSWER_CACHE", "0") == "1"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))           # entries across all groups
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(6 * 3600)))    # seconds per entry, 0 = never expire
+
+
+class SemanticAnswerCache:
+    """
+    Thread-safe LRU of (query vector, answer) entries, bucketed by an exact key.
+
+    Args:
+        threshold: minimum cosine similarity for a hit
+        max_entries: entries kept before the least recently used one is evicted
+        ttl: seconds an entry stays valid (None = no expiry)
+    """
+
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD, max_entries: int = ANSWER_CACHE_SIZE,
+                 ttl: Optional[float] = ANSWER_CACHE_TTL or None):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._ids = count()
+        # bucket key -> {entry id: (unit vector, answer, expires_at)}
+        self._buckets: Dict[Hashable, Dict[int, Tuple[np.ndarray, Any, float]]] = {}
+        self._lru: "OrderedDict[int, Hashable]" = OrderedDict()   # entry id -> bucket key
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def bucket_key(prompt_version: str, titles: Iterable[str]) -> Tuple:
+        return (prompt_version, tuple(sorted(titles)))
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def _drop(self, entry_id: int) -> None:
+        bucket_key = self._lru.pop(entry_id)
+        bucket = self._buckets[bucket_key]
+        del bucket[entry_id]
+        if not bucket:
+            del self._buckets[bucket_key]
+
+    def get(self, bucket_key: Hashable, vector) -> Optional[Any]:
+        query = self._unit(vector)
+        now = time.monotonic()
+        with self._lock:
+            best_id, best_score = None, self.threshold
+            for entry_id, (stored, _, expires_at) in list(self._buckets.get(bucket_key, {}).items()):
+                if expires_at and expires_at < now:
+                    self._drop(entry_id)
+                    self.expirations += 1
+                    continue
+                score = float(stored @ query)
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._lru.move_to_end(best_id)
+            return self._buckets[bucket_key][best_id][1]
+
+    def set(self, bucket_key: Hashable, vector, answer: Any) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0.0
+        with self._lock:
+            entry_id = next(self._ids)
+            self._buckets.setdefault(bucket_key, {})[entry_id] = (self._unit(vector), answer, expires_at)
+            self._lru[entry_id] = bucket_key
+            while len(self._lru) > self.max_entries:
+                self._drop(next(iter(self._lru)))
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._lru),
+            "groups": len(self._buckets),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_cache: Optional[SemanticAnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    """The shared cache, or None when ANSWER_CACHE is off."""
+    global _cache
+    if ANSWER_CACHE and _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticAnswerCache()
+    return _cache
+
+
+def lookup_answer(query_vector, titles: Iterable[str], prompt_version: str):
+    """
+    Cached answer for a first-turn query, plus what store_answer needs to fill
+    the cache on a miss: (answer or None, slot or None). slot is None when the
+    cache is disabled or the query has no embedding: retrieval answered it
+    without one (a title or theme lookup), and the cache doesn't add one.
+    """
+    cache = get_answer_cache()
+    if cache is None or query_vector is None:
+        return None, None
+    bucket_key = cache.bucket_key(prompt_version, titles)
+    return cache.get(bucket_key, query_vector), (bucket_key, query_vector)
+
+
+def store_answer(slot, answer: Any) -> None:
+    cache = get_answer_cache()
+    if cache is not None and slot is not None:
+        cache.set(slot[0], slot[1], answer)
+
+
+def answer_cache_stats() -> dict:
+    return {"enabled": ANSWER_CACHE, **(_cache.stats() if _cache is not None else {})}
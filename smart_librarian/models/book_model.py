@@ -1,72 +1,322 @@
 import os
-from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
-from langchain.schema import Document
-from langchain.text_splitter import CharacterTextSplitter
-from pathlib import Path
-from src.file_paths import SUMMARY_FILE, CHROMA_DIR
-
-book_summaries_dict = {}
-titles = []
+import glob
+import json
+import unicodedata
+from collections import Counter, defaultdict
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from src.file_paths import SUMMARY_FILE, NUMPY_INDEX_DIR
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+# "chroma" (persistent Chroma collection) or "numpy" (in-process matrix, see NumpyVectorStore)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+# Storage precision for the numpy backend: float32 | float16 | int8
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float32")
+# float16/int8 rows are widened to float32 this many at a time when scoring
+VECTOR_SCORE_BLOCK_ROWS = int(os.getenv("VECTOR_SCORE_BLOCK_ROWS", "4096"))
+# Minimum trigram similarity (Dice coefficient, 0..1) for a fuzzy title match
+TITLE_MATCH_THRESHOLD = float(os.getenv("TITLE_MATCH_THRESHOLD", "0.6"))
+# Comma-separated summary files or glob patterns (catalog shards); default SUMMARY_FILE
+SUMMARY_FILES = os.getenv("SUMMARY_FILES", "")
+
 # === Load summaries ===
-def load_summaries(file_path=SUMMARY_FILE):
-    summaries = []
-    with open(file_path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    current_title = None
-    current_summary = []
-    for line in lines:
-        line = line.strip()
-        if line.startswith("## Title: "):
-            if current_title and current_summary:
-                summaries.append(Document(
-                    page_content=" ".join(current_summary),
-                    metadata={"title": current_title}
-                ))
-                book_summaries_dict[current_title] = current_summary
-                titles.append(current_title)
-            current_title = line.replace("## Title: ", "")
+def summary_sources(spec: Optional[str] = None) -> List[str]:
+    """
+    Summary files to load, in order. `spec` (default: $SUMMARY_FILES) is a
+    comma-separated list of paths or glob patterns ("data/shards/*.txt");
+    without one, SUMMARY_FILE alone.
+    """
+    spec = SUMMARY_FILES if spec is None else spec
+    paths = []
+    for part in (p.strip() for p in spec.split(",")):
+        if part:
+            paths.extend(sorted(glob.glob(part)) if glob.has_magic(part) else [part])
+    return paths or [SUMMARY_FILE]
+
+
+def iter_records(paths=None) -> Iterator[Tuple[str, str]]:
+    """
+    Stream (title, summary) records from one or more summary files, one line
+    at a time. A file is a sequence of "## Title: ..." lines, each followed by
+    the lines of its summary.
+    """
+    if paths is None:
+        paths = summary_sources()
+    elif isinstance(paths, str):
+        paths = [paths]
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            current_title = None
             current_summary = []
-        elif line:
-            current_summary.append(line)
-
-    if current_title and current_summary:
-        # print(f"titlu curent:{current_title}\n rezumat:{current_summary}")
-        book_summaries_dict[current_title] = current_summary
-        titles.append(current_title)
-        summaries.append(Document(
-            page_content=" ".join(current_summary),
-            metadata={"title": current_title}
-        ))
-    # print("aici apare book summaries")
-    # print(book_summaries_dict)
-    return summaries
-
-# === Embed and store in Chroma using LangChain ===
-def build_vectorstore(docs):
-    if Path(CHROMA_DIR).exists():
-        print("🔁 Reusing existing ChromaDB")
-        return Chroma(persist_directory=CHROMA_DIR, embedding_function=OpenAIEmbeddings())
-
-    print("🔨 Building new Chroma vectorstore")
-    vectorstore = Chroma.from_documents(
-        documents=docs,
-        embedding=OpenAIEmbeddings(),
-        persist_directory=CHROMA_DIR
-    )
-    vectorstore.persist()
-    return vectorstore
+            for line in f:
+                line = line.strip()
+                if line.startswith("## Title: "):
+                    if current_title and current_summary:
+                        yield current_title, " ".join(current_summary)
+                    current_title = line.replace("## Title: ", "")
+                    current_summary = []
+                elif line:
+                    current_summary.append(line)
+            if current_title and current_summary:
+                yield current_title, " ".join(current_summary)
 
-def get_summary_by_title(title: str) -> str:
-    summary = book_summaries_dict.get(title, [])
-    if isinstance(summary, list):
-        return " ".join(summary)
-    return summary or ""
 
+def iter_documents(records: Iterable[Tuple[str, str]]) -> Iterator["Document"]:
+    # Imported here: langchain is only needed to build or load the vector index, not to serve lookups
+    from langchain_core.documents import Document
+    for title, summary in records:
+        yield Document(page_content=summary, metadata={"title": title})
+
+
+def load_summaries(file_path=SUMMARY_FILE):
+    """Parse summary file(s) into a list of Documents. Prefer iter_records for large catalogs."""
+    return list(iter_documents(iter_records(file_path)))
+
+# === Title resolution ===
+_APOSTROPHES = "'’‘`´"
+
+
+def normalize_title(text: str) -> str:
+    """
+    Canonical form for matching: case-folded, apostrophes dropped, other
+    punctuation and symbols turned into spaces, whitespace collapsed.
+    "Harry Potter and the Sorcerer’s Stone" -> "harry potter and the sorcerers stone"
+    """
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    out = []
+    for ch in text:
+        if ch in _APOSTROPHES:
+            continue
+        out.append(" " if unicodedata.category(ch)[0] in "PS" else ch)
+    return " ".join("".join(out).split())
+
+
+def _trigrams(normalized: str) -> set:
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    """
+    Precomputed normalized-title lookup: exact match on the normalized form,
+    then fuzzy match by trigram overlap through an inverted index.
+    """
+
+    MIN_MENTION_CHARS = 4   # shorter titles ("It") would match inside ordinary text
+
+    def __init__(self, titles):
+        self.titles: List[str] = list(titles)
+        self._normalized: List[str] = [normalize_title(t) for t in self.titles]
+        self._exact = {}
+        self._grams: List[set] = []
+        self._postings = defaultdict(list)
+        for i, norm in enumerate(self._normalized):
+            self._exact.setdefault(norm, self.titles[i])
+            grams = _trigrams(norm)
+            self._grams.append(grams)
+            for gram in grams:
+                self._postings[gram].append(i)
+
+    def _overlaps(self, grams: set) -> Counter:
+        counts = Counter()
+        for gram in grams:
+            counts.update(self._postings.get(gram, ()))
+        return counts
+
+    def match(self, query: str, limit: int = 5, threshold: float = TITLE_MATCH_THRESHOLD) -> List[Tuple[str, float]]:
+        """Best matching titles as [(title, score)], score 1.0 for an exact normalized match."""
+        norm = normalize_title(query)
+        if not norm:
+            return []
+        exact = self._exact.get(norm)
+        if exact is not None:
+            return [(exact, 1.0)]
+        grams = _trigrams(norm)
+        scored = []
+        for i, shared in self._overlaps(grams).items():
+            score = 2 * shared / (len(grams) + len(self._grams[i]))
+            if score >= threshold:
+                scored.append((self.titles[i], round(score, 4)))
+        scored.sort(key=lambda item: -item[1])
+        return scored[:limit]
 
+    def resolve(self, query: str, threshold: float = TITLE_MATCH_THRESHOLD) -> Optional[str]:
+        """Canonical title for an exact or approximate title, or None."""
+        matches = self.match(query, limit=1, threshold=threshold)
+        return matches[0][0] if matches else None
 
+    def mentions(self, text: str, limit: int = 3) -> List[str]:
+        """Titles that appear verbatim (after normalization) inside free text, in text order."""
+        norm = normalize_title(text)
+        if not norm:
+            return []
+        padded = f" {norm} "
+        grams = _trigrams(norm)
+        found = []
+        for i, shared in self._overlaps(grams).items():
+            title_norm = self._normalized[i]
+            # every inner trigram of the title must occur in the text before the substring check
+            if len(title_norm) < self.MIN_MENTION_CHARS or shared < len(self._grams[i]) - 3:
+                continue
+            position = padded.find(f" {title_norm} ")
+            if position >= 0:
+                found.append((position, self.titles[i]))
+        found.sort()
+        return list(dict.fromkeys(title for _, title in found))[:limit]
 
 
+# === In-process vector index (alternative to Chroma) ===
+class NumpyVectorStore:
+    """
+    Unit-normalized embeddings as one contiguous matrix; top-k is a single
+    dot product + argpartition. Saved as .npy so it can be memory-mapped on load.
 
+    Mirrors the Chroma methods api_send uses and returns the same
+    (Document, relevance score) pairs; the score is cosine similarity.
+    """
 
+    def __init__(self, docs, matrix, embeddings, scales=None):
+        self.docs = list(docs)
+        self.matrix = matrix          # (n, dim): float32 / float16, or int8 with per-row scales
+        self.scales = scales          # (n,) float32, only for int8
+        self.embeddings = embeddings
+
+    # -------- build / persist --------
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        m = np.asarray(vectors, dtype=np.float32)
+        if m.ndim == 1:
+            m = m[None, :]
+        norms = np.linalg.norm(m, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return m / norms
+
+    @staticmethod
+    def _quantize(m: np.ndarray, dtype: str):
+        if dtype == "float16":
+            return m.astype(np.float16), None
+        if dtype == "int8":
+            scales = np.abs(m).max(axis=1)
+            scales[scales == 0] = 1.0
+            q = np.round(m / scales[:, None] * 127).astype(np.int8)
+            return q, (scales / 127).astype(np.float32)
+        return np.ascontiguousarray(m, dtype=np.float32), None
+
+    @classmethod
+    def from_documents(cls, docs, embeddings, dtype: str = VECTOR_DTYPE):
+        return cls.from_vectors(docs, embeddings.embed_documents([d.page_content for d in docs]), embeddings, dtype)
+
+    @classmethod
+    def from_vectors(cls, docs, vectors, embeddings, dtype: str = VECTOR_DTYPE):
+        matrix, scales = cls._quantize(cls._normalize(vectors), dtype) if len(vectors) else (np.zeros((0, 0), np.float32), None)
+        return cls(docs, matrix, embeddings, scales)
+
+    def save(self, directory: str = NUMPY_INDEX_DIR) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self._save_array(os.path.join(directory, "vectors.npy"), self.matrix)
+        if self.scales is not None:
+            self._save_array(os.path.join(directory, "scales.npy"), self.scales)
+        elif os.path.exists(os.path.join(directory, "scales.npy")):
+            os.remove(os.path.join(directory, "scales.npy"))
+        meta = {
+            "dtype": str(self.matrix.dtype),
+            "docs": [{"page_content": d.page_content, "metadata": d.metadata} for d in self.docs],
+        }
+        with open(os.path.join(directory, "docs.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    @staticmethod
+    def _save_array(path: str, array: np.ndarray) -> None:
+        # Write then rename: a live memory map of the old file stays valid
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, embeddings, directory: str = NUMPY_INDEX_DIR):
+        with open(os.path.join(directory, "docs.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        from langchain_core.documents import Document
+        docs = [Document(page_content=d["page_content"], metadata=d["metadata"]) for d in meta["docs"]]
+        matrix = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        scales_path = os.path.join(directory, "scales.npy")
+        scales = np.load(scales_path) if os.path.exists(scales_path) else None
+        return cls(docs, matrix, embeddings, scales)
+
+    def dense(self) -> np.ndarray:
+        """The stored vectors as float32 (de-quantized when stored as int8)."""
+        dense = np.asarray(self.matrix, dtype=np.float32)
+        if self.scales is not None:
+            dense = dense * self.scales[:, None]
+        return dense
+
+    @staticmethod
+    def exists(directory: str = NUMPY_INDEX_DIR) -> bool:
+        return os.path.exists(os.path.join(directory, "vectors.npy"))
+
+    # -------- search --------
+
+    def _scores(self, queries: np.ndarray) -> np.ndarray:
+        """(b, dim) normalized queries -> (b, n) cosine similarities."""
+        if self.matrix.dtype == np.float32:
+            scores = queries @ self.matrix.T
+        else:
+            # Widen one block of rows at a time: a query never holds a float32
+            # copy of the whole quantized (memory-mapped) matrix
+            n = self.matrix.shape[0]
+            scores = np.empty((queries.shape[0], n), dtype=np.float32)
+            for start in range(0, n, VECTOR_SCORE_BLOCK_ROWS):
+                block = np.asarray(self.matrix[start:start + VECTOR_SCORE_BLOCK_ROWS], dtype=np.float32)
+                scores[:, start:start + len(block)] = queries @ block.T
+        if self.scales is not None:
+            scores *= self.scales[None, :]
+            np.clip(scores, -1.0, 1.0, out=scores)   # int8 rounding can overshoot slightly
+        return scores
+
+    def _top_k(self, scores: np.ndarray, k: int):
+        n = scores.shape[0]
+        if n == 0:
+            return []
+        k = min(k, n)
+        idx = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+        idx = idx[np.argsort(-scores[idx])]
+        return [(self.docs[i], float(scores[i])) for i in idx]
+
+    def batch_similarity_search_with_relevance_scores(self, queries, k: int = 4):
+        if not queries:
+            return []
+        # One embeddings request for the whole batch (CachedEmbeddings still caches per query)
+        embed = getattr(self.embeddings, "embed_queries", self.embeddings.embed_documents)
+        q = self._normalize(embed(list(queries)))
+        scores = self._scores(q)
+        return [self._top_k(row, k) for row in scores]
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k: int = 4, **kwargs):
+        return self._top_k(self._scores(self._normalize(embedding))[0], k)
+
+    def similarity_search_with_relevance_scores(self, query: str, k: int = 4, **kwargs):
+        return self.batch_similarity_search_with_relevance_scores([query], k=k)[0]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_relevance_scores(query, k=k)]
+
+
+# === Embed and store (Chroma or numpy), re-embedding only what changed ===
+def build_vectorstore(docs):
+    # Imported here: the indexer itself imports this module
+    from smart_librarian.models.indexer import sync_index
+    return sync_index(docs).vectorstore
+
+def open_vectorstore():
+    """The index as last built, without syncing it (e.g. to reopen it in a forked worker)."""
+    from smart_librarian.models.indexer import open_index
+    return open_index()
+
+def get_summary_by_title(title: str) -> str:
+    # Imported here: the catalog module itself imports this one
+    from smart_librarian.models.catalog import get_catalog
+    return get_catalog().get_summary(title)
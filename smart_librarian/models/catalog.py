@@ -0,0 +1,328 @@
+# smart_librarian/models/catalog.py
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from smart_librarian.models.book_model import (summary_sources, iter_documents, build_vectorstore, open_vectorstore,
+                                               TitleIndex, VECTOR_BACKEND)
+from smart_librarian.models.catalog_store import CatalogStore, open_catalog_store
+from smart_librarian.models.search_index import BM25Index, ThemeIndex, reciprocal_rank_fusion
+from smart_librarian.utils.log import get_logger
+from smart_librarian.utils.metrics import timed_stage
+
+# Load the catalog in the background at startup rather than on the first request that needs it
+CATALOG_WARMUP = os.getenv("CATALOG_WARMUP", "1") == "1"
+
+log = get_logger(__name__)
+
+
+class CatalogData(NamedTuple):
+    """One loaded version of the catalog; replaced as a whole on reload, never mutated."""
+    store: CatalogStore
+    titles: List[str]
+    title_index: TitleIndex
+    bm25: BM25Index
+    theme_index: ThemeIndex
+    vectorstore: Any    # None in a forked worker until reopened (see _vectors)
+
+
+class Retrieval(NamedTuple):
+    """Candidate titles for a query, and the query's embedding when the vector index was searched."""
+    candidates: List[Tuple[str, float]]
+    query_vector: Optional[List[float]]
+
+
+class CatalogService:
+    """
+    Process-wide owner of the book catalog: the summaries (memory-mapped, see
+    CatalogStore), the title lookup (exact + fuzzy, see TitleIndex), the BM25
+    and theme indexes and the vector store. Loaded lazily on first access,
+    exactly once, behind a lock.
+
+    Only titles are kept as Python strings; the indexes are built by streaming
+    records out of the store, and summaries are read from it on demand.
+
+    All of it is one CatalogData snapshot: reload() builds a new one next to
+    the current one and swaps the reference, so requests in flight finish on
+    the version they started with. Under a pre-fork server the snapshot is
+    loaded once in the master (preload()) and shared copy-on-write by the workers.
+    """
+    # Chroma can't be used across a fork: its native runtime keeps its threads in
+    # the parent, and a forked worker's queries hang. With that backend the
+    # master never opens it; every worker does, on first use.
+    FORK_SAFE_VECTORS = VECTOR_BACKEND == "numpy"
+
+    def __init__(self, sources: Optional[List[str]] = None):
+        self._sources = sources   # None: SUMMARY_FILES, re-read on every (re)load
+        self.sources = sources or summary_sources()
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._data: Optional[CatalogData] = None
+        self._prefork = False   # loaded in a pre-fork master: see preload()
+        self._loading = False
+        self._error: Optional[str] = None   # why the last load failed
+        self._stats: Dict[str, Any] = {"loads": 0}
+
+    # -------- lifecycle --------
+
+    def _ensure_loaded(self) -> CatalogData:
+        data = self._data
+        if data is not None:
+            return data
+        with self._lock:
+            if self._data is None:   # else another thread won the race
+                self._loading = True
+                try:
+                    self._install(*self._build())
+                    self._error = None
+                except Exception as e:
+                    self._error = f"{type(e).__name__}: {e}"
+                    raise
+                finally:
+                    self._loading = False
+            return self._data
+
+    def _build(self) -> Tuple[CatalogData, Dict[str, Any]]:
+        self.sources = self._sources or summary_sources()
+        started = time.perf_counter()
+        store = open_catalog_store(self.sources)
+        titles = list(store.titles())   # unique, source order
+        parsed_at = time.perf_counter()
+
+        title_index = TitleIndex(titles)
+        bm25 = BM25Index(f"{title}\n{summary}" for title, summary in store.items())
+        theme_index = ThemeIndex(store.items())
+        indexed_at = time.perf_counter()
+        if self._prefork and not self.FORK_SAFE_VECTORS:
+            _sync_vectors_in_subprocess(self.sources)
+            vectorstore = None
+        else:
+            vectorstore = build_vectorstore(iter_documents(store.items()))
+        finished = time.perf_counter()
+
+        stats = {
+            "parse_seconds": round(parsed_at - started, 4),
+            "index_seconds": round(indexed_at - parsed_at, 4),
+            "vectorstore_seconds": round(finished - indexed_at, 4),
+            "load_seconds": round(finished - started, 4),
+            "loaded_at": time.time(),
+        }
+        log.info("catalog loaded", extra={"titles": len(titles), "seconds": stats["load_seconds"]})
+        return CatalogData(store, titles, title_index, bm25, theme_index, vectorstore), stats
+
+    def _install(self, data: CatalogData, stats: Dict[str, Any]) -> None:
+        self._stats.update(stats, loads=self._stats["loads"] + 1)
+        self._data = data
+
+    def preload(self) -> None:
+        """
+        Load now, in a pre-fork server's master, rather than on a worker's first
+        request. Everything but a Chroma index is then shared by the workers.
+        """
+        self._prefork = True
+        self._ensure_loaded()
+
+    def warm_up(self) -> None:
+        """Start loading on a background thread so the first request doesn't wait for it (see /readyz)."""
+        def load():
+            try:
+                self._ensure_loaded()
+            except Exception:
+                log.exception("catalog warm-up failed")   # the next request that needs it retries
+
+        threading.Thread(target=load, name="catalog-warm-up", daemon=True).start()
+
+    def reload(self) -> None:
+        """
+        Re-read the summary files (rebuilding the store and re-embedding only
+        what changed) and switch to the new version. Lookups keep being served
+        from the current version meanwhile; a failed reload keeps it.
+        """
+        with self._reload_lock:
+            built = self._build()
+            with self._lock:
+                self._install(*built)
+
+    def _vectors(self, data: CatalogData):
+        if data.vectorstore is not None:
+            return data.vectorstore
+        with self._lock:
+            if self._data.vectorstore is None:
+                self._data = self._data._replace(vectorstore=open_vectorstore())
+            return self._data.vectorstore
+
+    def _after_fork(self) -> None:
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        data = self._data
+        self._prefork = False
+        if data is not None and not self.FORK_SAFE_VECTORS:
+            self._data = data._replace(vectorstore=None)   # reopened in this process on first use
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._data is not None
+
+    @property
+    def loaded_at(self) -> Optional[float]:
+        """When the current catalog data was loaded: changes on every (re)load."""
+        return self._stats.get("loaded_at")
+
+    def status(self) -> Dict[str, Any]:
+        """Readiness: "ready", "loading", "failed" (the next access retries) or "not_loaded"."""
+        data = self._data
+        if data is not None:
+            return {"state": "ready", "titles": len(data.titles), "loaded_at": self.loaded_at}
+        if self._loading:
+            return {"state": "loading"}
+        if self._error is not None:
+            return {"state": "failed", "error": self._error}
+        return {"state": "not_loaded"}
+
+    # -------- accessors --------
+
+    def items(self):
+        """(title, summary) for every book, streamed from the store."""
+        return self._ensure_loaded().store.items()
+
+    @property
+    def titles(self) -> List[str]:
+        return self._ensure_loaded().titles
+
+    @property
+    def vectorstore(self):
+        return self._vectors(self._ensure_loaded())
+
+    @property
+    def title_index(self) -> TitleIndex:
+        return self._ensure_loaded().title_index
+
+    def get_summary(self, title: str) -> str:
+        return self._ensure_loaded().store.get(title, "")
+
+    def resolve_title(self, query: str) -> Optional[str]:
+        """Canonical title for an exact or approximate title (case, punctuation, typos)."""
+        return self.title_index.resolve(query)
+
+    @property
+    def theme_index(self) -> ThemeIndex:
+        return self._ensure_loaded().theme_index
+
+    def retrieve(self, query: str, k: int = 3, pool: int = 10) -> List[Tuple[str, float]]:
+        """Candidate titles for a query as [(title, relevance)], best first (see search())."""
+        return self.search(query, k=k, pool=pool).candidates
+
+    @timed_stage("retrieval")
+    def search(self, query: str, k: int = 3, pool: int = 10) -> Retrieval:
+        """
+        Candidate titles for a query as [(title, relevance)], best first, plus
+        the query embedding if one was computed (None on the fast paths).
+
+        - Titles named in the query come first with relevance 1.0. A title that
+          only approximately matches the whole query (a typo) ranks by its match
+          score instead, below 1.0.
+        - A pure theme query ("books about friendship") is answered from the
+          theme index alone: books carrying more of the query's themes first,
+          then by BM25 score, with relevance up to 0.95. So is a query that is
+          just a title. No embedding call is made for these.
+        - Otherwise the BM25 and vector rankings (top `pool` each) are merged by
+          reciprocal rank fusion.
+        """
+        data = self._ensure_loaded()   # one version for the whole query, even across a reload
+        exact = data.title_index.match(query, limit=1)
+        if exact and exact[0][1] == 1.0:
+            return Retrieval([(exact[0][0], 1.0)], None)   # the query is just a title
+        named = data.title_index.mentions(query)
+        candidates = {title: 1.0 for title in named}
+        fuzzy = [] if named else [(title, round(min(0.99, score), 2)) for title, score in exact]
+
+        themes = data.theme_index.query_themes(query)
+        if themes:
+            matched = Counter(title for theme in themes for title in data.theme_index.titles_for(theme))
+            lexical = {data.titles[i]: score for i, score in data.bm25.search(" ".join(themes), k=None)}
+            for title in sorted(matched, key=lambda t: (-matched[t], -lexical.get(t, 0.0))):
+                if len(candidates) >= k + len(named):
+                    break
+                candidates.setdefault(title, round(0.95 * matched[title] / len(themes), 2))
+            return Retrieval(self._ranked(candidates, fuzzy, k + len(named)), None)
+
+        lexical = [data.titles[i] for i, _ in data.bm25.search(query, k=pool)]
+        vectorstore = self._vectors(data)
+        query_vector = vectorstore.embeddings.embed_query(query)
+        # Only the order is used: Chroma scores these by distance, the numpy store by similarity
+        vector_hits = vectorstore.similarity_search_by_vector_with_relevance_scores(query_vector, k=pool)
+        vector = [d.metadata.get("title", "Untitled") for d, _ in vector_hits]
+        fused = reciprocal_rank_fusion([lexical, vector])
+        # 1.0 marks a title the user named; keep fused relevance just below it
+        best = fused[0][1] if fused else 1.0
+        for title, score in fused:
+            if len(candidates) >= k + len(named):
+                break
+            candidates.setdefault(title, round(min(0.99, score / best), 2))
+        return Retrieval(self._ranked(candidates, fuzzy, k + len(named)), query_vector)
+
+    @staticmethod
+    def _ranked(candidates: Dict[str, float], extra: List[Tuple[str, float]], limit: int) -> List[Tuple[str, float]]:
+        """candidates plus extra, best first (stable: equal scores keep their order), top `limit`."""
+        for title, score in extra:
+            candidates.setdefault(title, score)
+        return sorted(candidates.items(), key=lambda item: -item[1])[:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        """Load-time stats plus an approximate memory footprint of the catalog data."""
+        data = self._data
+        out = dict(self._stats)
+        out["loaded"] = data is not None
+        out["titles"] = len(data.titles) if data is not None else 0
+        out["themes"] = len(data.theme_index.themes()) if data is not None else 0
+        out["approx_bytes"] = self._approx_bytes(data.titles) if data is not None else 0
+        out["store"] = data.store.stats() if data is not None else {}
+        from smart_librarian.models.embedding_cache import embedding_cache_stats   # langchain: deferred until used
+        out["embedding_cache"] = embedding_cache_stats()
+        return out
+
+    @staticmethod
+    def _approx_bytes(titles: List[str]) -> int:
+        """Python-heap size of the title list; summaries live in the memory-mapped store."""
+        return sys.getsizeof(titles) + sum(sys.getsizeof(title) for title in titles)
+
+
+def _sync_vectors(sources: List[str]) -> None:
+    build_vectorstore(iter_documents(open_catalog_store(sources).items()))
+
+
+def _sync_vectors_in_subprocess(sources: List[str]) -> None:
+    """Bring the vector index up to date from a fresh interpreter, leaving this process fork-safe."""
+    process = multiprocessing.get_context("spawn").Process(target=_sync_vectors, args=(sources,))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        raise RuntimeError(f"vector index sync failed (exit code {process.exitcode})")
+
+
+_catalog: Optional[CatalogService] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> CatalogService:
+    """Return the shared CatalogService (created on first call; loading stays lazy)."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = CatalogService()
+    return _catalog
+
+
+def _reset_after_fork() -> None:
+    global _catalog_lock
+    _catalog_lock = threading.Lock()
+    if _catalog is not None:
+        _catalog._after_fork()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
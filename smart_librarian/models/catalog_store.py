@@ -0,0 +1,242 @@
+# smart_librarian/models/catalog_store.py
+"""
+Compact on-disk catalog: the summaries in one UTF-8 text file that is
+memory-mapped, the titles in another, plus two small numpy arrays, also mapped:
+
+  text.bin     summary bytes, record after record
+  titles.bin   one title per line, in row order (titles never contain a newline)
+  rows.npy     (n, 4) int64: title offset, title length, summary offset, summary length
+  slots.npy    open-addressing hash table over exact titles: row + 1, 0 = empty
+  meta.json    record count and the size/mtime of the source shards it was built from
+
+get() is an O(1) expected lookup (hash, a probe or two, one slice of the map);
+summaries are only turned into Python strings when asked for. The store is
+rebuilt from the source shards whenever one of them changes (see open_catalog_store).
+"""
+import hashlib
+import json
+import mmap
+import os
+import time
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from smart_librarian.models.book_model import iter_records
+from smart_librarian.utils.log import get_logger
+from src.file_paths import CATALOG_STORE_DIR
+
+STORE_VERSION = 1
+ROW_CHUNK = 4096   # rows converted to Python ints at a time when iterating
+
+log = get_logger(__name__)
+
+
+def title_hash(title_bytes: bytes) -> int:
+    """Stable 63-bit hash (it is persisted in slots.npy, so not Python's hash())."""
+    return int.from_bytes(hashlib.blake2b(title_bytes, digest_size=8).digest(), "little") >> 1
+
+
+def _table_size(n: int) -> int:
+    """Power of two with a load factor of at most 1/2."""
+    size = 8
+    while size < 2 * n:
+        size *= 2
+    return size
+
+
+def source_info(paths: Iterable[str]) -> List[dict]:
+    info = []
+    for path in paths:
+        st = os.stat(path)
+        info.append({"path": os.path.abspath(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns})
+    return info
+
+
+class CatalogStore:
+    """Read-only view of a built store directory. Safe to share between threads."""
+
+    def __init__(self, directory: str = CATALOG_STORE_DIR):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.rows = np.load(os.path.join(directory, "rows.npy"), mmap_mode="r")
+        self.slots = np.load(os.path.join(directory, "slots.npy"), mmap_mode="r")
+        self._mask = len(self.slots) - 1
+        self._text = self._map(os.path.join(directory, "text.bin"))
+        self._titles = self._map(os.path.join(directory, "titles.bin"))
+
+    @staticmethod
+    def _map(path: str):
+        with open(path, "rb") as f:
+            # mmap can't map an empty file
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _title_bytes(self, row: int) -> bytes:
+        offset, length = int(self.rows[row, 0]), int(self.rows[row, 1])
+        return self._titles[offset:offset + length]
+
+    def _summary(self, row: int) -> str:
+        offset, length = int(self.rows[row, 2]), int(self.rows[row, 3])
+        return self._text[offset:offset + length].decode("utf-8")
+
+    def find(self, title: str) -> Optional[int]:
+        """Row of an exact title, or None."""
+        key = title.encode("utf-8")
+        slot = title_hash(key) & self._mask
+        while True:
+            entry = int(self.slots[slot])
+            if entry == 0:
+                return None
+            if self._title_bytes(entry - 1) == key:
+                return entry - 1
+            slot = (slot + 1) & self._mask
+
+    def get(self, title: str, default: Optional[str] = None) -> Optional[str]:
+        row = self.find(title)
+        return default if row is None else self._summary(row)
+
+    def __contains__(self, title: str) -> bool:
+        return self.find(title) is not None
+
+    def titles(self) -> List[str]:
+        """Every title, in row order (reads only titles.bin)."""
+        return self._titles[:].decode("utf-8").split("\n")[:-1] if len(self) else []
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        """(title, summary) in row order; one record in memory at a time."""
+        for start in range(0, len(self.rows), ROW_CHUNK):
+            for t_off, t_len, s_off, s_len in np.asarray(self.rows[start:start + ROW_CHUNK]).tolist():
+                yield (self._titles[t_off:t_off + t_len].decode("utf-8"),
+                       self._text[s_off:s_off + s_len].decode("utf-8"))
+
+    def is_fresh(self, paths: Iterable[str]) -> bool:
+        try:
+            return self.meta.get("version") == STORE_VERSION and self.meta.get("sources") == source_info(paths)
+        except OSError:
+            return False
+
+    def stats(self) -> dict:
+        return {
+            "records": len(self),
+            "text_bytes": len(self._text) + len(self._titles),
+            "index_bytes": int(self.rows.nbytes + self.slots.nbytes),
+            "built_at": self.meta.get("built_at"),
+            "shards": len(self.meta.get("sources", [])),
+        }
+
+    def close(self) -> None:
+        for mapped in (self._text, self._titles):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+
+
+def _replace_array(path: str, values: np.ndarray) -> None:
+    # Write then rename: processes that still map the old file keep a valid view
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, values)
+    os.replace(tmp_path, path)
+
+
+def _compact_text(path: str, summaries: array) -> None:
+    """Rewrite the summary file with only the referenced spans, in row order, updating their offsets."""
+    compact_path = f"{path}.compact"
+    offset = 0
+    with open(path, "rb") as src, open(compact_path, "wb") as out:
+        for i in range(0, len(summaries), 2):
+            src.seek(summaries[i])
+            out.write(src.read(summaries[i + 1]))
+            summaries[i] = offset
+            offset += summaries[i + 1]
+    os.replace(compact_path, path)
+
+
+def build_catalog_store(records: Iterable[Tuple[str, str]], paths: Iterable[str] = (),
+                        directory: str = CATALOG_STORE_DIR) -> CatalogStore:
+    """
+    Stream `records` into a new store in `directory` and open it.
+
+    A title seen again (e.g. in a later shard) replaces the earlier record but
+    keeps its position; the replaced summaries are then dropped from text.bin.
+    `paths` are the sources, recorded for is_fresh().
+    Raises ValueError for a title containing a newline.
+    """
+    os.makedirs(directory, exist_ok=True)
+    text_path = os.path.join(directory, "text.bin")
+    titles_path = os.path.join(directory, "titles.bin")
+    tmp_text = f"{text_path}.{os.getpid()}.tmp"
+    tmp_titles = f"{titles_path}.{os.getpid()}.tmp"
+
+    summaries = array("q")            # flat: summary offset, length per row
+    row_by_title: Dict[bytes, int] = {}   # insertion order = row order
+    offset = replaced = 0
+    with open(tmp_text, "wb") as out:
+        for title, summary in records:
+            if "\n" in title:
+                raise ValueError(f"title contains a newline: {title!r}")
+            title_bytes, summary_bytes = title.encode("utf-8"), summary.encode("utf-8")
+            out.write(summary_bytes)
+            row = row_by_title.get(title_bytes)
+            if row is None:
+                row_by_title[title_bytes] = len(summaries) // 2
+                summaries.extend((offset, len(summary_bytes)))
+            else:
+                summaries[row * 2:row * 2 + 2] = array("q", (offset, len(summary_bytes)))
+                replaced += 1
+            offset += len(summary_bytes)
+    if replaced:
+        _compact_text(tmp_text, summaries)
+
+    n = len(row_by_title)
+    rows = np.zeros((n, 4), dtype=np.int64)
+    if n:
+        rows[:, 2:] = np.frombuffer(summaries, dtype=np.int64).reshape(n, 2)
+    del summaries
+    offset = 0
+    with open(tmp_titles, "wb") as out:
+        for row, title_bytes in enumerate(row_by_title):
+            out.write(title_bytes + b"\n")
+            rows[row, 0], rows[row, 1] = offset, len(title_bytes)
+            offset += len(title_bytes) + 1
+
+    slots = np.zeros(_table_size(n), dtype=np.int64)
+    mask = len(slots) - 1
+    for title_bytes, row in row_by_title.items():
+        slot = title_hash(title_bytes) & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = row + 1
+    del row_by_title
+
+    _replace_array(os.path.join(directory, "rows.npy"), rows)
+    _replace_array(os.path.join(directory, "slots.npy"), slots)
+    os.replace(tmp_text, text_path)
+    os.replace(tmp_titles, titles_path)
+
+    # meta.json last: a store is only considered fresh once everything is in place
+    meta_path = os.path.join(directory, "meta.json")
+    tmp_meta = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump({"version": STORE_VERSION, "records": n, "sources": source_info(paths),
+                   "built_at": time.time()}, f, indent=1)
+    os.replace(tmp_meta, meta_path)
+    return CatalogStore(directory)
+
+
+def open_catalog_store(paths: List[str], directory: str = CATALOG_STORE_DIR, rebuild: bool = False) -> CatalogStore:
+    """The store for `paths`, (re)built from them first if missing or stale."""
+    if not rebuild and os.path.exists(os.path.join(directory, "meta.json")):
+        store = CatalogStore(directory)
+        if store.is_fresh(paths):
+            return store
+        store.close()
+    started = time.perf_counter()
+    store = build_catalog_store(iter_records(paths), paths, directory)
+    log.info("catalog store built", extra={"records": len(store), "files": len(paths),
+                                           "seconds": round(time.perf_counter() - started, 2)})
+    return store
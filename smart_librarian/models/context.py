@@ -0,0 +1,168 @@
+# smart_librarian/models/context.py
+"""
+Token-budgeted LLM context.
+
+Instead of replaying the whole conversation every turn, the context is the
+system prompt, a stored running summary of older turns, and as many of the
+most recent turns as fit in CONTEXT_TOKEN_BUDGET. When turns fall out of the
+window they are folded into the summary in the background, leaving the newest
+CONTEXT_RECENT_SHARE of the budget verbatim so the summary is not rewritten
+on every turn.
+"""
+import os
+import threading
+from typing import List, NamedTuple, Optional
+
+
+from smart_librarian.database.chat_db import Conversation
+from smart_librarian.utils.log import get_logger
+from smart_librarian.utils.metrics import timed_stage
+from smart_librarian.utils.openai_client import get_openai
+from smart_librarian.utils.stages import stage_timeout
+
+CONTEXT_MODEL = os.getenv("CONTEXT_MODEL", "gpt-4o-mini")
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))      # prompt tokens, tools excluded
+CONTEXT_RECENT_SHARE = float(os.getenv("CONTEXT_RECENT_SHARE", "0.5"))    # kept verbatim after a roll-up
+SUMMARY_MAX_TOKENS = int(os.getenv("CONTEXT_SUMMARY_MAX_TOKENS", "400"))
+
+# Per-message framing overhead of the chat format, and the reply priming
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+SUMMARY_PREFIX = "Summary of the earlier conversation (older turns are not shown verbatim):\n"
+SUMMARIZE_PROMPT = (
+    "You maintain a running summary of a chat between a user and a library assistant. "
+    "Update the summary with the new turns below. Keep the book titles that were discussed, "
+    "the user's preferences and any open questions. Be concise: at most {max_tokens} tokens.\n\n"
+    "Current summary:\n{summary}\n\nNew turns:\n{turns}"
+)
+
+log = get_logger(__name__)
+
+_encoding = None
+_encoding_lock = threading.Lock()
+_rolling = set()          # conversations whose summary is being updated
+_rolling_lock = threading.Lock()
+
+
+def _get_encoding():
+    """tiktoken encoding for the chat model; False if it can't be loaded (e.g. offline)."""
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    try:
+                        _encoding = tiktoken.encoding_for_model(CONTEXT_MODEL)
+                    except KeyError:
+                        _encoding = tiktoken.get_encoding("o200k_base")
+                except Exception as e:
+                    log.warning("tiktoken unavailable, estimating tokens from length", extra={"error": str(e)})
+                    _encoding = False
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def message_tokens(message: dict) -> int:
+    return TOKENS_PER_MESSAGE + count_tokens(message["role"]) + count_tokens(message["content"] or "")
+
+
+class BuiltContext(NamedTuple):
+    messages: list
+    usage: dict
+    # History messages that didn't fit; fold them into the summary (see roll_summary)
+    overflow: list
+
+
+def build_context(system_prompt: str, summary: Optional[str], history: list, user_msg: str,
+                  budget: int = CONTEXT_TOKEN_BUDGET) -> BuiltContext:
+    """
+    Context for one turn: system prompt, running summary, then the newest
+    history messages that fit in `budget`, then the user message.
+
+    `history` holds the LLM-ready messages after the summary, oldest → newest
+    (see Conversation.get_context_messages).
+    """
+    head = [{"role": "system", "content": system_prompt}]
+    if summary:
+        head.append({"role": "system", "content": SUMMARY_PREFIX + summary})
+    tail = [{"role": "user", "content": user_msg}]
+    used = TOKENS_PER_REPLY + sum(message_tokens(m) for m in head + tail)
+
+    recent: List[dict] = []
+    cut = len(history)
+    for i in range(len(history) - 1, -1, -1):
+        m = {"role": history[i]["role"], "content": history[i]["content"]}
+        cost = message_tokens(m)
+        if used + cost > budget:
+            break
+        used += cost
+        recent.append(m)
+        cut = i
+    recent.reverse()
+
+    return BuiltContext(head + recent + tail, {
+        "prompt_tokens_estimate": used,
+        "budget": budget,
+        "history_messages": len(recent),
+        "dropped_messages": cut,
+        "summary_tokens": count_tokens(summary) if summary else 0,
+    }, history[:cut])
+
+
+@timed_stage("summarize")
+def _summarize(summary: Optional[str], messages: list) -> str:
+    turns = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    resp = get_openai().with_options(timeout=stage_timeout("llm")).chat.completions.create(
+        model=CONTEXT_MODEL,
+        messages=[{"role": "user", "content": SUMMARIZE_PROMPT.format(
+            max_tokens=SUMMARY_MAX_TOKENS, summary=summary or "(none yet)", turns=turns)}],
+        temperature=0.2,
+        max_tokens=SUMMARY_MAX_TOKENS,
+    )
+    return (resp.choices[0].message.content or "").strip()
+
+
+def roll_summary(conv_id: int, summary: Optional[str], summary_seq: int, history: list,
+                 budget: int = CONTEXT_TOKEN_BUDGET) -> bool:
+    """
+    Fold everything but the newest CONTEXT_RECENT_SHARE of the budget into the
+    stored summary. Meant to run off the request path (run_async); returns
+    True if a new summary was stored.
+    """
+    keep = int(budget * CONTEXT_RECENT_SHARE)
+    kept = 0
+    cut = len(history)
+    for i in range(len(history) - 1, -1, -1):
+        kept += message_tokens(history[i])
+        if kept > keep:
+            break
+        cut = i
+    folded = history[:cut]
+    if not folded:
+        return False
+
+    with _rolling_lock:
+        if conv_id in _rolling:
+            return False
+        _rolling.add(conv_id)
+    try:
+        new_summary = _summarize(summary, folded)
+        stored = Conversation.set_summary(conv_id, new_summary, folded[-1]["seq"], summary_seq)
+        if stored:
+            log.info("conversation summarized", extra={"conv_id": conv_id, "messages": len(folded),
+                                                       "summary_seq": folded[-1]["seq"]})
+        return stored
+    except Exception as e:
+        log.warning("summary update failed", extra={"conv_id": conv_id, "error": str(e)})
+        return False
+    finally:
+        with _rolling_lock:
+            _rolling.discard(conv_id)
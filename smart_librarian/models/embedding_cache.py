@@ -0,0 +1,209 @@
+# smart_librarian/models/embedding_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from smart_librarian.utils.cache import LRUCache
+from src.file_paths import EMBEDDING_CACHE_FILE
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))          # in-memory entries
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", str(7 * 24 * 3600)))  # seconds, 0 = never expire
+EMBEDDING_CACHE_DISK = os.getenv("EMBEDDING_CACHE_DISK", "1") == "1"
+EMBEDDING_CACHE_DISK_ENTRIES = int(os.getenv("EMBEDDING_CACHE_DISK_ENTRIES", "100000"))
+# Tokenize texts with tiktoken to split ones over the model's context length; "0" sends
+# them as-is (summaries are far shorter, and tiktoken downloads its encoding on first use)
+EMBED_TOKENIZE = os.getenv("EMBED_TOKENIZE", "1") == "1"
+
+
+def normalize_query(text: str) -> str:
+    """Case/whitespace-insensitive form so "Recommend  a Fantasy book" hits "recommend a fantasy book"."""
+    return " ".join(text.split()).casefold()
+
+
+class DiskEmbeddingCache:
+    """SQLite-backed tier that survives restarts; evicts least recently used rows past max_entries."""
+
+    def __init__(self, path: str, max_entries: int, ttl: Optional[float]):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.reconnect()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL, used_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_used_at ON embeddings(used_at)")
+        self._conn.commit()
+        self._writes = 0
+
+    def reconnect(self) -> None:
+        """Open a fresh connection (SQLite connections must not cross a fork)."""
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+
+    def get(self, key: str) -> Optional[List[float]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT vector, created_at FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl and row[1] + self.ttl < now:
+                self._conn.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE embeddings SET used_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return array("f", row[0]).tolist()
+
+    def set(self, key: str, vector: List[float]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, array("f", vector).tobytes(), now, now),
+            )
+            self._writes += 1
+            # trimming is a full-table count: only do it every so often
+            if self._writes % 100 == 0:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY used_at LIMIT ?)",
+                (excess,),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that answers repeated queries from an in-memory LRU,
+    then an optional on-disk tier, before calling the wrapped model.
+    Keys are sha256(model, kind, normalized text).
+    """
+
+    def __init__(self, inner: Embeddings, model: Optional[str] = None,
+                 memory: Optional[LRUCache] = None, disk: Optional[DiskEmbeddingCache] = None):
+        self.inner = inner
+        self.model = model or getattr(inner, "model", inner.__class__.__name__)
+        self.memory = memory or LRUCache(EMBEDDING_CACHE_SIZE, ttl=EMBEDDING_CACHE_TTL or None)
+        self.disk = disk
+        self.disk_hits = 0
+        self.misses = 0
+        self._counter_lock = threading.Lock()
+
+    def _key(self, kind: str, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\x00{kind}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str) -> Optional[List[float]]:
+        vector = self.memory.get(key)
+        if vector is not None:
+            return vector
+        if self.disk is not None:
+            vector = self.disk.get(key)
+            if vector is not None:
+                self.memory.set(key, vector)
+                with self._counter_lock:
+                    self.disk_hits += 1
+                return vector
+        with self._counter_lock:
+            self.misses += 1
+        return None
+
+    def _store(self, key: str, vector: List[float]) -> None:
+        self.memory.set(key, vector)
+        if self.disk is not None:
+            self.disk.set(key, vector)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key("query", normalize_query(text))
+        vector = self._lookup(key)
+        if vector is None:
+            vector = self.inner.embed_query(text)
+            self._store(key, vector)
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """embed_query for several texts: cached per query, the misses embedded in one request."""
+        return self._embed_many(texts, [self._key("query", normalize_query(t)) for t in texts])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Documents keep their case; only whitespace is normalized
+        return self._embed_many(texts, [self._key("document", " ".join(t.split())) for t in texts])
+
+    def _embed_many(self, texts: List[str], keys: List[str]) -> List[List[float]]:
+        vectors: List[Optional[List[float]]] = [self._lookup(k) for k in keys]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            fresh = self.inner.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+                self._store(keys[i], vector)
+        return vectors
+
+    def stats(self) -> dict:
+        memory = self.memory.stats()
+        lookups = memory["hits"] + self.disk_hits + self.misses
+        return {
+            "model": self.model,
+            "memory": memory,
+            "disk_hits": self.disk_hits,
+            "disk_entries": len(self.disk) if self.disk is not None else None,
+            "misses": self.misses,
+            "hit_rate": round((memory["hits"] + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+_embeddings: Optional[CachedEmbeddings] = None
+_embeddings_lock = threading.Lock()
+
+
+def get_embeddings() -> CachedEmbeddings:
+    """Shared cached OpenAI embeddings used by the vector store."""
+    global _embeddings
+    if _embeddings is None:
+        with _embeddings_lock:
+            if _embeddings is None:
+                disk = None
+                if EMBEDDING_CACHE_DISK:
+                    disk = DiskEmbeddingCache(EMBEDDING_CACHE_FILE, EMBEDDING_CACHE_DISK_ENTRIES,
+                                              ttl=EMBEDDING_CACHE_TTL or None)
+                _embeddings = CachedEmbeddings(_openai_embeddings(), disk=disk)
+    return _embeddings
+
+
+def _openai_embeddings() -> Embeddings:
+    # Imported here: langchain_openai pulls in the OpenAI SDK and half of langchain_core
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(check_embedding_ctx_length=EMBED_TOKENIZE)
+
+
+def _reset_after_fork() -> None:
+    # Keep the cached vectors, but give the forked worker its own HTTP pool and SQLite connection
+    global _embeddings_lock
+    _embeddings_lock = threading.Lock()
+    if _embeddings is not None:
+        _embeddings.inner = _openai_embeddings()
+        if _embeddings.disk is not None:
+            _embeddings.disk.reconnect()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def embedding_cache_stats() -> dict:
+    return _embeddings.stats() if _embeddings is not None else {}
@@ -0,0 +1,135 @@
+# smart_librarian/models/images.py
+"""
+Scene/cover image generation with a per-book cache.
+
+When a reply is built around catalog titles the prompt is dominated by their
+summaries, so the image is reused, keyed by the resolved titles and the prompt
+template version. The PNG itself is kept once, in the media store (where the
+message that shows it points anyway); the cache only maps the key to its media
+id. IMAGE_CACHE_POLICY=fresh always generates a new image. Concurrent requests
+for the same key share a single generation.
+"""
+import base64
+import hashlib
+import os
+import threading
+from typing import Iterable, Optional
+
+from smart_librarian.database.media_store import MEDIA_ID_RE, get_media_store
+from smart_librarian.utils.cache import DiskLRUCache, SingleFlight
+from smart_librarian.utils.log import get_logger
+from smart_librarian.utils.metrics import timed_stage
+from smart_librarian.utils.openai_client import get_openai
+from smart_librarian.utils.stages import stage_timeout
+from src.file_paths import IMAGE_CACHE_DIR
+
+IMAGE_MODEL = os.getenv("IMAGE_MODEL", "gpt-image-1")
+IMAGE_SIZE = os.getenv("IMAGE_SIZE", "1024x1024")
+IMAGE_CACHE_POLICY = os.getenv("IMAGE_CACHE_POLICY", "reuse")   # "reuse" | "fresh"
+# Bounds the key -> media id index (about 70 bytes an entry); the images live in the media store
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(64 * 1024 ** 2)))  # 64 MiB
+
+# Bump IMAGE_PROMPT_VERSION whenever IMAGE_PROMPT changes: cached images were made with the old one
+IMAGE_PROMPT_VERSION = "1"
+IMAGE_PROMPT = (
+    "Generate an image where you expose the action from this summary(with the characters or the action mentioned):\n"
+    "{text}\n"
+    "Hard rules!!:\n"
+    "Don't add text except for the title"
+)
+
+log = get_logger(__name__)
+
+_flights = SingleFlight()
+_cache: Optional[DiskLRUCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_image_cache() -> DiskLRUCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DiskLRUCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES)
+    return _cache
+
+
+def image_cache_key(titles: Iterable[str]) -> str:
+    parts = [IMAGE_MODEL, IMAGE_SIZE, IMAGE_PROMPT_VERSION, *sorted(set(titles))]
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+def _generate(text: str) -> bytes:
+    # Use the Images API to get a base64 PNG (compact & predictable)
+    img = get_openai().with_options(timeout=stage_timeout("image")).images.generate(
+        model=IMAGE_MODEL,
+        prompt=IMAGE_PROMPT.format(text=text),
+        size=IMAGE_SIZE,
+    )
+    return base64.b64decode(img.data[0].b64_json)
+
+
+def _stored_image(cache: DiskLRUCache, key: str, entry: Optional[bytes]) -> Optional[bytes]:
+    """The PNG a cache entry points to, or None if there is no entry or the blob is gone."""
+    if entry is None:
+        return None
+    media_id = entry.decode("latin-1")
+    if not MEDIA_ID_RE.match(media_id):
+        # written before the cache pointed into the media store: the entry is the PNG itself
+        cache.set(key, get_media_store().put(entry, "image/png").encode("ascii"))
+        return entry
+    return get_media_store().read(media_id)
+
+
+def _generate_or_none(text: str) -> Optional[bytes]:
+    try:
+        return _generate(text)
+    except Exception as e:
+        log.warning("image generation failed", extra={"error": str(e)})
+        return None
+
+
+@timed_stage("image")
+def generate_image(text: str, titles: Iterable[str] = ()) -> Optional[bytes]:
+    """
+    PNG bytes illustrating `text`, or None if generation failed.
+
+    With resolved catalog `titles` the image is reused from the cache
+    (unless IMAGE_CACHE_POLICY=fresh); free-form replies are only coalesced.
+    """
+    titles = sorted(set(titles))
+    if not titles:
+        key = "text:" + hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return _flights.do(key, lambda: _generate_or_none(text))
+
+    key = image_cache_key(titles)
+    cache = get_image_cache()
+    reuse = IMAGE_CACHE_POLICY != "fresh"
+    if reuse:
+        data = _stored_image(cache, key, cache.get(key))
+        if data is not None:
+            return data
+
+    def fill() -> Optional[bytes]:
+        if reuse:
+            # another process may have filled it while we waited (already counted as a miss above)
+            cached = _stored_image(cache, key, cache.peek(key))
+            if cached is not None:
+                return cached
+        image = _generate_or_none(text)
+        if image is not None:
+            # the caller's put of the same bytes then finds the blob already stored
+            cache.set(key, get_media_store().put(image, "image/png").encode("ascii"))
+        return image
+
+    return _flights.do(key, fill)
+
+
+def image_cache_stats() -> dict:
+    cache = _cache
+    return {
+        "policy": IMAGE_CACHE_POLICY,
+        "prompt_version": IMAGE_PROMPT_VERSION,
+        "disk": cache.stats() if cache is not None else None,
+        "single_flight": _flights.stats(),
+    }
@@ -0,0 +1,198 @@
+# smart_librarian/models/indexer.py
+"""
+Incremental indexing of the summaries file.
+
+Every parsed Document gets a stable id (from its title) and a content hash
+(title + summary). A manifest next to the index records the embedding model
+and the hash of every indexed entry, so a sync only embeds new/changed
+entries and deletes removed ones. Run it with `python manage.py reindex`.
+"""
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple
+
+import numpy as np
+from chromadb.api.shared_system_client import SharedSystemClient
+from langchain_chroma import Chroma
+
+from smart_librarian.models.book_model import NumpyVectorStore, VECTOR_BACKEND, VECTOR_DTYPE
+from smart_librarian.models.embedding_cache import get_embeddings
+from smart_librarian.utils.log import get_logger
+from src.file_paths import CHROMA_DIR, NUMPY_INDEX_DIR, INDEX_MANIFEST_FILE
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+
+log = get_logger(__name__)
+
+# Chroma caches one client system (SQLite connections, threads) per directory:
+# a forked worker must open its own rather than reuse the parent's
+os.register_at_fork(after_in_child=SharedSystemClient.clear_system_cache)
+
+
+class SyncResult(NamedTuple):
+    vectorstore: object
+    stats: dict
+
+
+def doc_id(title: str) -> str:
+    return hashlib.sha1(title.encode("utf-8")).hexdigest()
+
+
+def content_hash(doc) -> str:
+    return hashlib.sha256(f"{doc.metadata['title']}\n{doc.page_content}".encode("utf-8")).hexdigest()
+
+
+def load_manifest(path: str = INDEX_MANIFEST_FILE) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: dict, path: str = INDEX_MANIFEST_FILE) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def embed_in_batches(texts: List[str], embeddings, batch_size: int = EMBED_BATCH_SIZE,
+                     concurrency: int = EMBED_CONCURRENCY) -> List[List[float]]:
+    """Embed texts in large batches, at most `concurrency` requests in flight; order is preserved."""
+    if not texts:
+        return []
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        results = pool.map(embeddings.embed_documents, batches)
+    return [vector for batch in results for vector in batch]
+
+
+def _plan(docs, manifest: dict, full: bool):
+    """Returns (docs by id, current manifest entries, ids to (re)embed, ids to delete)."""
+    current: Dict[str, dict] = {}
+    docs_by_id = {}
+    for doc in docs:
+        i = doc_id(doc.metadata["title"])
+        current[i] = {"title": doc.metadata["title"], "hash": content_hash(doc)}
+        docs_by_id[i] = doc
+
+    previous = {} if full else manifest.get("entries", {})
+    changed = [i for i, entry in current.items() if previous.get(i, {}).get("hash") != entry["hash"]]
+    removed = [i for i in previous if i not in current]
+    return docs_by_id, current, changed, removed
+
+
+def _sync_chroma(docs_by_id, changed, removed, vectors, rebuild: bool):
+    embeddings = get_embeddings()
+    vectorstore = Chroma(persist_directory=CHROMA_DIR, embedding_function=embeddings)
+    if rebuild:
+        # Index predates the manifest (unknown ids): start from an empty collection
+        vectorstore.reset_collection()
+    if removed:
+        vectorstore.delete(ids=removed)
+    if changed:
+        collection = vectorstore._collection
+        for start in range(0, len(changed), EMBED_BATCH_SIZE):
+            ids = changed[start:start + EMBED_BATCH_SIZE]
+            collection.upsert(
+                ids=ids,
+                embeddings=vectors[start:start + EMBED_BATCH_SIZE],
+                documents=[docs_by_id[i].page_content for i in ids],
+                metadatas=[docs_by_id[i].metadata for i in ids],
+            )
+    return vectorstore
+
+
+def _sync_numpy(docs_by_id, changed, vectors, rebuild: bool):
+    embeddings = get_embeddings()
+    fresh = dict(zip(changed, vectors))
+
+    # Reuse the stored vector of every unchanged entry
+    reused = {}
+    if not rebuild and NumpyVectorStore.exists(NUMPY_INDEX_DIR):
+        old = NumpyVectorStore.load(embeddings, NUMPY_INDEX_DIR)
+        dense = old.dense()
+        for row, doc in enumerate(old.docs):
+            reused[doc_id(doc.metadata["title"])] = dense[row]
+
+    docs, rows = [], []
+    for i, doc in docs_by_id.items():
+        vector = fresh.get(i)
+        if vector is None:
+            vector = reused.get(i)
+        if vector is None:
+            continue  # should not happen: unchanged entries are always in the old index
+        docs.append(doc)
+        rows.append(vector)
+
+    store = NumpyVectorStore.from_vectors(docs, np.asarray(rows, dtype=np.float32), embeddings, VECTOR_DTYPE)
+    store.save(NUMPY_INDEX_DIR)
+    return store
+
+
+def open_index(backend: str = VECTOR_BACKEND):
+    """The vector store as last synced."""
+    embeddings = get_embeddings()
+    if backend == "numpy":
+        return NumpyVectorStore.load(embeddings, NUMPY_INDEX_DIR)
+    return Chroma(persist_directory=CHROMA_DIR, embedding_function=embeddings)
+
+
+def _index_present(backend: str) -> bool:
+    if backend == "numpy":
+        return NumpyVectorStore.exists(NUMPY_INDEX_DIR)
+    return os.path.exists(CHROMA_DIR)
+
+
+def sync_index(docs, backend: str = VECTOR_BACKEND, full: bool = False,
+               batch_size: int = EMBED_BATCH_SIZE, concurrency: int = EMBED_CONCURRENCY) -> SyncResult:
+    """
+    Bring the vector index in line with `docs`, embedding only what changed.
+
+    Args:
+        docs: iterable of parsed Documents, consumed once (see iter_documents)
+        backend: "chroma" or "numpy"
+        full: ignore the manifest and re-embed everything
+        batch_size: texts per embedding request
+        concurrency: embedding requests in flight
+    """
+    started = time.perf_counter()
+    embeddings = get_embeddings()
+    manifest = load_manifest()
+    # No index yet, an index without a manifest, or one built for another
+    # backend/model can't be diffed: embed everything into a fresh index
+    rebuild = (
+        full
+        or not _index_present(backend)
+        or manifest.get("backend") != backend
+        or manifest.get("model") != embeddings.model
+    )
+    docs_by_id, current, changed, removed = _plan(docs, manifest, rebuild)
+
+    if not changed and not removed and not rebuild:
+        log.info("vector index up to date", extra={"backend": backend, "entries": len(current)})
+        vectorstore = open_index(backend)
+    else:
+        log.info("indexing", extra={"backend": backend, "changed": len(changed), "removed": len(removed)})
+        vectors = embed_in_batches([docs_by_id[i].page_content for i in changed], embeddings,
+                                   batch_size=batch_size, concurrency=concurrency)
+        if backend == "numpy":
+            vectorstore = _sync_numpy(docs_by_id, changed, vectors, rebuild)
+        else:
+            vectorstore = _sync_chroma(docs_by_id, changed, removed, vectors, rebuild)
+        save_manifest({"model": embeddings.model, "backend": backend, "entries": current,
+                       "updated_at": time.time()})
+
+    return SyncResult(vectorstore, {
+        "backend": backend,
+        "total": len(current),
+        "embedded": len(changed),
+        "removed": len(removed),
+        "rebuilt": rebuild,
+        "seconds": round(time.perf_counter() - started, 3),
+    })
@@ -0,0 +1,156 @@
+# smart_librarian/models/moderation.py
+"""
+Moderation in front of `omni-moderation-latest`.
+
+A message is checked, in order, against:
+  1. an optional local block list (words or `re:` patterns, one per line) that
+     flags obvious cases without a network call;
+  2. an LRU/TTL cache of earlier verdicts, keyed by the normalized message hash;
+  3. the moderation API.
+If the API fails or times out, MODERATION_FAIL decides: "open" lets the
+message through, "closed" treats it as flagged.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import NamedTuple, Optional
+
+from smart_librarian.utils.cache import LRUCache
+from smart_librarian.utils.log import get_logger
+from smart_librarian.utils.metrics import timed_stage
+from src.file_paths import MODERATION_BLOCKLIST_FILE
+
+MODERATION_MODEL = "omni-moderation-latest"
+MODERATION_CACHE_SIZE = int(os.getenv("MODERATION_CACHE_SIZE", "4096"))
+MODERATION_CACHE_TTL = float(os.getenv("MODERATION_CACHE_TTL", str(24 * 3600)))  # seconds, 0 = never expire
+MODERATION_PREFILTER = os.getenv("MODERATION_PREFILTER", "1") == "1"
+MODERATION_FAIL = os.getenv("MODERATION_FAIL", "open")    # "open" | "closed"
+
+LATENCY_WINDOW = 1000   # API calls kept for the latency percentiles
+
+log = get_logger(__name__)
+
+
+class ModerationResult(NamedTuple):
+    flagged: bool
+    source: str         # "prefilter" | "cache" | "api" | "failed"
+    categories: Optional[dict] = None
+
+
+def normalize_message(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def load_blocklist(path: str = MODERATION_BLOCKLIST_FILE) -> Optional[re.Pattern]:
+    """One alternation regex for the block list file, or None if there is none."""
+    if not os.path.exists(path):
+        return None
+    patterns = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("re:"):
+                patterns.append(f"(?:{line[3:]})")
+            else:
+                patterns.append(rf"\b{re.escape(line.casefold())}\b")
+    if not patterns:
+        return None
+    return re.compile("|".join(patterns), re.IGNORECASE)
+
+
+def fails_closed() -> bool:
+    """Verdict to use when moderation couldn't be completed (error or timeout)."""
+    return MODERATION_FAIL == "closed"
+
+
+class Moderator:
+    def __init__(self, blocklist: Optional[re.Pattern] = None, cache: Optional[LRUCache] = None):
+        self.blocklist = blocklist
+        self.cache = cache or LRUCache(MODERATION_CACHE_SIZE, ttl=MODERATION_CACHE_TTL or None)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self.counts = {"prefilter": 0, "cache": 0, "api": 0, "failed": 0, "flagged": 0}
+
+    def _count(self, result: ModerationResult, latency: Optional[float] = None) -> ModerationResult:
+        with self._lock:
+            self.counts[result.source] += 1
+            if result.flagged:
+                self.counts["flagged"] += 1
+            if latency is not None:
+                self._latencies.append(latency)
+        return result
+
+    @timed_stage("moderation")
+    def check(self, client, message: str) -> ModerationResult:
+        normalized = normalize_message(message)
+        if self.blocklist is not None and self.blocklist.search(normalized):
+            return self._count(ModerationResult(True, "prefilter"))
+
+        key = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        cached = self.cache.get(key)
+        if cached is not None:
+            return self._count(ModerationResult(cached[0], "cache", cached[1]))
+
+        started = time.perf_counter()
+        try:
+            resp = client.moderations.create(model=MODERATION_MODEL, input=message)
+        except Exception as e:
+            log.warning("moderation failed", extra={"fail_mode": MODERATION_FAIL, "error": str(e)})
+            return self._count(ModerationResult(fails_closed(), "failed"),
+                               latency=time.perf_counter() - started)
+        flagged = bool(resp.results[0].flagged)
+        categories = resp.results[0].categories
+        categories = categories.model_dump() if hasattr(categories, "model_dump") else categories
+        self.cache.set(key, (flagged, categories))
+        return self._count(ModerationResult(flagged, "api", categories), latency=time.perf_counter() - started)
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            counts = dict(self.counts)
+        checks = counts["prefilter"] + counts["cache"] + counts["api"] + counts["failed"]
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 4)
+
+        flagged = counts.pop("flagged")
+        return {
+            "checks": checks,
+            "flagged": flagged,
+            "by_source": counts,
+            "fail_mode": MODERATION_FAIL,
+            "prefilter_enabled": self.blocklist is not None,
+            "cache": self.cache.stats(),
+            # share of checks answered without calling the API
+            "local_rate": round((counts["prefilter"] + counts["cache"]) / checks, 4) if checks else 0.0,
+            "latency_seconds": {
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "max": round(latencies[-1], 4) if latencies else None,
+                "samples": len(latencies),
+            },
+        }
+
+
+_moderator: Optional[Moderator] = None
+_moderator_lock = threading.Lock()
+
+
+def get_moderator() -> Moderator:
+    global _moderator
+    if _moderator is None:
+        with _moderator_lock:
+            if _moderator is None:
+                _moderator = Moderator(blocklist=load_blocklist() if MODERATION_PREFILTER else None)
+    return _moderator
+
+
+def moderation_stats() -> dict:
+    return _moderator.stats() if _moderator is not None else {}
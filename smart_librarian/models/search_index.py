@@ -0,0 +1,124 @@
+# smart_librarian/models/search_index.py
+"""
+Lexical indexes over the catalog, built at load time next to the vector store:
+a BM25 inverted index over title + summary, and a theme → titles index from
+the "Themes: ..." line every summary ends with. reciprocal_rank_fusion()
+merges their rankings with the vector search.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from smart_librarian.models.book_model import normalize_title
+
+THEMES_RE = re.compile(r"Themes:\s*(.+?)\s*\.?\s*$", re.IGNORECASE)
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has he her his in is it its of on or she that the their them "
+    "they this to was were who will with".split()
+)
+# Words that may surround a theme in a pure theme query ("recommend me books about friendship")
+QUERY_FILLER = STOPWORDS | frozenset(
+    "about any book books can could find give i like looking me my novel novels on please read "
+    "recommend recommendation recommendations show some something story stories suggest theme themes "
+    "want what you".split()
+)
+
+RRF_K = 60
+
+
+def parse_themes(summary: str) -> List[str]:
+    """Themes listed on the summary's "Themes: a, b, c." line (normalized, file order)."""
+    match = THEMES_RE.search(summary or "")
+    if not match:
+        return []
+    themes = (normalize_title(t) for t in match.group(1).split(","))
+    return list(dict.fromkeys(t for t in themes if t))
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(normalize_title(text)) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over tokenized documents, with postings per term."""
+
+    def __init__(self, docs: Iterable[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._lengths: List[int] = []
+        for i, text in enumerate(docs):
+            terms = Counter(tokenize(text))
+            self._lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                self._postings[term].append((i, tf))
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        n = len(self._lengths)
+        self._idf = {term: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for term, p in self._postings.items()}
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def search(self, query: str, k: Optional[int] = 10) -> List[Tuple[int, float]]:
+        """[(doc index, score)] best first; k=None returns every matching document."""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for i, tf in self._postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[i] / (self._avg_length or 1))
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: -item[1])[:k]
+
+
+class ThemeIndex:
+    """theme → titles, from each summary's "Themes:" line."""
+
+    def __init__(self, titled_summaries: Iterable[Tuple[str, str]]):
+        self._titles: Dict[str, List[str]] = defaultdict(list)
+        for title, summary in titled_summaries:
+            for theme in parse_themes(summary):
+                self._titles[theme].append(title)
+
+    def themes(self) -> List[Tuple[str, List[str]]]:
+        """Every theme with its titles, most common first."""
+        return sorted(self._titles.items(), key=lambda item: (-len(item[1]), item[0]))
+
+    def titles_for(self, theme: str) -> List[str]:
+        return list(self._titles.get(normalize_title(theme), []))
+
+    def query_themes(self, query: str) -> Optional[List[str]]:
+        """
+        Themes of a pure theme query ("books about friendship and courage"),
+        or None if the query says anything besides themes and filler words.
+        """
+        words = normalize_title(query).split()
+        if not words:
+            return None
+        found, i = [], 0
+        while i < len(words):
+            # longest theme starting here ("coming of age" before "age")
+            for j in range(len(words), i, -1):
+                phrase = " ".join(words[i:j])
+                if phrase in self._titles:
+                    found.append(phrase)
+                    i = j
+                    break
+            else:
+                if words[i] not in QUERY_FILLER:
+                    return None
+                i += 1
+        return found or None
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """Fuse ranked lists of keys: score = Σ 1 / (k + rank). Best first."""
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
@@ -0,0 +1,123 @@
+# smart_librarian/models/speech.py
+"""
+Text-to-speech with a persistent audio cache.
+
+The TTS input is usually a catalog summary copied verbatim, so the same few
+hundred texts are spoken again and again. Audio is cached on disk keyed by
+sha256(model, voice, text) and concurrent requests for the same text share a
+single synthesis. `python manage.py prerender-tts` fills the cache for every
+catalog title ahead of time.
+"""
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from smart_librarian.utils.cache import DiskLRUCache, SingleFlight
+from smart_librarian.utils.log import get_logger
+from smart_librarian.utils.metrics import timed_stage
+from smart_librarian.utils.openai_client import get_openai
+from smart_librarian.utils.stages import stage_timeout
+from src.file_paths import TTS_CACHE_DIR
+
+TTS_MODEL = os.getenv("TTS_MODEL", "gpt-4o-mini-tts")
+TTS_VOICE = os.getenv("TTS_VOICE", "alloy")
+MAX_TTS_CHARS = 1800
+TTS_CACHE = os.getenv("TTS_CACHE", "1") == "1"
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(1024 ** 3)))  # 1 GiB
+
+log = get_logger(__name__)
+
+_flights = SingleFlight()
+_cache: Optional[DiskLRUCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_tts_cache() -> Optional[DiskLRUCache]:
+    global _cache
+    if TTS_CACHE and _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DiskLRUCache(TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES)
+    return _cache
+
+
+def tts_cache_key(text: str, model: str = TTS_MODEL, voice: str = TTS_VOICE) -> str:
+    # Verbatim text: summaries are spoken exactly as stored
+    return hashlib.sha256(f"{model}\x00{voice}\x00{text}".encode("utf-8")).hexdigest()
+
+
+def tts_text(summary_text: str, text_response: str) -> str:
+    """What gets spoken: the fetched summary if there is one, else the reply."""
+    return (summary_text.strip() or (text_response or "").strip())[:MAX_TTS_CHARS]
+
+
+def _synthesize(text: str) -> bytes:
+    resp = get_openai().with_options(timeout=stage_timeout("tts")).audio.speech.create(
+        model=TTS_MODEL,
+        voice=TTS_VOICE,
+        input=text,
+    )
+    return resp.read()
+
+
+@timed_stage("tts")
+def synthesize_speech(text: str) -> bytes:
+    """MP3 bytes for `text`, from the cache when possible."""
+    cache = get_tts_cache()
+    if cache is None:
+        return _flights.do(tts_cache_key(text), lambda: _synthesize(text))
+
+    key = tts_cache_key(text)
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    def fill() -> bytes:
+        # another process may have filled it while we waited (already counted as a miss above)
+        cached = cache.peek(key)
+        if cached is not None:
+            return cached
+        audio = _synthesize(text)
+        cache.set(key, audio)
+        return audio
+
+    return _flights.do(key, fill)
+
+
+def prerender_catalog(concurrency: int = 4, limit: Optional[int] = None) -> dict:
+    """Synthesize (and cache) the spoken summary of every catalog title not cached yet."""
+    from smart_librarian.models.catalog import get_catalog
+
+    cache = get_tts_cache()
+    if cache is None:
+        raise RuntimeError("TTS cache is disabled (TTS_CACHE=0)")
+
+    catalog = get_catalog()
+    texts = [tts_text(catalog.get_summary(title), "") for title in catalog.titles]
+    todo = [t for t in dict.fromkeys(texts) if t and tts_cache_key(t) not in cache]
+    if limit is not None:
+        todo = todo[:limit]
+
+    def render(text: str) -> bool:
+        try:
+            synthesize_speech(text)
+            return True
+        except Exception as e:
+            log.warning("TTS pre-render failed", extra={"error": str(e)})
+            return False
+
+    log.info("pre-rendering summaries", extra={"todo": len(todo), "titles": len(texts)})
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        failed = sum(1 for ok in pool.map(render, todo) if not ok)
+    return {"titles": len(texts), "rendered": len(todo) - failed, "failed": failed, "cache": cache.stats()}
+
+
+def tts_cache_stats() -> dict:
+    cache = _cache
+    return {
+        "enabled": TTS_CACHE,
+        "disk": cache.stats() if cache is not None else None,
+        "single_flight": _flights.stats(),
+    }
@@ -1,12 +1,103 @@
 # smart_librarian/router.py
-import importlib.util
+import importlib
 import os
-import sys
+import threading
+
+from smart_librarian.utils.log import get_logger
+
+CONTROLLERS_DIR = os.path.join(os.path.dirname(__file__), "controllers")
+CONTROLLERS_PACKAGE = "smart_librarian.controllers"
+CONTROLLER_SUFFIX = "_controller"
+
+# Re-import controllers from disk when their file changes (dev only)
+HOT_RELOAD = os.getenv("ROUTER_HOT_RELOAD", "0") == "1"
+
+log = get_logger(__name__)
+
+
+class _ControllerEntry:
+    """A resolved controller: its long-lived instance and precomputed action table."""
+    def __init__(self, module, instance, actions, mtime):
+        self.module = module
+        self.instance = instance
+        self.actions = actions
+        self.mtime = mtime
+
 
 class Router:
-    def __init__(self):
+    def __init__(self, hot_reload: bool = HOT_RELOAD):
         self.default_controller = "home"
         self.default_action = "index"
+        self.hot_reload = hot_reload
+        self._controllers = {}
+        self._lock = threading.Lock()
+
+    # -------- registry --------
+
+    @staticmethod
+    def _controller_file(controller_name: str) -> str:
+        return os.path.join(CONTROLLERS_DIR, f"{controller_name}{CONTROLLER_SUFFIX}.py")
+
+    @staticmethod
+    def _build_actions(instance) -> dict:
+        """Public methods of the controller are its routable actions."""
+        actions = {}
+        for name in dir(instance):
+            if name.startswith("_"):
+                continue
+            attr = getattr(instance, name)
+            if callable(attr):
+                actions[name] = attr
+        return actions
+
+    def _load(self, controller_name: str, reload_module=None):
+        controller_file = self._controller_file(controller_name)
+        if not os.path.isfile(controller_file):
+            return None
+
+        if reload_module is not None:
+            module = importlib.reload(reload_module)
+        else:
+            module = importlib.import_module(f"{CONTROLLERS_PACKAGE}.{controller_name}{CONTROLLER_SUFFIX}")
+
+        class_name = f"{controller_name.capitalize()}Controller"
+        controller_class = getattr(module, class_name, None)
+        if controller_class is None:
+            return None
+
+        instance = controller_class()
+        return _ControllerEntry(module, instance, self._build_actions(instance), os.path.getmtime(controller_file))
+
+    def get_controller(self, controller_name: str):
+        entry = self._controllers.get(controller_name)
+        if entry is not None and not self.hot_reload:
+            return entry
+
+        with self._lock:
+            entry = self._controllers.get(controller_name)
+            if entry is None:
+                entry = self._load(controller_name)
+            elif self.hot_reload:
+                controller_file = self._controller_file(controller_name)
+                if not os.path.isfile(controller_file):
+                    entry = None
+                elif os.path.getmtime(controller_file) != entry.mtime:
+                    log.info("reloading controller", extra={"controller": controller_name})
+                    entry = self._load(controller_name, reload_module=entry.module)
+
+            if entry is None:
+                self._controllers.pop(controller_name, None)
+            else:
+                self._controllers[controller_name] = entry
+            return entry
+
+    def preload(self) -> None:
+        """Resolve every controller under controllers/ once, e.g. at startup."""
+        for filename in sorted(os.listdir(CONTROLLERS_DIR)):
+            if filename.endswith(f"{CONTROLLER_SUFFIX}.py"):
+                self.get_controller(filename[: -len(f"{CONTROLLER_SUFFIX}.py")])
+
+    # -------- dispatch --------
 
     def route(self, path: str):
         parts = [p for p in path.strip("/").split("/") if p]
@@ -23,23 +114,20 @@ class Router:
             action_name = parts[1] if len(parts) > 1 else self.default_action
             params = parts[2:] if len(parts) > 2 else []
 
-        controller_file = f"smart_librarian/controllers/{controller_name}_controller.py"
         class_name = f"{controller_name.capitalize()}Controller"
 
-        if not os.path.isfile(controller_file):
+        # Only plain identifiers can name a controller module
+        if not controller_name.isidentifier():
             return f"Error: Page not found <br> <a href='/home/index'>Go to Home</a>", 404
 
-        spec = importlib.util.spec_from_file_location(class_name, controller_file)
-        module = importlib.util.module_from_spec(spec)
-        sys.modules[class_name] = module
-        spec.loader.exec_module(module)
-
-        controller_class = getattr(module, class_name, None)
-        if controller_class is None:
+        entry = self.get_controller(controller_name)
+        if entry is None:
+            if not os.path.isfile(self._controller_file(controller_name)):
+                return f"Error: Page not found <br> <a href='/home/index'>Go to Home</a>", 404
             return f"Error: Controller '{class_name}' not found", 404
 
-        controller_instance = controller_class()
-        if not hasattr(controller_instance, action_name):
+        action = entry.actions.get(action_name)
+        if action is None:
             return f"Error: Action '{action_name}' not found in {class_name}", 404
 
-        return getattr(controller_instance, action_name)(*params)
+        return action(*params)
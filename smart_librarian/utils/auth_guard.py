@@ -1,6 +1,7 @@
 from typing import Optional
 from flask import request
 from smart_librarian.utils.jwt_helper import verify_jwt
+from smart_librarian.utils.metrics import timed
 
 COOKIE_NAME = "access_token"
 
@@ -8,7 +9,8 @@ def current_user() -> Optional[str]:
     token = request.cookies.get(COOKIE_NAME)
     if not token:
         return None
-    data = verify_jwt(token)
+    with timed("auth"):
+        data = verify_jwt(token)
     if not data:
         return None
     return data.get("sub")  # the username we set as subject
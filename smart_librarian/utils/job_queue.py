@@ -0,0 +1,167 @@
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from smart_librarian.database.job_db import MediaJob, JOB_DONE, JOB_FAILED
+from smart_librarian.utils.log import get_logger
+
+MEDIA_JOB_WORKERS = int(os.getenv("MEDIA_JOB_WORKERS", "2"))
+MEDIA_JOB_QUEUE_SIZE = int(os.getenv("MEDIA_JOB_QUEUE_SIZE", "100"))
+MEDIA_JOB_MAX_ATTEMPTS = int(os.getenv("MEDIA_JOB_MAX_ATTEMPTS", "3"))
+# A running job not finished within this many seconds is assumed lost (e.g. process restart)
+MEDIA_JOB_LEASE = float(os.getenv("MEDIA_JOB_LEASE", "300"))
+MEDIA_JOB_SWEEP_INTERVAL = float(os.getenv("MEDIA_JOB_SWEEP_INTERVAL", "15"))
+
+log = get_logger(__name__)
+
+
+class JobQueue:
+    """
+    Bounded in-process queue of persisted media jobs.
+
+    Job state lives in the media_jobs table; the queue only carries ids. Workers
+    claim a job atomically before running it, so several processes can share the
+    table. A sweeper re-enqueues jobs that are queued in the DB but not in memory
+    (queue overflow, restarts) and recovers jobs whose worker died.
+    """
+
+    def __init__(self, workers: int = MEDIA_JOB_WORKERS, maxsize: int = MEDIA_JOB_QUEUE_SIZE):
+        self.workers = workers
+        self._queue: "queue.Queue[str]" = queue.Queue(maxsize=maxsize)
+        self._handlers: Dict[str, Callable[[dict], Optional[str]]] = {}
+        # job id -> (event set when it finishes here, waiters): an entry only lives while someone waits
+        self._finished: Dict[str, Tuple[threading.Event, int]] = {}
+        self._finished_lock = threading.Lock()
+        self._queued: Set[str] = set()   # ids in self._queue, so the sweeper doesn't add them twice
+        self._queued_lock = threading.Lock()
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def register(self, kind: str, handler: Callable[[dict], Optional[str]]) -> None:
+        """handler(job) runs the job and returns the result URL (None = failed)."""
+        self._handlers[kind] = handler
+
+    # -------- lifecycle --------
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+        for i in range(self.workers):
+            threading.Thread(target=self._work, name=f"media-job-{i}", daemon=True).start()
+        threading.Thread(target=self._sweep, name="media-job-sweeper", daemon=True).start()
+
+    # -------- producer side --------
+
+    def submit(self, username: str, conv_id: int, message_seq: int, kind: str, payload: str) -> dict:
+        job = MediaJob.create(username, conv_id, message_seq, kind, payload)
+        self._enqueue(job["id"])
+        return job
+
+    def _enqueue(self, job_id: str) -> None:
+        with self._queued_lock:
+            if job_id in self._queued:
+                return
+            try:
+                self._queue.put_nowait(job_id)
+            except queue.Full:
+                return  # stays queued in the DB; the sweeper picks it up once there is room
+            self._queued.add(job_id)
+
+    def _watch(self, job_id: str) -> threading.Event:
+        with self._finished_lock:
+            event, waiters = self._finished.get(job_id, (None, 0))
+            event = event or threading.Event()
+            self._finished[job_id] = (event, waiters + 1)
+            return event
+
+    def _unwatch(self, job_id: str) -> None:
+        with self._finished_lock:
+            event, waiters = self._finished[job_id]
+            if waiters > 1:
+                self._finished[job_id] = (event, waiters - 1)
+            else:
+                del self._finished[job_id]
+
+    def wait(self, job_id: str, username: str, timeout: float) -> Optional[dict]:
+        """Job state, waiting up to `timeout` seconds for it to finish (long-poll)."""
+        deadline = time.monotonic() + timeout
+        event = self._watch(job_id)   # before the first read, so a finish right after it still wakes us
+        try:
+            job = MediaJob.get(job_id, username)
+            while job and job["status"] not in (JOB_DONE, JOB_FAILED):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                # finished here → woken at once; finished by another process → noticed on the next poll
+                event.wait(min(remaining, 1.0))
+                job = MediaJob.get(job_id, username)
+            return job
+        finally:
+            self._unwatch(job_id)
+
+    # -------- consumer side --------
+
+    def _work(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            with self._queued_lock:
+                self._queued.discard(job_id)
+            try:
+                self._run(job_id)
+            except Exception as e:
+                log.exception("media job crashed", extra={"job_id": job_id})
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job_id: str) -> None:
+        job = MediaJob.claim(job_id, MEDIA_JOB_MAX_ATTEMPTS)
+        if job is None:
+            return  # already taken (or finished) elsewhere
+        handler = self._handlers.get(job["kind"])
+        url, error = None, None
+        try:
+            url = handler(job) if handler else None
+            if handler is None:
+                error = f"no handler for {job['kind']}"
+        except Exception as e:
+            error = str(e)
+        if url is None and error is None:
+            error = f"{job['kind']} generation failed"
+        MediaJob.finish(job_id, url, error)
+        with self._finished_lock:
+            watched = self._finished.get(job_id)
+        if watched is not None:
+            watched[0].set()
+
+    def _sweep(self) -> None:
+        while True:
+            try:
+                MediaJob.requeue_stale(MEDIA_JOB_LEASE, MEDIA_JOB_MAX_ATTEMPTS)
+                free = self._queue.maxsize - self._queue.qsize()
+                if free > 0:
+                    for job_id in MediaJob.queued_ids(free, MEDIA_JOB_MAX_ATTEMPTS):
+                        self._enqueue(job_id)
+            except Exception as e:
+                log.warning("media job sweep failed", extra={"error": str(e)})
+            time.sleep(MEDIA_JOB_SWEEP_INTERVAL)
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "queued_in_memory": self._queue.qsize(), "maxsize": self._queue.maxsize,
+                "waiters": len(self._finished)}
+
+
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = JobQueue()
+    return _job_queue
@@ -2,23 +2,31 @@ import base64
 import re
 from flask import jsonify
 
+from smart_librarian.utils.log import get_logger
+
+log = get_logger(__name__)
+
 # Compile once at module import time
 AUDIO_TAG_RE   = re.compile(r"<audio(?:\s+[^>]*)?>.*?</audio>", re.IGNORECASE | re.DOTALL)
 IMAGE_TAG_RE   = re.compile(r"<image(?:\s+[^>]*)?>.*?</image>", re.IGNORECASE | re.DOTALL)
 # Matches optional data:...;base64, prefix and long base64-looking runs
 BASE64_BLOB_RE = re.compile(r"(?:data:[\w/+.\-]+;base64,)?[A-Za-z0-9+/=]{100,}")
-def check_profanity(client,message:str) -> bool:
-    resp = client.moderations.create(
-        model="omni-moderation-latest",
-        input=message
-    )
+# Legacy inline media: <image type="image/png">BASE64</image> / <audio>BASE64</audio>
+INLINE_MEDIA_RE = re.compile(r"<(image|audio)((?:\s+[^>]*)?)>\s*([A-Za-z0-9+/=\s]+?)\s*</\1>", re.IGNORECASE)
+TYPE_ATTR_RE    = re.compile(r'type\s*=\s*"([^"]+)"', re.IGNORECASE)
+SRC_ATTR_RE     = re.compile(r'src\s*=\s*"([^"]+)"', re.IGNORECASE)
+# Stored media reference: <image type="image/png" src="/api/media/<id>"></image>
+MEDIA_REF_RE    = re.compile(r"<(image|audio)(\s+[^>]*)>\s*</\1>", re.IGNORECASE)
+DEFAULT_MEDIA_MIME = {"image": "image/png", "audio": "audio/mpeg"}
 
-    flagged = resp.results[0].flagged
-    categories = resp.results[0].categories
+def check_profanity(client,message:str) -> bool:
+    """Moderation verdict for a message (cached, pre-filtered; see models/moderation.py)."""
+    from smart_librarian.models.moderation import get_moderator
 
-    if flagged:
-        print("⚠️ Message flagged:", categories)
-    return flagged
+    result = get_moderator().check(client, message)
+    if result.flagged:
+        log.info("message flagged", extra={"source": result.source, "categories": result.categories})
+    return result.flagged
 
 
 
@@ -40,22 +48,79 @@ def sanitize_ctx_messages(messages: list[dict]) -> list[dict]:
 
         content = out.get("content")
         if isinstance(content, str) and content:
-            text = content
-
-            # 1) Strip custom media tags completely (ignore case, span newlines)
-            text = AUDIO_TAG_RE.sub("", text)
-            text = IMAGE_TAG_RE.sub("", text)
-
-            # 2) Replace very long base64-like blobs with a placeholder
-            text = BASE64_BLOB_RE.sub("[[media removed]]", text)
-
-            out["content"] = text.strip()
+            out["content"] = sanitize_text(content)
 
         # Non-string contents (e.g., tool calls) are left as-is
         cleaned.append(out)
 
     return cleaned
-    
+
+
+def sanitize_text(text: str) -> str:
+    """LLM-ready form of one message: media tags dropped, base64 blobs replaced."""
+    # 1) Strip custom media tags completely (ignore case, span newlines)
+    text = AUDIO_TAG_RE.sub("", text)
+    text = IMAGE_TAG_RE.sub("", text)
+
+    # 2) Replace very long base64-like blobs with a placeholder
+    text = BASE64_BLOB_RE.sub("[[media removed]]", text)
+
+    return text.strip()
+
+
+def split_message(content: str) -> tuple[str, list[dict]]:
+    """
+    Split stored content into its LLM-ready text and the media it references.
+
+    Returns:
+        (sanitized text, [{"kind": "image"|"audio", "mime": str, "url": str}, ...])
+        Legacy inline base64 payloads have no URL and are not listed; move them
+        to the media store first (see extract_inline_media).
+    """
+    media = []
+    for match in MEDIA_REF_RE.finditer(content):
+        kind, attrs = match.group(1).lower(), match.group(2)
+        src = SRC_ATTR_RE.search(attrs)
+        if not src:
+            continue
+        mime = TYPE_ATTR_RE.search(attrs)
+        media.append({"kind": kind, "mime": mime.group(1) if mime else DEFAULT_MEDIA_MIME[kind],
+                      "url": src.group(1)})
+    return sanitize_text(content), media
+
+
+def media_tag(kind: str, mime: str, url: str) -> str:
+    """Reference to a stored blob, e.g. <image type="image/png" src="/api/media/<id>"></image>."""
+    return f'<{kind} type="{mime}" src="{url}"></{kind}>'
+
+
+def extract_inline_media(content: str, store) -> tuple[str, int]:
+    """
+    Move inline base64 <image>/<audio> payloads into the media store and replace
+    them with src references.
+
+    Returns:
+        (rewritten content, number of blobs extracted)
+    """
+    from smart_librarian.database.media_store import media_url
+
+    extracted = 0
+
+    def _replace(match):
+        nonlocal extracted
+        kind = match.group(1).lower()
+        type_match = TYPE_ATTR_RE.search(match.group(2) or "")
+        mime = type_match.group(1) if type_match else DEFAULT_MEDIA_MIME[kind]
+        try:
+            data = base64.b64decode(re.sub(r"\s+", "", match.group(3)), validate=True)
+        except ValueError:  # binascii.Error subclasses ValueError
+            return match.group(0)  # not valid base64: leave untouched
+        extracted += 1
+        return media_tag(kind, mime, media_url(store.put(data, mime)))
+
+    return INLINE_MEDIA_RE.sub(_replace, content), extracted
+
+
 def to_b64(maybe_bytes):
     if not maybe_bytes:
         return None
@@ -0,0 +1,294 @@
+# smart_librarian/utils/metrics.py
+"""
+Per-stage latency instrumentation.
+
+Code marks its stages with `timed("stage")` / `@timed_stage("stage")`. Every
+measurement goes into a process-wide Prometheus histogram (served on
+/metrics) and, when it happens while serving a request, into that request's
+trace, which becomes the `Server-Timing` response header and the request log
+line. The trace lives in a ContextVar; run_async copies the context, so stages
+running on the shared pool are attributed to the request that started them.
+
+Streamed responses send their headers before the body is produced: their
+Server-Timing header only covers the stages that ran before the first byte.
+"""
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from smart_librarian.utils.log import get_logger
+
+# Bearer token required on /metrics when set
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Scrapes and health probes: neither traced nor logged
+UNTRACED_PATHS = {"/metrics", "/healthz", "/readyz"}
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+log = get_logger(__name__)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {value:g}")
+        return "\n".join(lines)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = SECONDS_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                le_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return "\n".join(lines)
+
+
+class Gauge:
+    """Current values, sampled when /metrics is rendered from the callbacks added with track()."""
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def track(self, callback: Callable[[], Dict[Tuple, float]]) -> None:
+        """`callback()` returns {label values: current value}."""
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            callbacks = list(self._callbacks)
+        values: Dict[Tuple, float] = {}
+        for callback in callbacks:
+            values.update(callback())
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {value:g}")
+        return "\n".join(lines)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Gauge:
+        metric = Gauge(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = SECONDS_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        return "\n".join(m.render() for m in self._metrics) + "\n"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram(
+    "librarian_stage_duration_seconds", "Time spent in each pipeline stage.", ("stage",))
+STAGE_ERRORS = REGISTRY.counter(
+    "librarian_stage_errors_total", "Stages that raised.", ("stage",))
+STAGE_TIMEOUTS = REGISTRY.counter(
+    "librarian_stage_timeouts_total", "Stages the request stopped waiting for.", ("stage",))
+REQUEST_SECONDS = REGISTRY.histogram(
+    "librarian_http_request_duration_seconds", "Time to produce the response (headers, for streams).",
+    ("endpoint", "method", "status"))
+REQUEST_BYTES = REGISTRY.histogram(
+    "librarian_http_request_bytes", "Request body size.", ("endpoint",), BYTES_BUCKETS)
+RESPONSE_BYTES = REGISTRY.histogram(
+    "librarian_http_response_bytes", "Response body size (not measured for streams).", ("endpoint",), BYTES_BUCKETS)
+LLM_TOKENS = REGISTRY.counter(
+    "librarian_llm_tokens_total", "Chat completion tokens reported by the API.", ("kind",))
+
+
+class RequestTrace:
+    """Stage timings of one request: stage -> [total seconds, calls]."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            entry = self.stages.setdefault(stage, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    def server_timing(self, total: float) -> str:
+        """Server-Timing header value; stages run concurrently, so they can add up to more than total."""
+        with self._lock:
+            stages = list(self.stages.items())
+        parts = []
+        for stage, (seconds, calls) in stages:
+            part = f"{stage};dur={seconds * 1000:.1f}"
+            if calls > 1:
+                part += f';desc="{calls} calls"'
+            parts.append(part)
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+    def as_fields(self) -> Dict[str, float]:
+        with self._lock:
+            return {stage: round(seconds * 1000, 1) for stage, (seconds, _) in self.stages.items()}
+
+
+_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def record(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    trace = _trace.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+@contextmanager
+def timed(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        record(stage, time.perf_counter() - started)
+
+
+def timed_stage(stage: str):
+    """Decorator form of timed()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_tokens(usage: dict) -> None:
+    for kind in ("prompt", "completion"):
+        tokens = usage.get(f"{kind}_tokens")
+        if tokens:
+            LLM_TOKENS.inc(tokens, kind=kind)
+
+
+def init_metrics(app) -> None:
+    """Request tracing hooks, Server-Timing headers, request logs and the /metrics endpoint."""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_trace():
+        if request.path in UNTRACED_PATHS:
+            return
+        trace = RequestTrace()
+        g.trace_token = _trace.set(trace)
+        g.trace = trace
+
+    @app.after_request
+    def _finish_trace(response):
+        trace = g.get("trace")
+        if trace is None:
+            return response
+        elapsed = time.perf_counter() - trace.started
+        endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, method=request.method, status=response.status_code)
+        if request.content_length:
+            REQUEST_BYTES.observe(request.content_length, endpoint=endpoint)
+        if not response.is_streamed and response.content_length is not None:
+            RESPONSE_BYTES.observe(response.content_length, endpoint=endpoint)
+        response.headers["Server-Timing"] = trace.server_timing(elapsed)
+        log.info("request", extra={
+            "method": request.method, "path": request.path, "status": response.status_code,
+            "ms": round(elapsed * 1000, 1), "bytes": response.content_length, "stages": trace.as_fields(),
+        })
+        return response
+
+    @app.teardown_request
+    def _end_trace(exc):
+        token = g.pop("trace_token", None)
+        if token is not None:
+            try:
+                _trace.reset(token)
+            except ValueError:
+                pass   # a streamed body finished in another context; nothing left to undo
+
+    @app.get("/metrics")
+    def metrics():
+        if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+            return Response("unauthorized\n", status=401, mimetype="text/plain")
+        return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
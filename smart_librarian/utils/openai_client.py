@@ -0,0 +1,32 @@
+# smart_librarian/utils/openai_client.py
+import os
+import threading
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+_client: Optional["OpenAI"] = None
+_client_lock = threading.Lock()
+
+
+def get_openai() -> "OpenAI":
+    """Shared OpenAI client of this process (one HTTP connection pool), created on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                # Imported here: the SDK takes most of a second to import, so the first call pays it, not startup
+                from openai import OpenAI
+                _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client
+
+
+def _reset_after_fork() -> None:
+    # A forked worker must not share the parent's pooled connections: it opens its own
+    global _client, _client_lock
+    _client = None
+    _client_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
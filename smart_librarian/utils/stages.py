@@ -0,0 +1,76 @@
+import contextvars
+import os
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any
+
+from smart_librarian.utils.log import get_logger
+from smart_librarian.utils.metrics import STAGE_TIMEOUTS as STAGE_TIMEOUT_COUNT
+
+# Threads shared by every request for independent pipeline stages (moderation,
+# retrieval, LLM, image, TTS...). Most of their time is spent waiting on the network.
+STAGE_WORKERS = int(os.getenv("STAGE_WORKERS", "32"))
+
+# Seconds each stage may take before the request stops waiting for it
+STAGE_TIMEOUTS = {
+    "db":         float(os.getenv("DB_STAGE_TIMEOUT", "10")),
+    "moderation": float(os.getenv("MODERATION_TIMEOUT", "5")),
+    "retrieval":  float(os.getenv("RETRIEVAL_TIMEOUT", "10")),
+    "llm":        float(os.getenv("LLM_TIMEOUT", "60")),
+    "image":      float(os.getenv("IMAGE_TIMEOUT", "120")),
+    "tts":        float(os.getenv("TTS_TIMEOUT", "60")),
+}
+
+_RAISE = object()
+
+_executor = ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix="stage")
+
+log = get_logger(__name__)
+
+
+def _reset_after_fork() -> None:
+    # Threads don't survive fork: a worker forked after the pool was used would queue work nobody runs
+    global _executor
+    _executor = ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix="stage")
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class StageTimeout(Exception):
+    def __init__(self, stage: str):
+        super().__init__(f"stage '{stage}' timed out after {STAGE_TIMEOUTS.get(stage)}s")
+        self.stage = stage
+
+
+def stage_timeout(stage: str) -> float:
+    return STAGE_TIMEOUTS[stage]
+
+
+def run_async(fn, *args, **kwargs) -> Future:
+    """Start fn(*args, **kwargs) on the shared stage pool, in a copy of the caller's context (request trace)."""
+    return _executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def completed(value: Any) -> Future:
+    """An already finished future, for stages answered without doing the work (e.g. from a cache)."""
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def wait_for(future: Future, stage: str, default: Any = _RAISE) -> Any:
+    """
+    Result of a stage, waiting at most its configured timeout.
+
+    On timeout the future is cancelled (if it hasn't started) and either
+    `default` is returned or StageTimeout is raised.
+    """
+    try:
+        return future.result(timeout=STAGE_TIMEOUTS[stage])
+    except FutureTimeout:
+        future.cancel()
+        STAGE_TIMEOUT_COUNT.inc(stage=stage)
+        log.warning("stage timed out", extra={"stage": stage, "timeout": STAGE_TIMEOUTS[stage]})
+        if default is _RAISE:
+            raise StageTimeout(stage)
+        return default
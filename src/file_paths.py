@@ -1,2 +1,10 @@
 SUMMARY_FILE = "data/book_summaries.txt"
-CHROMA_DIR = "embeddings/langchain_chroma"
\ No newline at end of file
+CHROMA_DIR = "embeddings/langchain_chroma"
+NUMPY_INDEX_DIR = "embeddings/numpy_index"
+INDEX_MANIFEST_FILE = "embeddings/manifest.json"
+EMBEDDING_CACHE_FILE = "embeddings/embedding_cache.sqlite3"
+MEDIA_DIR = "media"
+TTS_CACHE_DIR = "cache/tts"
+IMAGE_CACHE_DIR = "cache/images"
+MODERATION_BLOCKLIST_FILE = "data/moderation_blocklist.txt"
+CATALOG_STORE_DIR = "cache/catalog"
@@ -0,0 +1,50 @@
+# tests/conftest.py
+import os
+import tempfile
+
+import pytest
+
+# The engine is created when smart_librarian.database.engine is imported: point it
+# at a throwaway SQLite database before any test module imports the app.
+_DB_DIR = tempfile.mkdtemp(prefix="librarian-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_DB_DIR, 'test.sqlite3')}")
+os.environ.setdefault("CATALOG_WARMUP", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("JWT_SECRET", "test-secret-of-at-least-thirty-two-bytes")
+
+
+@pytest.fixture
+def chat_db():
+    """Fresh conversation/message tables for each test."""
+    from smart_librarian.database import chat_db
+
+    chat_db.init_chat_db()
+    yield chat_db
+    chat_db.Base.metadata.drop_all(bind=chat_db.engine)
+
+
+@pytest.fixture
+def media_store(tmp_path, monkeypatch):
+    """A LocalMediaStore under tmp_path, used by the migrations."""
+    from smart_librarian.database import migrations
+    from smart_librarian.database.media_store import LocalMediaStore
+
+    store = LocalMediaStore(root=str(tmp_path / "media"))
+    monkeypatch.setattr(migrations, "get_media_store", lambda: store)
+    return store
+
+
+@pytest.fixture
+def client(chat_db, monkeypatch):
+    """Flask test client signed in as "alice", with the job table in place and no network."""
+    from smart_librarian import create_app
+    from smart_librarian.database.job_db import init_job_db
+    from smart_librarian.models import context
+    from smart_librarian.utils.auth_guard import COOKIE_NAME
+    from smart_librarian.utils.jwt_helper import create_jwt
+
+    init_job_db()
+    monkeypatch.setattr(context, "_encoding", False)   # estimate tokens instead of downloading tiktoken data
+    test_client = create_app().test_client()
+    test_client.set_cookie(COOKIE_NAME, create_jwt({"sub": "alice"}))
+    return test_client
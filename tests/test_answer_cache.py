@@ -0,0 +1,38 @@
+# tests/test_answer_cache.py
+import pytest
+
+from smart_librarian.models import answer_cache
+from smart_librarian.models.answer_cache import SemanticAnswerCache, lookup_answer, store_answer
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE", True)
+    monkeypatch.setattr(answer_cache, "_cache", SemanticAnswerCache(threshold=0.9, max_entries=2, ttl=None))
+
+
+def test_fast_path_queries_skip_the_cache(enabled):
+    assert lookup_answer(None, ["Dune"], "v1") == (None, None)
+
+
+def test_similar_query_hits_within_the_same_titles(enabled):
+    answer, slot = lookup_answer([1.0, 0.0], ["Dune", "Emma"], "v1")
+    assert answer is None
+    store_answer(slot, ("Try Dune.", []))
+
+    assert lookup_answer([0.99, 0.05], ["Emma", "Dune"], "v1")[0] == ("Try Dune.", [])
+    assert lookup_answer([0.0, 1.0], ["Dune", "Emma"], "v1")[0] is None     # not similar enough
+    assert lookup_answer([1.0, 0.0], ["Dune"], "v1")[0] is None             # other candidates
+    assert lookup_answer([1.0, 0.0], ["Dune", "Emma"], "v2")[0] is None     # other prompt
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticAnswerCache(threshold=0.9, max_entries=2, ttl=None)
+    cache.set("a", [1.0, 0.0], "A")
+    cache.set("b", [1.0, 0.0], "B")
+    assert cache.get("a", [1.0, 0.0]) == "A"     # "b" is now the oldest
+    cache.set("c", [1.0, 0.0], "C")
+
+    assert cache.get("b", [1.0, 0.0]) is None
+    assert cache.get("a", [1.0, 0.0]) == "A"
+    assert cache.stats()["evictions"] == 1
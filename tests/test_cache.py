@@ -0,0 +1,96 @@
+# tests/test_cache.py
+import threading
+import time
+
+import pytest
+
+from smart_librarian.utils.cache import DiskLRUCache, LRUCache, SingleFlight
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1       # "b" is now the oldest
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_entries_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = LRUCache(max_entries=10, ttl=5)
+    cache.set("short", 1)
+    cache.set("forever", 2, ttl=0)   # 0 = no expiry for this entry
+
+    now[0] += 6
+
+    assert cache.get("short", "gone") == "gone"
+    assert cache.get("forever") == 2
+    assert len(cache) == 1
+
+
+def test_disk_cache_evicts_past_max_bytes(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=10)
+    cache.set("aa11", b"12345")
+    cache.set("bb22", b"12345")
+    assert cache.get("aa11") == b"12345"    # "bb22" is now the least recently used
+    cache.set("cc33", b"12345")
+
+    assert "bb22" not in cache and cache.get("bb22") is None
+    assert cache.get("aa11") == b"12345" and cache.get("cc33") == b"12345"
+    assert cache.stats()["bytes"] == 10
+
+
+def test_disk_cache_survives_reopening(tmp_path):
+    DiskLRUCache(str(tmp_path), max_bytes=100).set("aa11", b"blob")
+
+    assert DiskLRUCache(str(tmp_path), max_bytes=100).get("aa11") == b"blob"
+
+
+def test_single_flight_runs_once_for_concurrent_callers():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return "result"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.do("key", slow))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    while flights.stats()["coalesced"] < 4:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert calls == [1]
+    assert results == ["result"] * 5
+    assert flights.stats() == {"calls": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_single_flight_shares_the_error_then_retries():
+    flights = SingleFlight()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        flights.do("key", fail)
+    assert flights.do("key", lambda: "ok") == "ok"     # a failed flight is not cached
+
+
+def test_disk_cache_peek_counts_nothing(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=100)
+    assert cache.peek("aa11") is None
+    cache.set("aa11", b"blob")
+
+    assert cache.peek("aa11") == b"blob"
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (0, 0)
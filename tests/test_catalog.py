@@ -0,0 +1,182 @@
+# tests/test_catalog.py
+import threading
+
+import numpy as np
+import pytest
+
+from smart_librarian.models import catalog
+from smart_librarian.models.book_model import NumpyVectorStore, TitleIndex, iter_documents
+from smart_librarian.models.catalog import CatalogData, CatalogService
+from smart_librarian.models.catalog_store import open_catalog_store
+from smart_librarian.models.search_index import BM25Index, ThemeIndex
+
+SUMMARIES = [
+    ("The Hobbit", "Bilbo joins dwarves on a quest for treasure. Themes: adventure, friendship."),
+    ("Treasure Island", "A boy sails after pirate gold. Themes: adventure, greed."),
+    ("Charlotte's Web", "A pig and a spider become friends. Themes: friendship, loyalty."),
+    ("The Lord of the Rings", "A long quest to destroy a ring, and a friendship that survives it. "
+                              "Themes: adventure, friendship, courage."),
+    ("Of Mice and Men", "Two drifters share a dream. Themes: friendship, loneliness."),
+]
+
+
+class NoVectors:
+    """Fails the test if a fast path reaches the vector index."""
+
+    @property
+    def embeddings(self):
+        raise AssertionError("the vector index was queried")
+
+
+class HashEmbeddings:
+    """Deterministic 16-dim vectors derived from the text."""
+
+    def _vector(self, text):
+        return np.random.default_rng(sum(map(ord, text))).standard_normal(16).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def _vectors():
+    return NumpyVectorStore.from_documents(list(iter_documents(SUMMARIES)), HashEmbeddings())
+
+
+def _catalog(vectorstore=None):
+    titles = [title for title, _ in SUMMARIES]
+    catalog = CatalogService(sources=["unused.txt"])
+    catalog._install(CatalogData(None, titles, TitleIndex(titles),
+                                 BM25Index(f"{title}\n{summary}" for title, summary in SUMMARIES),
+                                 ThemeIndex(SUMMARIES), vectorstore or NoVectors()), {})
+    return catalog
+
+
+def test_theme_hits_carrying_every_queried_theme_rank_first():
+    retrieval = _catalog().search("books about adventure and friendship", k=3)
+
+    # Both themes first; BM25 breaks the tie (the Lord of the Rings also mentions friendship
+    # outside its themes line). Then a book with one of them, not the next one in file order.
+    assert retrieval.candidates == [("The Lord of the Rings", 0.95), ("The Hobbit", 0.95),
+                                    ("Treasure Island", 0.47)]
+    assert retrieval.query_vector is None
+
+
+def test_single_theme_query_is_capped_at_k():
+    retrieval = _catalog().search("friendship", k=2)
+
+    assert [title for title, _ in retrieval.candidates] == ["The Lord of the Rings", "The Hobbit"]
+
+
+def test_a_misspelled_title_ranks_by_its_match_score_not_as_named():
+    retrieval = _catalog(_vectors()).search("Treasure Islnd", k=3)
+
+    scores = dict(retrieval.candidates)
+    assert 0.6 <= scores["Treasure Island"] < 1.0
+    assert 1.0 not in scores.values()
+    assert len(retrieval.candidates) == 3
+    assert [score for _, score in retrieval.candidates] == sorted(scores.values(), reverse=True)
+
+
+def test_named_and_exact_titles_keep_relevance_one():
+    assert _catalog().search("the hobbit").candidates == [("The Hobbit", 1.0)]
+    named = _catalog(_vectors()).search("something like The Hobbit about pirates", k=2)
+    assert named.candidates[0] == ("The Hobbit", 1.0)
+
+
+# -------- lifecycle --------
+
+SHARD = """## Title: The Hobbit
+Bilbo joins dwarves on a quest for treasure. Themes: adventure, friendship.
+
+## Title: Treasure Island
+A boy sails after pirate gold. Themes: adventure, greed.
+"""
+
+
+@pytest.fixture
+def loaded(tmp_path, monkeypatch):
+    """A CatalogService over a summary file in tmp_path; counts vector index builds."""
+    source = tmp_path / "summaries.txt"
+    source.write_text(SHARD, encoding="utf-8")
+    builds = []
+
+    def build_vectorstore(docs):
+        builds.append([d.metadata["title"] for d in docs])
+        return NoVectors()
+
+    monkeypatch.setattr(catalog, "open_catalog_store",
+                        lambda paths: open_catalog_store(paths, directory=str(tmp_path / "store")))
+    monkeypatch.setattr(catalog, "build_vectorstore", build_vectorstore)
+    return CatalogService(sources=[str(source)]), source, builds
+
+
+def test_catalog_loads_lazily_and_once_across_threads(loaded):
+    service, _, builds = loaded
+    assert not service.is_loaded
+    assert service.status() == {"state": "not_loaded"}
+
+    barrier = threading.Barrier(8)
+
+    def read_titles():
+        barrier.wait()
+        return service.titles
+
+    threads = [threading.Thread(target=read_titles) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert builds == [["The Hobbit", "Treasure Island"]]
+    assert service.status()["state"] == "ready"
+    assert service.get_summary("The Hobbit").startswith("Bilbo")
+    assert service.stats()["loads"] == 1
+
+
+def test_repeated_access_does_not_grow_the_catalog(loaded):
+    service, _, _ = loaded
+
+    for _ in range(3):
+        assert service.titles == ["The Hobbit", "Treasure Island"]
+        service.resolve_title("the hobbit")
+
+    stats = service.stats()
+    assert stats["loads"] == 1
+    assert stats["titles"] == 2
+    assert stats["approx_bytes"] > 0
+    assert set(stats) >= {"parse_seconds", "index_seconds", "vectorstore_seconds", "load_seconds"}
+
+
+def test_reload_swaps_in_a_new_version(loaded):
+    service, source, _ = loaded
+    before = service._ensure_loaded()
+
+    source.write_text(SHARD + "\n## Title: Dune\nSpice and sand. Themes: power.\n", encoding="utf-8")
+    service.reload()
+
+    assert before.titles == ["The Hobbit", "Treasure Island"]   # readers of the old version are unaffected
+    assert service.titles[-1] == "Dune"
+    assert service.stats()["loads"] == 2
+
+
+def test_a_failed_load_is_reported_and_retried(loaded, monkeypatch):
+    service, _, _ = loaded
+    real_build = service._build
+    monkeypatch.setattr(service, "_build", lambda: (_ for _ in ()).throw(OSError("disk gone")))
+
+    with pytest.raises(OSError):
+        service.titles
+    assert service.status() == {"state": "failed", "error": "OSError: disk gone"}
+
+    monkeypatch.setattr(service, "_build", real_build)
+    assert service.titles == ["The Hobbit", "Treasure Island"]
+
+
+def test_get_catalog_returns_one_shared_service(monkeypatch):
+    monkeypatch.setattr(catalog, "_catalog", None)
+
+    assert catalog.get_catalog() is catalog.get_catalog()
+    assert not catalog.get_catalog().is_loaded
@@ -0,0 +1,100 @@
+# tests/test_catalog_store.py
+import os
+
+import pytest
+
+from smart_librarian.models import catalog_store
+from smart_librarian.models.catalog_store import CatalogStore, build_catalog_store, open_catalog_store
+
+RECORDS = [
+    ("1984", "A dystopian story about surveillance."),
+    ("The Hobbit", "Bilbo joins a quest. Themes: adventure."),
+    ("Cien años de soledad", "La historia de los Buendía."),
+    ("Naïve Ünïcode ☃", "Multi-byte titles and summaries: ☃ é ü."),
+]
+
+
+def test_round_trip(tmp_path):
+    store = build_catalog_store(RECORDS, directory=str(tmp_path))
+
+    assert len(store) == len(RECORDS)
+    assert store.titles() == [title for title, _ in RECORDS]
+    assert list(store.items()) == RECORDS
+    for title, summary in RECORDS:
+        assert store.get(title) == summary
+        assert title in store
+    assert store.get("the hobbit") is None          # exact match only
+    assert store.get("Missing", "default") == "default"
+
+
+def test_reopened_from_disk(tmp_path):
+    build_catalog_store(RECORDS, directory=str(tmp_path)).close()
+
+    store = CatalogStore(str(tmp_path))
+
+    assert dict(store.items()) == dict(RECORDS)
+    assert store.stats()["records"] == len(RECORDS)
+
+
+@pytest.mark.parametrize("home_slot", [0, 7])    # 7: the last slot of an 8-slot table, probing wraps to 0
+def test_colliding_titles_are_found_by_probing(tmp_path, monkeypatch, home_slot):
+    monkeypatch.setattr(catalog_store, "title_hash", lambda title_bytes: home_slot)
+    records = [("A", "first"), ("B", "second"), ("C", "third")]
+
+    store = build_catalog_store(records, directory=str(tmp_path))
+
+    assert len(store.slots) == 8
+    assert [store.get(title) for title, _ in records] == ["first", "second", "third"]
+    assert store.find("D") is None                  # probe runs to an empty slot
+
+
+def test_load_factor_stays_at_most_half(tmp_path):
+    records = [(f"Title {i}", f"Summary {i}") for i in range(1000)]
+
+    store = build_catalog_store(records, directory=str(tmp_path))
+
+    assert len(store.slots) >= 2 * len(records)
+    assert (store.slots != 0).sum() == len(records)
+    assert all(store.get(title) == summary for title, summary in records)
+
+
+def test_repeated_title_replaces_summary_but_keeps_position(tmp_path):
+    records = [("A", "old"), ("B", "b"), ("A", "new")]
+
+    store = build_catalog_store(records, directory=str(tmp_path))
+
+    assert store.titles() == ["A", "B"]
+    assert store.get("A") == "new"
+    assert list(store.items()) == [("A", "new"), ("B", "b")]
+    # the replaced summary is not left behind in text.bin
+    assert (tmp_path / "text.bin").read_bytes() == b"newb"
+
+
+def test_empty_store(tmp_path):
+    store = build_catalog_store([], directory=str(tmp_path))
+
+    assert len(store) == 0
+    assert store.titles() == []
+    assert store.get("anything") is None
+
+
+def test_title_with_newline_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        build_catalog_store([("Bad\ntitle", "summary")], directory=str(tmp_path))
+
+
+def test_open_rebuilds_when_a_shard_changes(tmp_path):
+    shard = tmp_path / "books.txt"
+    shard.write_text("## Title: Dune\nSpice and sand.\n", encoding="utf-8")
+    directory = str(tmp_path / "store")
+
+    store = open_catalog_store([str(shard)], directory=directory)
+    assert store.get("Dune") == "Spice and sand."
+    assert store.is_fresh([str(shard)])
+
+    shard.write_text("## Title: Dune\nSpice and sand.\n\n## Title: Emma\nMatchmaking.\n", encoding="utf-8")
+    os.utime(shard, ns=(0, 1))   # a distinct mtime even on coarse filesystem clocks
+    assert not store.is_fresh([str(shard)])
+
+    store = open_catalog_store([str(shard)], directory=directory)
+    assert store.titles() == ["Dune", "Emma"]
@@ -0,0 +1,69 @@
+# tests/test_chat_db.py
+import threading
+
+
+def _conversation_with(chat_db, n):
+    conv_id = chat_db.Conversation.create_conversation("alice", "Chat")
+    seqs = [chat_db.Conversation.add_message("alice", conv_id, "user" if i % 2 else "assistant", f"message {i}")
+            for i in range(1, n + 1)]
+    return conv_id, seqs
+
+
+def test_messages_get_consecutive_seqs(chat_db):
+    conv_id, seqs = _conversation_with(chat_db, 5)
+
+    assert seqs == [1, 2, 3, 4, 5]
+    assert chat_db.Conversation.get_conversation("alice", conv_id)["last_seq"] == 5
+    assert chat_db.Conversation.add_message("bob", conv_id, "user", "not mine") is None
+
+
+def test_keyset_pages_are_oldest_to_newest(chat_db):
+    conv_id, _ = _conversation_with(chat_db, 7)
+    get = chat_db.Conversation.get_messages
+
+    assert [m["seq"] for m in get("alice", conv_id, limit=3)] == [5, 6, 7]              # latest page
+    assert [m["seq"] for m in get("alice", conv_id, before_seq=5, limit=3)] == [2, 3, 4]
+    assert [m["seq"] for m in get("alice", conv_id, before_seq=2, limit=3)] == [1]
+    assert [m["seq"] for m in get("alice", conv_id, after_seq=2, limit=3)] == [3, 4, 5]
+    assert [m["seq"] for m in get("alice", conv_id, limit=None)] == list(range(1, 8))
+    assert get("bob", conv_id) == []
+
+
+def test_context_messages_use_the_precomputed_text(chat_db):
+    conv_id, _ = _conversation_with(chat_db, 3)
+
+    context = chat_db.Conversation.get_context_messages("alice", conv_id, after_seq=1)
+
+    assert context == [{"seq": 2, "role": "assistant", "content": "message 2"},
+                       {"seq": 3, "role": "user", "content": "message 3"}]
+
+
+def test_delete_removes_messages(chat_db):
+    conv_id, _ = _conversation_with(chat_db, 2)
+
+    chat_db.Conversation.delete_conversation("alice", conv_id)
+
+    assert chat_db.Conversation.get_conversation("alice", conv_id) is None
+    assert chat_db.Conversation.get_messages("alice", conv_id) == []
+
+
+def test_concurrent_appends_keep_every_media_reference(chat_db):
+    conv_id, (seq,) = _conversation_with(chat_db, 1)
+    tags = [f'<{kind} type="{mime}" src="/api/media/{i}"></{kind}>'
+            for i, (kind, mime) in enumerate([("image", "image/png"), ("audio", "audio/mpeg")] * 4)]
+    start = threading.Barrier(len(tags))
+
+    def append(tag):
+        start.wait()
+        chat_db.Conversation.append_to_message(conv_id, seq, tag)
+
+    threads = [threading.Thread(target=append, args=(tag,)) for tag in tags]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    (message,) = chat_db.Conversation.get_messages("alice", conv_id)
+    assert sorted(m["url"] for m in message["media"]) == sorted(f"/api/media/{i}" for i in range(len(tags)))
+    assert message["text"] == "message 1"
+    assert chat_db.Conversation.append_to_message(conv_id, seq + 1, tags[0]) is False
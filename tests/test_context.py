@@ -0,0 +1,98 @@
+# tests/test_context.py
+import pytest
+
+from smart_librarian.models import context
+from smart_librarian.models.context import SUMMARY_PREFIX, build_context, message_tokens, roll_summary
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    """Count tokens as len/4 instead of loading tiktoken's data."""
+    monkeypatch.setattr(context, "_encoding", False)
+
+
+def _history(n):
+    return [{"seq": i + 1, "role": "user" if i % 2 == 0 else "assistant", "content": f"message {i + 1} " * 10}
+            for i in range(n)]
+
+
+def test_everything_fits_in_a_large_budget():
+    history = _history(4)
+
+    built = build_context("Be helpful.", None, history, "Next?", budget=10_000)
+
+    assert [m["content"] for m in built.messages[1:-1]] == [m["content"] for m in history]
+    assert built.messages[0] == {"role": "system", "content": "Be helpful."}
+    assert built.messages[-1] == {"role": "user", "content": "Next?"}
+    assert built.overflow == []
+    assert built.usage["dropped_messages"] == 0
+
+
+def test_the_newest_turns_that_fit_are_kept_and_older_ones_overflow():
+    history = _history(6)
+    fixed = build_context("Be helpful.", None, [], "Next?").usage["prompt_tokens_estimate"]
+    per_message = message_tokens(history[-1])
+
+    built = build_context("Be helpful.", None, history, "Next?", budget=fixed + 2 * per_message + 1)
+
+    assert [m["content"] for m in built.messages[1:-1]] == [m["content"] for m in history[-2:]]
+    assert built.overflow == history[:4]
+    assert built.usage["history_messages"] == 2
+    assert built.usage["dropped_messages"] == 4
+    assert built.usage["prompt_tokens_estimate"] <= built.usage["budget"]
+
+
+def test_the_running_summary_follows_the_system_prompt():
+    built = build_context("Be helpful.", "They liked The Hobbit.", _history(2), "Next?", budget=10_000)
+
+    assert built.messages[1] == {"role": "system", "content": SUMMARY_PREFIX + "They liked The Hobbit."}
+    assert built.usage["summary_tokens"] > 0
+
+
+def test_roll_summary_folds_older_turns_and_keeps_the_recent_share(chat_db, monkeypatch):
+    conv_id = chat_db.Conversation.create_conversation("alice", "Quests")
+    for m in _history(6):
+        chat_db.Conversation.add_message("alice", conv_id, m["role"], m["content"])
+    history = chat_db.Conversation.get_context_messages("alice", conv_id)
+    folded = []
+    monkeypatch.setattr(context, "_summarize", lambda summary, messages: folded.extend(messages) or "Hobbit fans.")
+    budget = 2 * message_tokens(history[-1]) * 2   # the recent share (half) keeps two messages
+
+    assert roll_summary(conv_id, None, 0, history, budget=budget) is True
+
+    conv = chat_db.Conversation.get_conversation("alice", conv_id)
+    assert (conv["summary"], conv["summary_seq"]) == ("Hobbit fans.", 4)
+    assert [m["seq"] for m in folded] == [1, 2, 3, 4]
+    assert [m["seq"] for m in chat_db.Conversation.get_context_messages("alice", conv_id, after_seq=4)] == [5, 6]
+
+
+def test_roll_summary_is_a_no_op_when_the_summary_moved_on(chat_db, monkeypatch):
+    conv_id = chat_db.Conversation.create_conversation("alice", "Quests")
+    for m in _history(4):
+        chat_db.Conversation.add_message("alice", conv_id, m["role"], m["content"])
+    history = chat_db.Conversation.get_context_messages("alice", conv_id)
+    monkeypatch.setattr(context, "_summarize", lambda summary, messages: "newer")
+    chat_db.Conversation.set_summary(conv_id, "rolled by another request", 2, 0)
+
+    assert roll_summary(conv_id, None, 0, history, budget=1) is False   # expected summary_seq 0, stored 2
+    assert chat_db.Conversation.get_conversation("alice", conv_id)["summary"] == "rolled by another request"
+
+
+def test_roll_summary_keeps_the_old_summary_when_summarizing_fails(chat_db, monkeypatch):
+    conv_id = chat_db.Conversation.create_conversation("alice", "Quests")
+    chat_db.Conversation.add_message("alice", conv_id, "user", "hello " * 50)
+    history = chat_db.Conversation.get_context_messages("alice", conv_id)
+
+    def unavailable(summary, messages):
+        raise RuntimeError("upstream down")
+
+    monkeypatch.setattr(context, "_summarize", unavailable)
+
+    assert roll_summary(conv_id, None, 0, history, budget=1) is False
+    assert chat_db.Conversation.get_conversation("alice", conv_id)["summary"] is None
+
+
+def test_nothing_to_fold_makes_no_summary_call(monkeypatch):
+    monkeypatch.setattr(context, "_summarize", lambda summary, messages: pytest.fail("summarized"))
+
+    assert roll_summary(1, None, 0, _history(2), budget=10_000) is False
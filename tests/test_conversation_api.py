@@ -0,0 +1,61 @@
+# tests/test_conversation_api.py
+def _open(client, conv_id, **body):
+    headers = {"If-None-Match": body.pop("etag")} if "etag" in body else {}
+    return client.post("/api/open", json={"conv_id": conv_id, **body}, headers=headers)
+
+
+def test_open_revalidates_an_unchanged_conversation_with_304(client, chat_db):
+    conv_id = chat_db.Conversation.create_conversation("alice", "Quests")
+    chat_db.Conversation.add_message("alice", conv_id, "user", "hello")
+
+    first = _open(client, conv_id)
+    again = _open(client, conv_id, etag=first.headers["ETag"])
+
+    assert first.status_code == 200
+    assert first.headers["Cache-Control"] == "private, no-cache"
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == first.headers["ETag"]
+
+
+def test_open_sends_a_new_version_after_a_message_is_added(client, chat_db):
+    conv_id = chat_db.Conversation.create_conversation("alice", "Quests")
+    etag = _open(client, conv_id).headers["ETag"]
+
+    chat_db.Conversation.add_message("alice", conv_id, "user", "hello")
+    resp = _open(client, conv_id, etag=etag)
+
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+    assert [m["text"] for m in resp.get_json()["conv"]["messages"]] == ["hello"]
+
+
+def test_open_with_a_cursor_returns_only_newer_messages(client, chat_db):
+    conv_id = chat_db.Conversation.create_conversation("alice", "Quests")
+    for text in ("one", "two", "three"):
+        chat_db.Conversation.add_message("alice", conv_id, "user", text)
+
+    conv = _open(client, conv_id, after_seq=2).get_json()["conv"]
+
+    assert conv["delta"] is True
+    assert conv["last_seq"] == 3
+    assert [(m["seq"], m["text"]) for m in conv["messages"]] == [(3, "three")]
+
+
+def test_list_revalidates_with_304_until_a_conversation_changes(client, chat_db):
+    chat_db.Conversation.create_conversation("alice", "Quests")
+    first = client.get("/api/list")
+
+    assert client.get("/api/list", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+    chat_db.Conversation.create_conversation("alice", "Pirates")
+    changed = client.get("/api/list", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert changed.status_code == 200
+    assert sorted(c["title"] for c in changed.get_json()["conversations"]) == ["Pirates", "Quests"]
+
+
+def test_another_users_conversation_is_not_found(client, chat_db):
+    conv_id = chat_db.Conversation.create_conversation("bob", "Private")
+
+    assert _open(client, conv_id).status_code == 404
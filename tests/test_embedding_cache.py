@@ -0,0 +1,90 @@
+# tests/test_embedding_cache.py
+from smart_librarian.models.embedding_cache import CachedEmbeddings, DiskEmbeddingCache, normalize_query
+
+
+class CountingEmbeddings:
+    """Counts calls; the vector is derived from the text's length."""
+    model = "test-embedding"
+
+    def __init__(self):
+        self.queries = []
+        self.batches = []
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [float(len(text)), 1.0]
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(t)), 0.0] for t in texts]
+
+
+def test_normalize_query_folds_case_and_whitespace():
+    assert normalize_query("  Recommend   a Fantasy\tbook ") == "recommend a fantasy book"
+
+
+def test_near_identical_queries_are_embedded_once():
+    inner = CountingEmbeddings()
+    embeddings = CachedEmbeddings(inner)
+
+    first = embeddings.embed_query("Recommend a fantasy book")
+    again = embeddings.embed_query("recommend  a FANTASY book")
+
+    assert again == first
+    assert inner.queries == ["Recommend a fantasy book"]
+    stats = embeddings.stats()
+    assert (stats["memory"]["hits"], stats["misses"]) == (1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_the_model_is_part_of_the_key():
+    inner = CountingEmbeddings()
+    shared_memory = CachedEmbeddings(inner).memory
+
+    CachedEmbeddings(inner, model="a", memory=shared_memory).embed_query("dune")
+    CachedEmbeddings(inner, model="b", memory=shared_memory).embed_query("dune")
+
+    assert inner.queries == ["dune", "dune"]
+
+
+def test_only_missing_documents_are_sent_in_one_batch():
+    inner = CountingEmbeddings()
+    embeddings = CachedEmbeddings(inner)
+    embeddings.embed_documents(["The Hobbit", "Dune"])
+
+    vectors = embeddings.embed_documents(["Dune", "Emma", "The Hobbit"])
+
+    assert inner.batches == [["The Hobbit", "Dune"], ["Emma"]]
+    assert vectors == [[4.0, 0.0], [4.0, 0.0], [10.0, 0.0]]
+
+
+def test_the_disk_tier_survives_a_restart(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    CachedEmbeddings(CountingEmbeddings(), disk=DiskEmbeddingCache(path, 100, ttl=None)).embed_query("dune")
+
+    inner = CountingEmbeddings()
+    restarted = CachedEmbeddings(inner, disk=DiskEmbeddingCache(path, 100, ttl=None))
+
+    assert restarted.embed_query("Dune") == [4.0, 1.0]
+    assert inner.queries == []
+    assert restarted.stats()["disk_hits"] == 1
+
+
+def test_disk_entries_expire_after_the_ttl(tmp_path, monkeypatch):
+    disk = DiskEmbeddingCache(str(tmp_path / "embeddings.sqlite3"), 100, ttl=60)
+    disk.set("k", [1.0])
+
+    monkeypatch.setattr("smart_librarian.models.embedding_cache.time.time", lambda: 10 ** 12)
+
+    assert disk.get("k") is None
+    assert len(disk) == 0
+
+
+def test_disk_tier_evicts_least_recently_used_past_max_entries(tmp_path):
+    disk = DiskEmbeddingCache(str(tmp_path / "embeddings.sqlite3"), 50, ttl=None)
+    for i in range(100):   # eviction runs every 100 writes
+        disk.set(f"k{i}", [float(i)])
+
+    assert len(disk) == 50
+    assert disk.get("k0") is None
+    assert disk.get("k99") == [99.0]
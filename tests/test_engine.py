@@ -0,0 +1,97 @@
+# tests/test_engine.py
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from smart_librarian.api import message_api
+from smart_librarian.database import chat_db as chat_module
+from smart_librarian.database import engine as db_engine
+from smart_librarian.database import job_db, user_db
+from smart_librarian.database.engine import REPLICA_PIN_COOKIE, _engine_options, _make_engine, _operation
+
+
+@pytest.fixture
+def replica(tmp_path, chat_db, monkeypatch):
+    """A separate database standing in for a lagging read replica, wired like DATABASE_REPLICA_URL."""
+    replica_engine = _make_engine(f"sqlite:///{tmp_path / 'replica.sqlite3'}", "test_replica")
+    chat_db.Base.metadata.create_all(bind=replica_engine)
+    monkeypatch.setattr(chat_module, "ReadSessionLocal", sessionmaker(bind=replica_engine, expire_on_commit=False))
+    monkeypatch.setattr(message_api, "DATABASE_REPLICA_URL", "postgresql://replica/smartlib")
+    yield replica_engine
+    replica_engine.dispose()
+
+
+def test_every_table_shares_one_engine():
+    assert user_db.SessionLocal.kw["bind"] is db_engine.engine
+    assert chat_module.SessionLocal is db_engine.SessionLocal
+    assert job_db.SessionLocal is db_engine.SessionLocal
+    assert db_engine.ReadSessionLocal is db_engine.SessionLocal   # no replica configured
+
+
+def test_server_databases_get_a_tuned_pool(monkeypatch):
+    monkeypatch.setattr(db_engine, "DB_STATEMENT_TIMEOUT_MS", 2000)
+
+    options = _engine_options("postgresql+psycopg2://u:p@db:5432/smartlib")
+
+    assert options["pool_size"] == db_engine.DB_POOL_SIZE
+    assert options["max_overflow"] == db_engine.DB_MAX_OVERFLOW
+    assert options["pool_recycle"] == db_engine.DB_POOL_RECYCLE
+    assert options["pool_use_lifo"] is True
+    assert options["pool_pre_ping"] is False
+    assert options["connect_args"] == {"connect_timeout": db_engine.DB_CONNECT_TIMEOUT,
+                                       "options": "-c statement_timeout=2000"}
+    assert _engine_options("sqlite:///local.sqlite3") == {"pool_pre_ping": False}
+
+
+def test_statement_kinds():
+    assert [_operation(s) for s in ("select 1", "  INSERT INTO t", "update t", "delete from t", "PRAGMA x", "")] \
+        == ["SELECT", "INSERT", "UPDATE", "DELETE", "OTHER", "OTHER"]
+
+
+def test_statements_are_timed_slow_ones_logged_and_the_pool_reported(tmp_path, monkeypatch):
+    warnings = []
+    monkeypatch.setattr(db_engine, "DB_SLOW_QUERY_MS", 0)
+    monkeypatch.setattr(db_engine, "log", SimpleNamespace(warning=lambda msg, extra: warnings.append((msg, extra))))
+    engine = _make_engine(f"sqlite:///{tmp_path / 'timed.sqlite3'}", "test_timed")
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            pool_while_busy = db_engine.REGISTRY.render()
+
+        scrape = db_engine.REGISTRY.render()
+    finally:
+        engine.dispose()
+
+    assert 'librarian_db_statement_duration_seconds_count{engine="test_timed",operation="SELECT"}' in scrape
+    assert 'librarian_db_pool_connections{engine="test_timed",state="checked_out"} 1' in pool_while_busy
+    assert 'librarian_db_pool_checkouts_total{engine="test_timed"} 1' in scrape
+    assert ("slow query", "SELECT 1") in [(msg, extra["statement"]) for msg, extra in warnings]
+
+
+def test_lag_tolerant_reads_use_the_replica(chat_db, replica):
+    chat_db.Conversation.create_conversation("alice", "Written to the primary")
+
+    assert chat_db.Conversation.list_conversations("alice", replica=True) == []   # not replicated yet
+    assert [c["title"] for c in chat_db.Conversation.list_conversations("alice")] == ["Written to the primary"]
+
+
+def test_a_write_pins_the_clients_reads_to_the_primary(client, chat_db, replica):
+    assert REPLICA_PIN_COOKIE not in client.get("/api/list").headers.get("Set-Cookie", "")
+    assert client.get("/api/list").get_json()["conversations"] == []   # the replica
+
+    created = client.post("/api/new")
+
+    cookie = client.get_cookie(REPLICA_PIN_COOKIE)
+    assert cookie is not None and cookie.value == "1"
+    (pin,) = [h for h in created.headers.getlist("Set-Cookie") if h.startswith(REPLICA_PIN_COOKIE)]
+    assert f"Max-Age={db_engine.DB_REPLICA_PIN_SECONDS}" in pin
+    titles = [c["title"] for c in client.get("/api/list").get_json()["conversations"]]
+    assert titles == ["New chat"]   # read back from the primary
+
+
+def test_without_a_replica_no_pin_cookie_is_set(client, chat_db):
+    client.post("/api/new")
+
+    assert client.get_cookie(REPLICA_PIN_COOKIE) is None
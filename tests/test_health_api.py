@@ -0,0 +1,86 @@
+# tests/test_health_api.py
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from smart_librarian.api import health_api
+from smart_librarian.models.catalog import CatalogData, CatalogService
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Only needed once a request uses them: none of these may load at startup
+DEFERRED = ("openai", "langchain", "langchain_core", "langchain_openai", "langchain_chroma", "chromadb", "tiktoken")
+
+
+def _service(monkeypatch, build):
+    service = CatalogService(sources=["unused.txt"])
+    monkeypatch.setattr(service, "_build", build)
+    monkeypatch.setattr(health_api, "get_catalog", lambda: service)
+    return service
+
+
+def _loaded():
+    return CatalogData(None, ["The Hobbit"], None, None, None, object()), {"loaded_at": 1.0}
+
+
+def test_healthz_answers_before_the_catalog_is_loaded(client, monkeypatch):
+    _service(monkeypatch, _loaded)
+
+    assert client.get("/healthz").get_json() == {"status": "ok"}
+    resp = client.get("/readyz")
+    assert resp.status_code == 503
+    assert resp.get_json() == {"ready": False, "catalog": {"state": "not_loaded"}}
+
+
+def test_readyz_turns_ready_once_the_background_warm_up_is_done(client, monkeypatch):
+    release = threading.Event()
+
+    def slow_build():
+        release.wait(5)
+        return _loaded()
+
+    service = _service(monkeypatch, slow_build)
+
+    service.warm_up()
+    assert client.get("/readyz").get_json()["catalog"]["state"] in ("not_loaded", "loading")
+    release.set()
+    for _ in range(100):
+        if service.is_loaded:
+            break
+        time.sleep(0.02)
+
+    resp = client.get("/readyz")
+    assert resp.status_code == 200
+    assert resp.get_json()["catalog"] == {"state": "ready", "titles": 1, "loaded_at": 1.0}
+
+
+def test_a_failed_warm_up_is_reported_and_not_fatal(client, monkeypatch):
+    def broken():
+        raise OSError("summaries unreadable")
+
+    service = _service(monkeypatch, broken)
+
+    service.warm_up()
+    for _ in range(100):
+        if service.status()["state"] == "failed":
+            break
+        time.sleep(0.02)
+
+    resp = client.get("/readyz")
+    assert resp.status_code == 503
+    assert resp.get_json()["catalog"] == {"state": "failed", "error": "OSError: summaries unreadable"}
+    assert client.get("/healthz").status_code == 200
+
+
+def test_starting_the_app_defers_the_heavy_imports(tmp_path):
+    env = {**os.environ, "PYTHONPATH": REPO_DIR, "CATALOG_WARMUP": "0", "LOG_LEVEL": "WARNING",
+           "DATABASE_URL": f"sqlite:///{tmp_path / 'startup.sqlite3'}"}
+    script = f"import json, sys, main; print(json.dumps([m for m in {DEFERRED!r} if m in sys.modules]))"
+
+    proc = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env, capture_output=True, text=True,
+                          timeout=120)
+
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    assert json.loads(proc.stdout.splitlines()[-1]) == []
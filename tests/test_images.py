@@ -0,0 +1,128 @@
+# tests/test_images.py
+import os
+import threading
+import time
+
+import pytest
+
+from smart_librarian.database.media_store import LocalMediaStore
+from smart_librarian.models import images
+from smart_librarian.utils.cache import DiskLRUCache
+
+PNG = b"\x89PNG\r\n\x1a\n a cover"
+
+
+@pytest.fixture
+def image_env(tmp_path, monkeypatch):
+    cache = DiskLRUCache(str(tmp_path / "cache"), max_bytes=1024)
+    store = LocalMediaStore(root=str(tmp_path / "media"))
+    calls = []
+    monkeypatch.setattr(images, "_cache", cache)
+    monkeypatch.setattr(images, "get_media_store", lambda: store)
+    monkeypatch.setattr(images, "IMAGE_CACHE_POLICY", "reuse")
+    monkeypatch.setattr(images, "_generate", lambda text: calls.append(text) or PNG)
+    return cache, store, calls
+
+
+def _blob_files(root):
+    return [name for _, _, files in os.walk(root) for name in files
+            if not name.startswith("index.sqlite3")]
+
+
+def test_an_image_is_generated_once_per_title_set_and_stored_once(image_env, tmp_path):
+    cache, store, calls = image_env
+
+    first = images.generate_image("Bilbo and the dragon", ["The Hobbit"])
+    again = images.generate_image("A different reply", ["The Hobbit"])
+
+    assert first == again == PNG
+    assert calls == ["Bilbo and the dragon"]
+    assert store.read(store.media_id_for(PNG, "image/png")) == PNG
+    # the cache holds the media id, not a second copy of the PNG
+    (entry,) = _blob_files(tmp_path / "cache")
+    assert (tmp_path / "cache" / entry[:2] / entry).read_bytes() == store.media_id_for(PNG, "image/png").encode()
+    assert (cache.stats()["misses"], cache.stats()["hits"]) == (1, 1)
+
+
+def test_an_entry_whose_blob_is_gone_is_generated_again(image_env):
+    cache, store, calls = image_env
+    images.generate_image("Bilbo", ["The Hobbit"])
+    os.remove(store.local_path(store.media_id_for(PNG, "image/png")))
+
+    assert images.generate_image("Bilbo", ["The Hobbit"]) == PNG
+    assert len(calls) == 2
+
+
+def test_an_old_entry_holding_the_png_moves_to_the_media_store(image_env):
+    cache, store, calls = image_env
+    key = images.image_cache_key(["The Hobbit"])
+    cache.set(key, PNG)
+
+    assert images.generate_image("Bilbo", ["The Hobbit"]) == PNG
+    assert calls == []
+    assert cache.peek(key) == store.media_id_for(PNG, "image/png").encode()
+
+
+def test_concurrent_requests_for_one_book_share_a_single_generation(image_env, monkeypatch):
+    _, _, calls = image_env
+    release = threading.Event()
+
+    def slow_generate(text):
+        calls.append(text)
+        release.wait(5)
+        return PNG
+
+    monkeypatch.setattr(images, "_generate", slow_generate)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(images.generate_image("Bilbo", ["The Hobbit"])))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while not calls:
+        time.sleep(0.01)
+    time.sleep(0.05)   # let the other threads join the flight
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == [PNG] * 8
+    assert len(calls) == 1
+
+
+def test_the_key_ignores_title_order_and_changes_with_the_prompt_version(monkeypatch):
+    key = images.image_cache_key(["The Hobbit", "Dune"])
+
+    assert images.image_cache_key(["Dune", "The Hobbit", "Dune"]) == key
+    monkeypatch.setattr(images, "IMAGE_PROMPT_VERSION", "2")
+    assert images.image_cache_key(["Dune", "The Hobbit"]) != key
+
+
+def test_the_fresh_policy_always_generates(image_env, monkeypatch):
+    _, _, calls = image_env
+    monkeypatch.setattr(images, "IMAGE_CACHE_POLICY", "fresh")
+
+    images.generate_image("Bilbo", ["The Hobbit"])
+    images.generate_image("Bilbo", ["The Hobbit"])
+
+    assert len(calls) == 2
+
+
+def test_a_failed_generation_is_not_cached(image_env, monkeypatch):
+    cache, _, _ = image_env
+
+    def unavailable(text):
+        raise RuntimeError("rate limited")
+
+    monkeypatch.setattr(images, "_generate", unavailable)
+
+    assert images.generate_image("Bilbo", ["The Hobbit"]) is None
+    assert cache.peek(images.image_cache_key(["The Hobbit"])) is None
+
+
+def test_free_form_replies_are_not_cached(image_env):
+    _, _, calls = image_env
+
+    images.generate_image("A rainy library")
+    images.generate_image("A rainy library")
+
+    assert len(calls) == 2
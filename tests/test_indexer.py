@@ -0,0 +1,117 @@
+# tests/test_indexer.py
+from functools import partial
+
+import numpy as np
+import pytest
+
+from smart_librarian.models import indexer
+from smart_librarian.models.book_model import iter_documents
+from smart_librarian.models.indexer import embed_in_batches, sync_index
+
+BOOKS = [
+    ("The Hobbit", "Bilbo joins dwarves on a quest for treasure."),
+    ("Treasure Island", "A boy sails after pirate gold."),
+    ("Dune", "A desert planet and its spice."),
+]
+
+
+class CountingEmbeddings:
+    """Deterministic 8-dim vectors; records every batch it is asked to embed."""
+    model = "test-embedding"
+
+    def __init__(self):
+        self.batches = []
+
+    def _vector(self, text):
+        return np.random.default_rng(sum(map(ord, text))).standard_normal(8).tolist()
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+@pytest.fixture
+def embeddings(tmp_path, monkeypatch):
+    """A numpy index and manifest under tmp_path, embedded by CountingEmbeddings."""
+    fake = CountingEmbeddings()
+    manifest = str(tmp_path / "manifest.json")
+    monkeypatch.setattr(indexer, "get_embeddings", lambda: fake)
+    monkeypatch.setattr(indexer, "NUMPY_INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(indexer, "load_manifest", partial(indexer.load_manifest, path=manifest))
+    monkeypatch.setattr(indexer, "save_manifest", partial(indexer.save_manifest, path=manifest))
+    return fake
+
+
+def _sync(books, **kwargs):
+    return sync_index(iter_documents(books), backend="numpy", **kwargs)
+
+
+def _titles(store):
+    return sorted(doc.metadata["title"] for doc in store.docs)
+
+
+def test_first_sync_embeds_everything(embeddings):
+    result = _sync(BOOKS)
+
+    assert result.stats["rebuilt"] is True
+    assert result.stats["embedded"] == 3
+    assert _titles(result.vectorstore) == ["Dune", "The Hobbit", "Treasure Island"]
+
+
+def test_an_unchanged_catalog_embeds_nothing(embeddings):
+    _sync(BOOKS)
+    embeddings.batches.clear()
+
+    result = _sync(BOOKS)
+
+    assert embeddings.batches == []
+    assert (result.stats["embedded"], result.stats["removed"], result.stats["rebuilt"]) == (0, 0, False)
+    assert len(result.vectorstore.docs) == 3
+
+
+def test_only_changed_and_new_entries_are_embedded_and_removed_ones_dropped(embeddings):
+    _sync(BOOKS)
+    embeddings.batches.clear()
+    edited = [("The Hobbit", "Bilbo and thirteen dwarves."), BOOKS[1], ("Emma", "Matchmaking in Highbury.")]
+
+    result = _sync(edited)
+
+    assert sorted(t for batch in embeddings.batches for t in batch) == ["Bilbo and thirteen dwarves.",
+                                                                          "Matchmaking in Highbury."]
+    assert (result.stats["embedded"], result.stats["removed"]) == (2, 1)
+    assert _titles(result.vectorstore) == ["Emma", "The Hobbit", "Treasure Island"]
+    # the unchanged entry kept its vector
+    row = [doc.metadata["title"] for doc in result.vectorstore.docs].index("Treasure Island")
+    expected = np.asarray(embeddings._vector(BOOKS[1][1]))
+    assert np.allclose(result.vectorstore.dense()[row], expected / np.linalg.norm(expected), atol=1e-3)
+
+
+def test_another_embedding_model_rebuilds_the_index(embeddings):
+    _sync(BOOKS)
+    embeddings.model = "another-model"
+    embeddings.batches.clear()
+
+    result = _sync(BOOKS)
+
+    assert result.stats["rebuilt"] is True
+    assert result.stats["embedded"] == 3
+
+
+def test_full_re_embeds_everything(embeddings):
+    _sync(BOOKS)
+
+    assert _sync(BOOKS, full=True).stats["embedded"] == 3
+
+
+def test_embed_in_batches_keeps_order_across_concurrent_batches():
+    embeddings = CountingEmbeddings()
+    texts = [f"text {i}" for i in range(10)]
+
+    vectors = embed_in_batches(texts, embeddings, batch_size=3, concurrency=4)
+
+    assert sorted(len(batch) for batch in embeddings.batches) == [1, 3, 3, 3]
+    assert vectors == [embeddings._vector(t) for t in texts]
+    assert embed_in_batches([], embeddings) == []
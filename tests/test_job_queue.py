@@ -0,0 +1,88 @@
+# tests/test_job_queue.py
+import threading
+
+import pytest
+from sqlalchemy import func, update
+
+from smart_librarian.database.engine import SessionLocal
+from smart_librarian.database.job_db import MediaJob, MediaJobORM, init_job_db, JOB_DONE, JOB_QUEUED, JOB_RUNNING
+from smart_librarian.utils.job_queue import JobQueue
+
+
+@pytest.fixture
+def jobs(chat_db):
+    init_job_db()
+    return JobQueue(workers=1, maxsize=10)
+
+
+def test_waiting_on_a_job_finished_elsewhere_leaves_no_entry(jobs):
+    job = MediaJob.create("alice", 1, 2, "image", "a cover")
+    MediaJob.finish(job["id"], "/api/media/x.png")   # e.g. by another gunicorn worker
+
+    assert jobs.wait(job["id"], "alice", timeout=0.1)["status"] == JOB_DONE
+    assert jobs.wait("missing", "alice", timeout=0.1) is None
+    assert jobs.stats()["waiters"] == 0
+
+
+def test_waiters_are_woken_when_the_job_finishes_here(jobs):
+    jobs.register("image", lambda job: "/api/media/cover.png")
+    job = jobs.submit("alice", 1, 2, "image", "a cover")
+    results = []
+    waiters = [threading.Thread(target=lambda: results.append(jobs.wait(job["id"], "alice", timeout=5)))
+               for _ in range(2)]
+    for t in waiters:
+        t.start()
+
+    jobs._run(jobs._queue.get())
+    for t in waiters:
+        t.join(5)
+
+    assert [r["url"] for r in results] == ["/api/media/cover.png"] * 2
+    assert jobs.stats()["waiters"] == 0
+
+
+def test_sweeper_does_not_enqueue_a_queued_job_twice(jobs):
+    job = jobs.submit("alice", 1, 2, "tts", "hello")
+    for job_id in MediaJob.queued_ids(10, 3):   # what the sweeper does
+        jobs._enqueue(job_id)
+
+    assert jobs.stats()["queued_in_memory"] == 1
+
+
+def _age_job(job_id, seconds):
+    # updated_at as the database would have stamped it `seconds` ago, by its own clock
+    with SessionLocal() as s:
+        s.execute(update(MediaJobORM).where(MediaJobORM.id == job_id)
+                  .values(updated_at=func.datetime("now", f"-{seconds} seconds")))
+        s.commit()
+
+
+def test_requeue_stale_measures_the_lease_by_the_database_clock(jobs):
+    running = MediaJob.create("alice", 1, 2, "image", "a cover")
+    lost = MediaJob.create("alice", 1, 2, "tts", "hello")
+    for job in (running, lost):
+        MediaJob.claim(job["id"], 3)
+    _age_job(running["id"], 10)
+    _age_job(lost["id"], 120)
+
+    MediaJob.requeue_stale(lease_seconds=60, max_attempts=3)
+
+    assert MediaJob.get(running["id"])["status"] == JOB_RUNNING
+    assert MediaJob.get(lost["id"])["status"] == JOB_QUEUED
+
+
+def test_a_rerun_media_job_attaches_its_result_once(jobs, chat_db, monkeypatch):
+    from smart_librarian.api import message_api
+
+    conv_id = chat_db.Conversation.create_conversation("alice", "Chat")
+    seq = chat_db.Conversation.add_message("alice", conv_id, "assistant", "Here is the summary.")
+    urls = iter(["/api/media/first.mp3", "/api/media/second.mp3"])
+    monkeypatch.setattr(message_api, "synthesize_speech", lambda text: b"ID3 audio")
+    monkeypatch.setattr(message_api, "_store_media", lambda data, mime: next(urls))
+    job = {"id": "j1", "kind": "tts", "conv_id": conv_id, "message_seq": seq, "payload": "Here is the summary."}
+
+    message_api._run_media_job(job)
+    message_api._run_media_job(job)   # requeued while the first run was still going
+
+    (message,) = chat_db.Conversation.get_messages("alice", conv_id)
+    assert [m["url"] for m in message["media"]] == ["/api/media/first.mp3"]
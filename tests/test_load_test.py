@@ -0,0 +1,101 @@
+# tests/test_load_test.py
+import threading
+
+import numpy as np
+import pytest
+from openai import OpenAI
+
+from benchmarks import load_test
+from benchmarks.fake_openai import PNG_1X1, parse_latency, start_fake_openai
+from benchmarks.load_test import parse_mix, percentile, run_phase
+
+
+@pytest.fixture(scope="module")
+def fake():
+    """The fake OpenAI server with no latency, driven through the real SDK."""
+    server = start_fake_openai(port=0, latency={kind: 0.0 for kind in parse_latency("")}, token_delay=0.0,
+                               embedding_dim=8)
+    yield server, OpenAI(base_url=server.base_url, api_key="test", max_retries=0)
+    server.shutdown()
+    server.server_close()
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+
+    assert (percentile(values, 50), percentile(values, 95), percentile(values, 99)) == (50.0, 95.0, 99.0)
+    assert percentile([3.0], 99) == 3.0
+    assert percentile([], 50) is None
+
+
+def test_mix_and_latency_specs_are_validated():
+    assert parse_mix("send=5, list=1,open=0") == {"send": 5.0, "list": 1.0}
+    assert parse_latency("chat=1.5")["chat"] == 1.5
+    with pytest.raises(ValueError):
+        parse_mix("upload=1")
+    with pytest.raises(ValueError):
+        parse_latency("video=1")
+
+
+def test_streamed_chat_calls_the_tool_for_the_first_candidate(fake):
+    _, client = fake
+    stream = client.chat.completions.create(
+        model="gpt-4o-mini", stream=True, stream_options={"include_usage": True},
+        messages=[{"role": "system", "content": "Candidates:\n title: The Hobbit\n title: Dune"},
+                  {"role": "user", "content": "A quest?"}],
+        tools=[{"type": "function", "function": {"name": "get_summary_by_title", "parameters": {}}}],
+    )
+    text, arguments, usage = "", "", None
+    for chunk in stream:
+        usage = chunk.usage or usage
+        for choice in chunk.choices:
+            text += choice.delta.content or ""
+            for call in choice.delta.tool_calls or []:
+                arguments += call.function.arguments or ""
+
+    assert text.startswith("Here is a book")
+    assert arguments == '{"title": "The Hobbit"}'
+    assert usage.completion_tokens > 0
+
+
+def test_embeddings_are_deterministic_unit_vectors(fake):
+    _, client = fake
+
+    first = client.embeddings.create(model="text-embedding-3-small", input=["dune", "emma"]).data
+    again = client.embeddings.create(model="text-embedding-3-small", input="dune").data
+
+    assert len(first[0].embedding) == 8
+    assert np.isclose(np.linalg.norm(first[0].embedding), 1.0, atol=1e-5)
+    assert np.allclose(first[0].embedding, again[0].embedding)
+    assert not np.allclose(first[0].embedding, first[1].embedding)
+
+
+def test_moderation_images_and_speech(fake):
+    server, client = fake
+
+    assert client.moderations.create(input="you badword").results[0].flagged
+    assert not client.moderations.create(input="hello").results[0].flagged
+    assert client.images.generate(model="gpt-image-1", prompt="a hobbit").data[0].b64_json == PNG_1X1
+    assert client.audio.speech.create(model="tts-1", voice="alloy", input="hi").content == server.audio
+    assert server.counts["moderations"] >= 2
+
+
+def test_run_phase_reports_counts_errors_and_percentiles(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def ok(user):
+        with lock:
+            calls.append(user)
+        return 200, b""
+
+    monkeypatch.setattr(load_test, "ENDPOINTS", {"list": ok, "open": lambda user: (500, b"")})
+
+    phase = run_phase(["u1", "u2"], {"list": 1.0, "open": 1.0}, duration=0.2, concurrency=2)
+
+    listed, opened = phase["endpoints"]["list"], phase["endpoints"]["open"]
+    assert listed["requests"] == len(calls) > 0
+    assert listed["errors"] == 0
+    assert opened["errors"] == opened["requests"] > 0
+    assert listed["p50_ms"] <= listed["p99_ms"]
+    assert set(calls) == {"u1", "u2"}
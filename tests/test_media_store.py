@@ -0,0 +1,110 @@
+# tests/test_media_store.py
+import os
+
+import pytest
+
+from smart_librarian.api import media_api
+from smart_librarian.database.media_store import MediaStore, media_url
+from smart_librarian.utils.auth_guard import COOKIE_NAME
+
+
+class MemoryMediaStore(MediaStore):
+    """A backend that isn't file-based: served from read()."""
+
+    def __init__(self):
+        self.blobs = {}
+
+    def put(self, data, mime):
+        media_id = self.media_id_for(data, mime)
+        self.blobs.setdefault(media_id, data)
+        return media_id
+
+    def exists(self, media_id):
+        return media_id in self.blobs
+
+    def read(self, media_id):
+        return self.blobs.get(media_id)
+
+
+@pytest.fixture(params=["local", "memory"])
+def served_store(request, media_store, monkeypatch):
+    """The media endpoint's store: the local one, or one without local paths."""
+    store = media_store if request.param == "local" else MemoryMediaStore()
+    monkeypatch.setattr(media_api, "get_media_store", lambda: store)
+    return store
+
+
+def test_a_backend_missing_a_method_fails_at_construction():
+    class NoRead(MediaStore):
+        def put(self, data, mime):
+            return self.media_id_for(data, mime)
+
+        def exists(self, media_id):
+            return False
+
+    with pytest.raises(TypeError, match="read"):
+        NoRead()
+
+
+def test_identical_blobs_are_stored_once_under_their_hash(media_store):
+    first = media_store.put(b"\x89PNG data", "image/png")
+
+    assert media_store.put(b"\x89PNG data", "image/png") == first
+    assert first.endswith(".png") and len(first) == 64 + len(".png")
+    assert media_store.put(b"other", "image/png") != first
+    assert media_store.read(first) == b"\x89PNG data"
+    assert media_store.exists(first)
+    stored = [name for _, _, names in os.walk(media_store.root) for name in names]
+    assert sorted(stored) == sorted([first, media_store.media_id_for(b"other", "image/png")])   # no temp files
+
+
+def test_an_unknown_blob_reads_as_none(media_store):
+    missing = MediaStore.media_id_for(b"never stored", "audio/mpeg")
+
+    assert media_store.read(missing) is None
+    assert media_store.local_path(missing) is None
+    assert not media_store.exists(missing)
+
+
+def test_media_is_served_with_long_lived_caching_headers(client, served_store):
+    media_id = served_store.put(b"0123456789", "audio/mpeg")
+
+    resp = client.get(media_url(media_id))
+
+    assert resp.status_code == 200
+    assert resp.data == b"0123456789"
+    assert resp.mimetype == "audio/mpeg"
+    assert resp.headers["Accept-Ranges"] == "bytes"
+    assert "immutable" in resp.headers["Cache-Control"]
+    assert resp.headers["ETag"] == f'"{media_id.split(".")[0]}"'
+
+
+def test_media_range_requests_get_partial_content(client, served_store):
+    media_id = served_store.put(b"0123456789", "audio/mpeg")
+
+    resp = client.get(media_url(media_id), headers={"Range": "bytes=2-5"})
+
+    assert resp.status_code == 206
+    assert resp.data == b"2345"
+    assert resp.headers["Content-Range"] == "bytes 2-5/10"
+
+
+def test_media_revalidation_returns_304(client, served_store):
+    media_id = served_store.put(b"0123456789", "audio/mpeg")
+    etag = client.get(media_url(media_id)).headers["ETag"]
+
+    resp = client.get(media_url(media_id), headers={"If-None-Match": etag})
+
+    assert resp.status_code == 304
+    assert resp.data == b""
+
+
+def test_media_endpoint_rejects_bad_ids_missing_blobs_and_anonymous_users(client, served_store):
+    missing = MediaStore.media_id_for(b"never stored", "image/png")
+
+    assert client.get(media_url("not-a-media-id.png")).status_code == 404
+    assert client.get(media_url(missing)).status_code == 404
+
+    media_id = served_store.put(b"private", "image/png")
+    client.delete_cookie(COOKIE_NAME)
+    assert client.get(media_url(media_id)).status_code == 401
@@ -0,0 +1,101 @@
+# tests/test_metrics.py
+import json
+import logging
+
+import pytest
+
+from smart_librarian.utils import metrics
+from smart_librarian.utils.log import JsonFormatter, TextFormatter
+from smart_librarian.utils.metrics import Registry, RequestTrace, _trace, record, timed
+from smart_librarian.utils.stages import run_async, wait_for
+
+
+def test_histogram_renders_cumulative_buckets_sum_and_count():
+    registry = Registry()
+    histogram = registry.histogram("t_seconds", "Test.", ("stage",), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, stage="llm")
+
+    lines = registry.render().splitlines()
+
+    assert lines[:2] == ["# HELP t_seconds Test.", "# TYPE t_seconds histogram"]
+    assert 't_seconds_bucket{stage="llm",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{stage="llm",le="1"} 2' in lines
+    assert 't_seconds_bucket{stage="llm",le="+Inf"} 3' in lines
+    assert 't_seconds_sum{stage="llm"} 5.550000' in lines
+    assert 't_seconds_count{stage="llm"} 3' in lines
+
+
+def test_counter_and_gauge_render_their_labels_escaped():
+    registry = Registry()
+    registry.counter("t_total", "Test.", ("path",)).inc(2, path='a"b')
+    registry.gauge("t_pool", "Test.", ("state",)).track(lambda: {("idle",): 3})
+
+    text = registry.render()
+
+    assert 't_total{path="a\\"b"} 2' in text
+    assert 't_pool{state="idle"} 3' in text
+
+
+def test_timed_counts_errors_and_still_records_the_duration():
+    errors_before = metrics.STAGE_ERRORS._values.get(("test_stage",), 0)
+
+    with pytest.raises(ValueError):
+        with timed("test_stage"):
+            raise ValueError("boom")
+
+    assert metrics.STAGE_ERRORS._values[("test_stage",)] == errors_before + 1
+    assert "librarian_stage_duration_seconds_count{stage=\"test_stage\"}" in metrics.REGISTRY.render()
+
+
+def test_stages_on_the_shared_pool_are_attributed_to_the_request_trace():
+    trace = RequestTrace()
+    token = _trace.set(trace)
+    try:
+        wait_for(run_async(record, "retrieval", 0.25), "db")
+        record("db", 0.01)
+        record("db", 0.02)
+    finally:
+        _trace.reset(token)
+
+    header = trace.server_timing(0.5)
+
+    assert header == 'retrieval;dur=250.0, db;dur=30.0;desc="2 calls", total;dur=500.0'
+    assert trace.as_fields() == {"retrieval": 250.0, "db": 30.0}
+
+
+def test_responses_carry_server_timing_and_show_up_on_metrics(client, chat_db):
+    resp = client.get("/api/list")
+
+    assert "db;dur=" in resp.headers["Server-Timing"]
+    assert "total;dur=" in resp.headers["Server-Timing"]
+    scrape = client.get("/metrics")
+    assert scrape.mimetype == "text/plain"
+    assert "Server-Timing" not in scrape.headers
+    assert ('librarian_http_request_duration_seconds_count{endpoint="/api/list",method="GET",status="200"}'
+            in scrape.get_data(as_text=True))
+
+
+def test_metrics_token_is_required_when_set(client, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "s3cret")
+
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+
+
+def _record(**fields):
+    record = logging.LogRecord("smart_librarian.test", logging.INFO, __file__, 1, "request", (), None)
+    record.__dict__.update(fields)
+    return record
+
+
+def test_json_logs_are_one_object_with_the_extra_fields():
+    line = JsonFormatter().format(_record(status=200, stages={"db": 1.5}))
+
+    out = json.loads(line)
+    assert (out["level"], out["logger"], out["msg"]) == ("info", "smart_librarian.test", "request")
+    assert (out["status"], out["stages"]) == (200, {"db": 1.5})
+
+
+def test_text_logs_append_the_extra_fields_as_key_value():
+    assert TextFormatter().format(_record(status=200)).endswith("INFO smart_librarian.test request status=200")
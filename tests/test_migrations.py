@@ -0,0 +1,96 @@
+# tests/test_migrations.py
+import base64
+
+from smart_librarian.database.migrations import (
+    backfill_message_text, migrate_inline_media, migrate_messages_table,
+)
+
+PNG = b"\x89PNG\r\n\x1a\n fake image bytes"
+
+
+def _legacy_conversation(chat_db, messages):
+    with chat_db.SessionLocal() as s:
+        conv = chat_db.ConversationORM(username="alice", title="Legacy", messages=messages)
+        s.add(conv)
+        s.commit()
+        return conv.id
+
+
+def test_readme_order_keeps_inline_images(chat_db, media_store):
+    inline = base64.b64encode(PNG).decode("ascii")
+    conv_id = _legacy_conversation(chat_db, [
+        {"role": "user", "content": "Recommend a book about friendship"},
+        {"role": "assistant", "content": f'Try The Hobbit.<image type="image/png">{inline}</image>'},
+    ])
+
+    # README order: migrate-messages, migrate-media, backfill-messages
+    moved = migrate_messages_table()
+    migrate_inline_media()
+    backfill_message_text()
+
+    assert moved["conversations"] == 1 and moved["messages"] == 2
+    messages = chat_db.Conversation.get_messages("alice", conv_id)
+    assert [m["seq"] for m in messages] == [1, 2]
+    reply = messages[1]
+    assert reply["text"] == "Try The Hobbit."
+    assert len(reply["media"]) == 1
+    media = reply["media"][0]
+    assert media["kind"] == "image" and media["mime"] == "image/png"
+    assert media_store.read(media["url"].rsplit("/", 1)[1]) == PNG
+    assert inline not in reply["text"]
+
+
+def test_migrate_media_recomputes_rows_already_in_the_messages_table(chat_db, media_store):
+    # A row copied by an older migrate-messages: derived columns computed while the blob was inline
+    inline = base64.b64encode(PNG).decode("ascii")
+    conv_id = chat_db.Conversation.create_conversation("alice", "Chat")
+    seq = chat_db.Conversation.add_message("alice", conv_id, "assistant",
+                                           f'Here.<image type="image/png">{inline}</image>')
+    assert chat_db.Conversation.get_messages("alice", conv_id)[0]["media"] == []
+
+    stats = migrate_inline_media()
+
+    assert stats["message_rows"] == 1 and stats["blobs"] == 1
+    (message,) = chat_db.Conversation.get_messages("alice", conv_id)
+    assert message["seq"] == seq
+    assert [m["kind"] for m in message["media"]] == ["image"]
+    assert backfill_message_text()["messages"] == 0
+
+
+def test_migrations_are_idempotent(chat_db, media_store):
+    inline = base64.b64encode(PNG).decode("ascii")
+    conv_id = _legacy_conversation(chat_db, [{"role": "assistant", "content": f"<image>{inline}</image>"}])
+
+    migrate_messages_table()
+    first = chat_db.Conversation.get_messages("alice", conv_id)
+    again = migrate_messages_table()
+    media = migrate_inline_media()
+
+    assert again["conversations"] == 0
+    assert media["blobs"] == 0
+    assert chat_db.Conversation.get_messages("alice", conv_id) == first
+
+
+def test_messages_sent_before_the_migration_follow_the_legacy_history(chat_db, media_store):
+    conv_id = _legacy_conversation(chat_db, [
+        {"role": "user", "content": "Recommend a book about friendship"},
+        {"role": "assistant", "content": "Try The Hobbit."},
+    ])
+    # Deployed before migrate-messages ran: new turns already went to the messages table
+    chat_db.Conversation.add_message("alice", conv_id, "user", "Something shorter?")
+    chat_db.Conversation.add_message("alice", conv_id, "assistant", "Try Of Mice and Men.")
+    chat_db.Conversation.set_summary(conv_id, "Asked for shorter books.", 2, 0)
+
+    stats = migrate_messages_table()
+
+    assert stats == {"conversations": 1, "messages": 2, "blobs": 0, "shifted": 1}
+    messages = chat_db.Conversation.get_messages("alice", conv_id, limit=None)
+    assert [(m["seq"], m["text"]) for m in messages] == [
+        (1, "Recommend a book about friendship"), (2, "Try The Hobbit."),
+        (3, "Something shorter?"), (4, "Try Of Mice and Men."),
+    ]
+    conv = chat_db.Conversation.get_conversation("alice", conv_id)
+    assert conv["last_seq"] == 4
+    assert conv["summary"] is None and conv["summary_seq"] == 0
+    assert chat_db.Conversation.add_message("alice", conv_id, "user", "Thanks") == 5
+    assert migrate_messages_table()["conversations"] == 0
@@ -0,0 +1,52 @@
+# tests/test_moderation.py
+import re
+from types import SimpleNamespace
+
+from smart_librarian.models.moderation import Moderator
+
+
+class FakeClient:
+    def __init__(self, flagged=False, error=None):
+        self.calls = 0
+        self.flagged = flagged
+        self.error = error
+        self.moderations = SimpleNamespace(create=self._create)
+
+    def _create(self, model, input):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return SimpleNamespace(results=[SimpleNamespace(flagged=self.flagged, categories={"harassment": self.flagged})])
+
+
+def test_verdicts_are_cached_by_normalized_message():
+    client = FakeClient(flagged=True)
+    moderator = Moderator()
+
+    first = moderator.check(client, "Some  Message")
+    again = moderator.check(client, "some message")
+
+    assert (first.flagged, first.source) == (True, "api")
+    assert (again.flagged, again.source) == (True, "cache")
+    assert client.calls == 1
+
+
+def test_blocklist_flags_without_calling_the_api():
+    client = FakeClient()
+    moderator = Moderator(blocklist=re.compile(r"\bbadword\b", re.IGNORECASE))
+
+    result = moderator.check(client, "this has a BADWORD in it")
+
+    assert (result.flagged, result.source) == (True, "prefilter")
+    assert client.calls == 0
+
+
+def test_api_errors_use_the_fail_mode_and_are_not_cached(monkeypatch):
+    from smart_librarian.models import moderation
+    monkeypatch.setattr(moderation, "MODERATION_FAIL", "closed")
+    client = FakeClient(error=RuntimeError("down"))
+    moderator = Moderator()
+
+    assert moderator.check(client, "hello").flagged is True
+    assert moderator.check(client, "hello").source == "failed"
+    assert client.calls == 2
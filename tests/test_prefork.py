@@ -0,0 +1,79 @@
+# tests/test_prefork.py
+import json
+import os
+import runpy
+from types import SimpleNamespace
+
+import pytest
+
+from smart_librarian.database import engine as db_engine
+from smart_librarian.models import catalog
+from smart_librarian.models.catalog import CatalogData, CatalogService
+from smart_librarian.utils import openai_client, stages
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def gunicorn_conf(monkeypatch):
+    monkeypatch.setenv("SERVER_PREFORK", "0")   # the config sets it; restored afterwards
+    monkeypatch.setenv("WEB_WORKERS", "3")
+    monkeypatch.setenv("WEB_THREADS", "8")
+    return runpy.run_path(os.path.join(REPO_DIR, "gunicorn.conf.py"))
+
+
+def test_gunicorn_preloads_the_app_and_sizes_threaded_workers(gunicorn_conf):
+    assert gunicorn_conf["preload_app"] is True
+    assert gunicorn_conf["wsgi_app"] == "wsgi:app"
+    assert (gunicorn_conf["worker_class"], gunicorn_conf["workers"], gunicorn_conf["threads"]) == ("gthread", 3, 8)
+    assert gunicorn_conf["graceful_timeout"] > stages.STAGE_TIMEOUTS["image"]
+    assert os.environ["SERVER_PREFORK"] == "1"
+
+
+def test_sighup_reloads_the_catalog_and_keeps_it_when_the_reload_fails(gunicorn_conf, monkeypatch):
+    reloads, logged = [], []
+    server = SimpleNamespace(log=SimpleNamespace(exception=logged.append))
+    monkeypatch.setattr(catalog, "get_catalog", lambda: SimpleNamespace(reload=lambda: reloads.append(1)))
+
+    gunicorn_conf["on_reload"](server)
+    assert (reloads, logged) == ([1], [])
+
+    def broken():
+        raise OSError("summaries unreadable")
+
+    monkeypatch.setattr(catalog, "get_catalog", lambda: SimpleNamespace(reload=broken))
+    gunicorn_conf["on_reload"](server)   # must not raise: gunicorn would stop reloading
+    assert logged == ["catalog reload failed; keeping the current catalog"]
+
+
+def test_a_forked_worker_keeps_the_catalog_and_recreates_what_cannot_cross_a_fork(monkeypatch):
+    service = CatalogService(sources=["unused.txt"])
+    service._install(CatalogData(None, ["The Hobbit"], None, None, None, object()), {})
+    monkeypatch.setattr(catalog, "_catalog", service)
+    monkeypatch.setattr(CatalogService, "FORK_SAFE_VECTORS", False)   # as with Chroma
+    monkeypatch.setattr(openai_client, "_client", object())
+    parent_executor, parent_pool = stages._executor, db_engine.engine.pool
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:   # worker
+        try:
+            os.close(read_fd)
+            seen = {
+                "titles": catalog._catalog._data.titles,
+                "vectorstore_dropped": catalog._catalog._data.vectorstore is None,
+                "new_openai_client": openai_client._client is None,
+                "new_stage_pool": stages._executor is not parent_executor,
+                "new_db_pool": db_engine.engine.pool is not parent_pool,
+            }
+            os.write(write_fd, json.dumps(seen).encode())
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd, "rb") as pipe:
+        seen = json.loads(pipe.read() or b"{}")
+    os.waitpid(pid, 0)
+
+    assert seen == {"titles": ["The Hobbit"], "vectorstore_dropped": True, "new_openai_client": True,
+                    "new_stage_pool": True, "new_db_pool": True}
+    assert service._data.vectorstore is not None   # the master keeps its own
@@ -0,0 +1,74 @@
+# tests/test_router.py
+from smart_librarian.router import Router, _ControllerEntry
+
+
+class EchoController:
+    def __init__(self):
+        self.calls = 0
+
+    def echo(self, *params):
+        self.calls += 1
+        return "/".join(params)
+
+    def _helper(self):
+        return "private"
+
+
+def _router_with_echo(**kwargs):
+    router = Router(**kwargs)
+    instance = EchoController()
+    router._controllers["echo"] = _ControllerEntry(None, instance, Router._build_actions(instance), 0)
+    return router, instance
+
+
+def test_controller_is_resolved_once_and_reused():
+    router = Router()
+
+    first = router.get_controller("auth")
+
+    assert first is not None
+    assert router.get_controller("auth") is first
+    assert {"index", "login", "register"} <= set(first.actions)
+
+
+def test_preload_resolves_every_controller():
+    router = Router()
+
+    router.preload()
+
+    assert {"auth", "home"} <= set(router._controllers)
+
+
+def test_action_table_skips_private_names():
+    assert set(Router._build_actions(EchoController())) == {"echo"}
+
+
+def test_route_dispatches_through_the_cached_instance():
+    router, instance = _router_with_echo()
+
+    assert router.route("/echo/echo/a/b") == "a/b"
+    assert router.route("/echo/api/echo/42") == "42"
+    assert instance.calls == 2
+
+
+def test_route_reports_unknown_controllers_and_actions():
+    router, _ = _router_with_echo()
+
+    assert router.route("/nosuch/index")[1] == 404
+    assert router.route("/../etc/index")[1] == 404
+    assert router.route("/echo/_helper") == ("Error: Action '_helper' not found in EchoController", 404)
+    assert router.route("/echo/api")[1] == 404
+
+
+def test_hot_reload_only_reloads_a_changed_file():
+    router = Router(hot_reload=True)
+    entry = router.get_controller("auth")
+
+    assert router.get_controller("auth") is entry      # file unchanged
+
+    entry.mtime = 0                                     # as if the file was edited since
+    reloaded = router.get_controller("auth")
+
+    assert reloaded is not entry
+    assert reloaded.instance is not entry.instance
+    assert router.get_controller("auth") is reloaded
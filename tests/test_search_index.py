@@ -0,0 +1,69 @@
+# tests/test_search_index.py
+import pytest
+
+from smart_librarian.models.search_index import (
+    BM25Index, ThemeIndex, parse_themes, reciprocal_rank_fusion, tokenize,
+)
+
+SUMMARIES = [
+    ("The Hobbit", "Bilbo joins dwarves on a quest for treasure. Themes: adventure, courage, friendship."),
+    ("1984", "A totalitarian state watches everyone. Themes: control, freedom, ideology."),
+    ("Charlotte's Web", "A pig and a spider become friends. Themes: friendship, loyalty, coming of age."),
+]
+
+
+def test_parse_themes_normalizes_and_dedupes():
+    assert parse_themes("Story. Themes: Adventure, courage , adventure.") == ["adventure", "courage"]
+    assert parse_themes("No themes line here") == []
+
+
+def test_tokenize_drops_stopwords():
+    assert tokenize("The quest of the Dwarves") == ["quest", "dwarves"]
+
+
+def test_bm25_ranks_matching_documents_first():
+    index = BM25Index(f"{title} {summary}" for title, summary in SUMMARIES)
+
+    hits = index.search("dwarves treasure quest")
+
+    assert hits[0][0] == 0
+    assert all(score > 0 for _, score in hits)
+    assert index.search("nothing matches zzz") == []
+
+
+def test_bm25_rarer_terms_weigh_more():
+    index = BM25Index(["spider pig", "pig farm", "pig market"])
+
+    hits = dict(index.search("spider pig"))
+
+    assert max(hits, key=hits.get) == 0
+
+
+def test_bm25_respects_k():
+    index = BM25Index(["pig"] * 5)
+    assert len(index.search("pig", k=2)) == 2
+    assert len(index.search("pig", k=None)) == 5
+
+
+def test_theme_index_answers_pure_theme_queries():
+    index = ThemeIndex(SUMMARIES)
+
+    assert index.query_themes("recommend me books about friendship") == ["friendship"]
+    assert index.query_themes("coming of age and loyalty") == ["coming of age", "loyalty"]
+    assert index.query_themes("friendship on the moon") is None     # "moon" is not a theme or filler
+    assert index.query_themes("") is None
+    assert index.titles_for("Friendship") == ["The Hobbit", "Charlotte's Web"]
+    assert index.themes()[0] == ("friendship", ["The Hobbit", "Charlotte's Web"])
+
+
+def test_rrf_rewards_agreement_between_rankings():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c", "a"]], k=60)
+
+    assert [key for key, _ in fused] == ["b", "a", "c"]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+
+
+def test_rrf_keeps_keys_found_by_one_ranking():
+    fused = dict(reciprocal_rank_fusion([["a"], ["b", "a"]], k=1))
+
+    assert fused == {"a": pytest.approx(1 / 2 + 1 / 3), "b": pytest.approx(1 / 2)}
@@ -0,0 +1,267 @@
+# tests/test_send_api.py
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from smart_librarian.api import message_api
+from smart_librarian.models.catalog import Retrieval
+from smart_librarian.utils import stages
+
+
+@pytest.fixture
+def offline_send(monkeypatch):
+    """Stub the network stages of /api/send; returns the list of LLM replies to serve (exceptions raise)."""
+    replies = []
+
+    def complete(messages, cancel=None, usage=None):
+        reply = replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply, []
+
+    monkeypatch.setattr(message_api, "_moderate", lambda text: False)
+    monkeypatch.setattr(message_api, "_retrieve_candidates", lambda text: Retrieval([("The Hobbit", 0.9)], None))
+    monkeypatch.setattr(message_api, "_complete_chat", complete)
+    return replies
+
+
+def _stored(chat_db, conv_id):
+    return [(m["role"], m["text"]) for m in chat_db.Conversation.get_messages("alice", conv_id, limit=None)]
+
+
+def test_a_failed_llm_call_stores_nothing_and_the_retry_stores_the_turn_once(client, chat_db, offline_send):
+    conv_id = chat_db.Conversation.create_conversation("alice", "New chat")
+    offline_send.extend([RuntimeError("upstream timeout"), "Try The Hobbit."])
+    body = {"conv_id": conv_id, "message": "A book about a quest?"}
+
+    assert client.post("/api/send", json=body).status_code == 500
+    assert _stored(chat_db, conv_id) == []
+
+    resp = client.post("/api/send", json=body)   # the client's resend
+
+    assert resp.status_code == 200
+    assert _stored(chat_db, conv_id) == [("user", "A book about a quest?"), ("assistant", "Try The Hobbit.")]
+    assert resp.get_json()["conv"]["title"] == "A book about a quest?"
+
+
+def test_a_timed_out_llm_call_stores_nothing(client, chat_db, offline_send, monkeypatch):
+    conv_id = chat_db.Conversation.create_conversation("alice", "New chat")
+
+    def timed_out(future, stage, default=message_api.StageTimeout):
+        if stage == "llm":
+            raise message_api.StageTimeout(stage)
+        return future.result()
+
+    monkeypatch.setattr(message_api, "wait_for", timed_out)
+    offline_send.append("never read")
+
+    resp = client.post("/api/send", json={"conv_id": conv_id, "message": "Anything?"})
+
+    assert resp.status_code == 503
+    assert _stored(chat_db, conv_id) == []
+    assert chat_db.Conversation.get_conversation("alice", conv_id)["title"] == "New chat"
+
+
+def test_a_failed_stream_stores_nothing(client, chat_db, offline_send, monkeypatch):
+    conv_id = chat_db.Conversation.create_conversation("alice", "New chat")
+
+    def unavailable(messages):
+        raise RuntimeError("upstream down")
+
+    monkeypatch.setattr(message_api, "_stream_chat", unavailable)
+
+    body = client.post("/api/send/stream", json={"conv_id": conv_id, "message": "Anything?"}).get_data(as_text=True)
+
+    assert "event: error" in body and "event: done" not in body
+    assert _stored(chat_db, conv_id) == []
+
+
+# -------- streaming --------
+
+class FakeStream:
+    """A streamed completion: content deltas, then one tool call, then the usage chunk."""
+
+    def __init__(self, tokens, tool_call=None):
+        self.chunks = [self._chunk(content=token) for token in tokens]
+        if tool_call:
+            function = SimpleNamespace(name=tool_call[0], arguments=tool_call[1])
+            self.chunks.append(self._chunk(tool_calls=[SimpleNamespace(index=0, function=function)]))
+        self.chunks.append(SimpleNamespace(choices=[], usage=SimpleNamespace(prompt_tokens=12, completion_tokens=3)))
+        self.closed = False
+
+    @staticmethod
+    def _chunk(content=None, tool_calls=None):
+        delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+        return SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+
+def _events(body):
+    """[(event, payload)] of an SSE body."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        name, data = block.split("\n", 1)
+        events.append((name[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+@pytest.fixture
+def streamed(offline_send, monkeypatch):
+    """Serve FakeStream(tokens, tool_call) from the LLM, with stubbed tool, image and TTS stages."""
+    stream = FakeStream(["Try ", "The Hobbit."], ("get_summary_by_title", '{"title": "the hobbit"}'))
+    monkeypatch.setattr(message_api, "_stream_chat", lambda messages: stream)
+    monkeypatch.setattr(message_api, "_resolve_tool_call", lambda name, args: ("The Hobbit", "Bilbo's quest."))
+    monkeypatch.setattr(message_api, "generate_image", lambda text, titles: b"png")
+    monkeypatch.setattr(message_api, "synthesize_speech", lambda text: b"mp3")
+    monkeypatch.setattr(message_api, "_store_media",
+                        lambda data, mime: f"/api/media/{data.decode()}")
+    return stream
+
+
+def test_stream_emits_tokens_then_summary_then_media_then_done(client, chat_db, streamed):
+    conv_id = chat_db.Conversation.create_conversation("alice", "New chat")
+
+    resp = client.post("/api/send/stream", json={"conv_id": conv_id, "message": "A quest?",
+                                                 "image_enable": True, "tts_enable": True})
+    events = _events(resp.get_data(as_text=True))
+    names = [name for name, _ in events]
+
+    assert resp.mimetype == "text/event-stream"
+    assert names[:4] == ["meta", "token", "token", "summary"]
+    assert sorted(names[4:6]) == ["audio", "image"]    # whichever is ready first
+    assert names[6:] == ["done"]
+    assert [p["text"] for name, p in events if name == "token"] == ["Try ", "The Hobbit."]
+    assert dict(events)["summary"] == {"title": "The Hobbit", "text": "Bilbo's quest."}
+    assert dict(events)["image"]["url"] == "/api/media/png"
+    assert dict(events)["done"]["persisted"] is True
+    assert dict(events)["done"]["usage"]["completion_tokens"] == 3
+    assert streamed.closed
+
+
+def test_stream_persists_the_final_message_with_its_media_at_the_end(client, chat_db, streamed):
+    conv_id = chat_db.Conversation.create_conversation("alice", "New chat")
+
+    body = client.post("/api/send/stream", json={"conv_id": conv_id, "message": "A quest?", "image_enable": True,
+                                                 "tts_enable": True, "after_seq": 0}).get_data(as_text=True)
+
+    stored = chat_db.Conversation.get_messages("alice", conv_id, limit=None)
+    assert [m["role"] for m in stored] == ["user", "assistant"]
+    assert stored[1]["text"].startswith("Try The Hobbit.")
+    assert "Bilbo's quest." in stored[1]["text"]
+    assert [m["url"] for m in stored[1]["media"]] == ["/api/media/png", "/api/media/mp3"]   # image first
+    assert dict(_events(body))["done"]["messages"] == stored
+
+
+def test_a_flagged_stream_sends_no_tokens_and_stores_nothing(client, chat_db, streamed, monkeypatch):
+    conv_id = chat_db.Conversation.create_conversation("alice", "New chat")
+    monkeypatch.setattr(message_api, "_moderate", lambda text: True)
+
+    events = _events(client.post("/api/send/stream", json={"conv_id": conv_id, "message": "rude"})
+                     .get_data(as_text=True))
+
+    assert [name for name, _ in events] == ["meta", "profanity", "done"]
+    assert dict(events)["done"]["persisted"] is False
+    assert _stored(chat_db, conv_id) == []
+
+
+def test_send_with_a_cursor_returns_only_this_turn(client, chat_db, offline_send):
+    conv_id = chat_db.Conversation.create_conversation("alice", "New chat")
+    chat_db.Conversation.add_turn("alice", conv_id, [("user", "Hi"), ("assistant", "Hello!")])
+    offline_send.append("Try The Hobbit.")
+
+    body = client.post("/api/send", json={"conv_id": conv_id, "message": "A quest?", "after_seq": 2}).get_json()
+
+    assert body["delta"] is True
+    assert [(m["seq"], m["text"]) for m in body["messages"]] == [(3, "A quest?"), (4, "Try The Hobbit.")]
+
+
+# -------- concurrent stages --------
+
+def test_moderation_and_retrieval_run_side_by_side(client, chat_db, offline_send, monkeypatch):
+    both_started = threading.Barrier(2, timeout=5)   # broken if the stages run one after the other
+
+    def moderate(text):
+        both_started.wait()
+        return False
+
+    def retrieve(text):
+        both_started.wait()
+        return Retrieval([], None)
+
+    monkeypatch.setattr(message_api, "_moderate", moderate)
+    monkeypatch.setattr(message_api, "_retrieve_candidates", retrieve)
+    offline_send.append("Try The Hobbit.")
+
+    assert client.post("/api/send", json={"message": "A quest?"}).status_code == 200
+
+
+def test_a_flagged_message_cancels_the_llm_call_already_in_flight(client, chat_db, offline_send, monkeypatch):
+    conv_id = chat_db.Conversation.create_conversation("alice", "New chat")
+    llm_started, llm_finished, cancelled = threading.Event(), threading.Event(), []
+
+    def complete(messages, cancel=None, usage=None):
+        llm_started.set()
+        cancelled.append(cancel.wait(5))
+        llm_finished.set()
+        return "", []
+
+    def moderate(text):
+        llm_started.wait(5)   # flagged only once the speculative LLM call is running
+        return True
+
+    monkeypatch.setattr(message_api, "_complete_chat", complete)
+    monkeypatch.setattr(message_api, "_moderate", moderate)
+
+    body = client.post("/api/send", json={"conv_id": conv_id, "message": "rude"}).get_json()
+
+    assert body["profanity_warning"] == message_api.PROFANITY_WARNING
+    assert body["ephemeral_user_message"] == "rude"
+    assert llm_finished.wait(5)
+    assert cancelled == [True]
+    assert _stored(chat_db, conv_id) == []
+
+
+def test_image_and_tts_run_side_by_side(client, chat_db, offline_send, monkeypatch):
+    both_started = threading.Barrier(2, timeout=5)
+
+    def generate_image(text, titles):
+        both_started.wait()
+        return b"png"
+
+    def synthesize_speech(text):
+        both_started.wait()
+        return b"mp3"
+
+    monkeypatch.setattr(message_api, "MEDIA_JOBS", False)
+    monkeypatch.setattr(message_api, "generate_image", generate_image)
+    monkeypatch.setattr(message_api, "synthesize_speech", synthesize_speech)
+    monkeypatch.setattr(message_api, "_store_media", lambda data, mime: f"/api/media/{data.decode()}")
+    offline_send.append("Try The Hobbit.")
+
+    body = client.post("/api/send", json={"message": "A quest?", "image_enable": True,
+                                          "tts_enable": True}).get_json()
+
+    assert body["tts"]["url"] == "/api/media/mp3"
+    assert [m["url"] for m in body["messages"][-1]["media"]] == ["/api/media/png", "/api/media/mp3"]
+
+
+def test_a_moderation_timeout_falls_back_to_the_configured_policy(client, chat_db, offline_send, monkeypatch):
+    conv_id = chat_db.Conversation.create_conversation("alice", "New chat")
+    release = threading.Event()
+    monkeypatch.setitem(stages.STAGE_TIMEOUTS, "moderation", 0.05)
+    monkeypatch.setattr(message_api, "_moderate", lambda text: release.wait(5))
+    monkeypatch.setattr(message_api, "fails_closed", lambda: True)
+    offline_send.append("never sent")
+
+    body = client.post("/api/send", json={"conv_id": conv_id, "message": "Anything?"}).get_json()
+    release.set()
+
+    assert body["profanity_warning"] == message_api.PROFANITY_WARNING
+    assert _stored(chat_db, conv_id) == []
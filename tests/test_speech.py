@@ -0,0 +1,17 @@
+# tests/test_speech.py
+from smart_librarian.models import speech
+from smart_librarian.utils.cache import DiskLRUCache
+
+
+def test_one_synthesis_counts_one_miss_then_hits(tmp_path, monkeypatch):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=1024)
+    calls = []
+    monkeypatch.setattr(speech, "_cache", cache)
+    monkeypatch.setattr(speech, "_synthesize", lambda text: calls.append(text) or b"ID3 " + text.encode())
+
+    first = speech.synthesize_speech("Bilbo joins the dwarves.")
+    again = speech.synthesize_speech("Bilbo joins the dwarves.")
+
+    assert first == again == b"ID3 Bilbo joins the dwarves."
+    assert calls == ["Bilbo joins the dwarves."]
+    assert (cache.stats()["misses"], cache.stats()["hits"]) == (1, 1)
@@ -0,0 +1,31 @@
+# tests/test_stages.py
+import threading
+
+import pytest
+
+from smart_librarian.utils import stages
+from smart_librarian.utils.stages import StageTimeout, completed, run_async, wait_for
+
+
+def test_wait_for_returns_the_stage_result():
+    assert wait_for(run_async(lambda a, b: a + b, 2, b=3), "db") == 5
+    assert wait_for(completed("cached"), "llm") == "cached"
+
+
+def test_a_slow_stage_raises_stage_timeout_or_returns_the_default(monkeypatch):
+    monkeypatch.setitem(stages.STAGE_TIMEOUTS, "tts", 0.05)
+    release = threading.Event()
+
+    with pytest.raises(StageTimeout) as exc:
+        wait_for(run_async(release.wait, 5), "tts")
+    assert exc.value.stage == "tts"
+    assert wait_for(run_async(release.wait, 5), "tts", default=None) is None
+    release.set()
+
+
+def test_stage_errors_propagate():
+    def fail():
+        raise ValueError("bad input")
+
+    with pytest.raises(ValueError):
+        wait_for(run_async(fail), "db")
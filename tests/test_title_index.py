@@ -0,0 +1,55 @@
+# tests/test_title_index.py
+from smart_librarian.models.book_model import TitleIndex, normalize_title
+
+TITLES = ["Harry Potter and the Sorcerer's Stone", "The Hobbit", "1984", "To Kill a Mockingbird",
+          "Of Mice and Men", "It"]
+
+
+def test_normalize_title_folds_case_quotes_and_punctuation():
+    assert normalize_title("Harry Potter and the Sorcerer’s Stone") == "harry potter and the sorcerers stone"
+    assert normalize_title("  THE   Hobbit!! ") == "the hobbit"
+    assert normalize_title("To Kill a Mockingbird: A Novel") == "to kill a mockingbird a novel"
+    assert normalize_title("") == ""
+
+
+def test_smart_quotes_and_punctuation_resolve_exactly():
+    index = TitleIndex(TITLES)
+
+    assert index.match("harry potter and the sorcerer’s stone") == [("Harry Potter and the Sorcerer's Stone", 1.0)]
+    assert index.resolve("the hobbit?") == "The Hobbit"
+    assert index.resolve("“1984”") == "1984"
+
+
+def test_a_typo_within_the_threshold_resolves():
+    index = TitleIndex(TITLES)
+
+    ((title, score),) = index.match("To Kill a Mockinbird", limit=1)
+
+    assert title == "To Kill a Mockingbird"
+    assert 0.6 <= score < 1.0
+    assert index.resolve("Harry Poter and the Sorcerers Stone") == "Harry Potter and the Sorcerer's Stone"
+
+
+def test_a_query_below_the_threshold_resolves_to_none():
+    index = TitleIndex(TITLES)
+
+    assert index.resolve("Moby Dick") is None
+    assert index.resolve("Hobbit", threshold=0.9) is None   # close, but not close enough
+    assert index.match("") == []
+
+
+def test_mentions_finds_every_title_in_text_order():
+    index = TitleIndex(TITLES)
+
+    text = "Is Of Mice and Men shorter than The Hobbit? I loved 1984 too."
+
+    assert index.mentions(text) == ["Of Mice and Men", "The Hobbit", "1984"]
+    assert index.mentions(text, limit=2) == ["Of Mice and Men", "The Hobbit"]
+
+
+def test_mentions_needs_whole_words_and_skips_very_short_titles():
+    index = TitleIndex(TITLES)
+
+    assert index.mentions("the hobbits are small") == []   # not the title on its own
+    assert index.mentions("it is a great book") == []       # "It" is too short to spot in prose
+    assert index.mentions("") == []
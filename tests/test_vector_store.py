@@ -0,0 +1,48 @@
+# tests/test_vector_store.py
+import numpy as np
+import pytest
+
+from smart_librarian.models import book_model
+from smart_librarian.models.book_model import NumpyVectorStore
+
+
+class CountingEmbeddings:
+    """Deterministic 16-dim vectors; counts the requests made."""
+
+    def __init__(self):
+        self.calls = []
+
+    def _vector(self, text):
+        return np.random.default_rng(sum(map(ord, text))).standard_normal(16).tolist()
+
+    def embed_documents(self, texts):
+        self.calls.append(("documents", list(texts)))
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        self.calls.append(("query", text))
+        return self._vector(text)
+
+
+@pytest.mark.parametrize("dtype,tolerance", [("float32", 1e-6), ("float16", 1e-3), ("int8", 1e-2)])
+def test_blocked_scores_match_float32(monkeypatch, dtype, tolerance):
+    monkeypatch.setattr(book_model, "VECTOR_SCORE_BLOCK_ROWS", 7)   # several blocks plus a partial one
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((50, 16))
+    queries = NumpyVectorStore._normalize(rng.standard_normal((3, 16)))
+    expected = queries @ NumpyVectorStore._normalize(vectors).T
+
+    store = NumpyVectorStore.from_vectors(list(range(50)), vectors, None, dtype)
+
+    assert np.abs(store._scores(queries) - expected).max() < tolerance
+
+
+def test_batch_search_embeds_all_queries_in_one_request():
+    embeddings = CountingEmbeddings()
+    docs = [type("Doc", (), {"page_content": f"book {i}", "metadata": {}})() for i in range(5)]
+    store = NumpyVectorStore.from_vectors(docs, [embeddings._vector(f"book {i}") for i in range(5)], embeddings)
+
+    results = store.batch_similarity_search_with_relevance_scores(["book 1", "book 3"], k=1)
+
+    assert embeddings.calls == [("documents", ["book 1", "book 3"])]
+    assert [hits[0][0].page_content for hits in results] == ["book 1", "book 3"]
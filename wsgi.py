@@ -0,0 +1,12 @@
+# wsgi.py
+"""
+Production entry point, served by gunicorn: `gunicorn -c gunicorn.conf.py`.
+
+Loads the app and the whole catalog (summaries store, title/BM25/theme indexes,
+vector index) at import. With preload_app the master does this once, before
+forking, and every worker shares it copy-on-write instead of loading its own.
+"""
+from main import app
+from smart_librarian.models.catalog import get_catalog
+
+get_catalog().preload()